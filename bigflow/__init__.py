@@ -8,7 +8,9 @@ import bigflow.configuration
 __all__ = [
     'Workflow',
     'Job',
+    'AsyncJob',
     'JobContext',
+    'JobListener',
     'Definition',
     'Config',
 ]
@@ -22,10 +24,18 @@ class Definition(bigflow.workflow.Definition): ...
 class Job(bigflow.workflow.Job): ...
 
 
+@public(class_alias=True)
+class AsyncJob(bigflow.workflow.AsyncJob): ...
+
+
 @public(class_alias=True)
 class JobContext(bigflow.workflow.JobContext): ...
 
 
+@public(class_alias=True)
+class JobListener(bigflow.workflow.JobListener): ...
+
+
 @public(class_alias=True)
 class Workflow(bigflow.workflow.Workflow): ...
 
@@ -0,0 +1,152 @@
+"""Static analysis of workflow job graphs - critical path, slack and parallelism."""
+
+from __future__ import annotations
+
+import typing
+
+from typing import (
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+)
+
+from bigflow.commons import public
+
+if typing.TYPE_CHECKING:
+    from bigflow.workflow import Definition, WorkflowJob
+
+
+DEFAULT_JOB_DURATION = 1.0
+
+# tolerance used when comparing float timings
+_EPSILON = 1e-9
+
+
+@public()
+class JobTiming(NamedTuple):
+    """Schedule of a single job, assuming unlimited workers.  All values are in the units of durations."""
+
+    duration: float
+    earliest_start: float
+    earliest_finish: float
+    latest_start: float
+    latest_finish: float
+    remaining: float  # length of the longest chain starting with the job (including it)
+
+    @property
+    def slack(self) -> float:
+        """How long the job may be delayed without delaying the whole workflow."""
+        return self.latest_start - self.earliest_start
+
+    @property
+    def critical(self) -> bool:
+        return self.slack <= _EPSILON
+
+
+@public()
+class WorkflowAnalysis(NamedTuple):
+    duration: float
+    critical_path: List[str]
+    max_parallelism: int
+    jobs: Dict[str, JobTiming]
+
+    def priority_weights(self) -> Dict[str, int]:
+        """Returns Airflow `priority_weight` for each job, so jobs starting the longest chains go first."""
+        return {job_id: max(1, round(timing.remaining)) for job_id, timing in self.jobs.items()}
+
+
+def job_duration(
+    job: WorkflowJob,
+    durations: Optional[Mapping[str, float]] = None,
+    default: float = DEFAULT_JOB_DURATION,
+) -> float:
+    """Estimated duration of the job - taken from `durations` (by job id),
+    then from the `expected_duration_sec` property of the job, then `default` is used."""
+    if durations is not None and job.id in durations:
+        duration = durations[job.id]
+    else:
+        duration = getattr(job.job, 'expected_duration_sec', None)
+        if duration is None:
+            duration = default
+    if duration < 0:
+        raise ValueError(f"Duration of job {job.id} must not be negative, got {duration}")
+    return float(duration)
+
+
+def has_expected_durations(definition: Definition) -> bool:
+    return any(
+        getattr(job.job, 'expected_duration_sec', None) is not None
+        for job in definition._sequential_order())
+
+
+def analyze_definition(
+    definition: Definition,
+    durations: Optional[Mapping[str, float]] = None,
+    default_duration: float = DEFAULT_JOB_DURATION,
+) -> WorkflowAnalysis:
+    order = definition._sequential_order()  # parents always go before children
+    parents = definition._parental_map()
+    children: Dict[WorkflowJob, List[WorkflowJob]] = {job: [] for job in order}
+    for job in order:
+        for parent in parents.get(job, ()):
+            children[parent].append(job)
+
+    duration = {job: job_duration(job, durations, default_duration) for job in order}
+
+    earliest_start = {}
+    for job in order:
+        earliest_start[job] = max((earliest_start[p] + duration[p] for p in parents.get(job, ())), default=0.0)
+
+    remaining = {}
+    for job in reversed(order):
+        remaining[job] = duration[job] + max((remaining[c] for c in children[job]), default=0.0)
+
+    total = max((earliest_start[job] + duration[job] for job in order), default=0.0)
+
+    timings = {}
+    for job in order:
+        latest_start = total - remaining[job]
+        timings[job.id] = JobTiming(
+            duration=duration[job],
+            earliest_start=earliest_start[job],
+            earliest_finish=earliest_start[job] + duration[job],
+            latest_start=latest_start,
+            latest_finish=latest_start + duration[job],
+            remaining=remaining[job],
+        )
+
+    return WorkflowAnalysis(
+        duration=total,
+        critical_path=_critical_path(order, parents, children, duration, remaining, total),
+        max_parallelism=_max_parallelism(order, earliest_start, duration),
+        jobs=timings,
+    )
+
+
+def _critical_path(order, parents, children, duration, remaining, total) -> List[str]:
+    job = next(
+        (j for j in order if not parents.get(j) and abs(remaining[j] - total) <= _EPSILON),
+        None)
+    path = []
+    while job is not None:
+        path.append(job.id)
+        rest = remaining[job] - duration[job]
+        job = next((c for c in children[job] if abs(remaining[c] - rest) <= _EPSILON), None)
+    return path
+
+
+def _max_parallelism(order, earliest_start, duration) -> int:
+    """Peak number of jobs running at the same time when each job starts as early as possible."""
+    events = []
+    for job in order:
+        if duration[job] > 0:
+            # finish (-1) sorts before start (+1) at the same moment
+            events.append((earliest_start[job], 1))
+            events.append((earliest_start[job] + duration[job], -1))
+    running = peak = 0
+    for _, delta in sorted(events):
+        running += delta
+        peak = max(peak, running)
+    return peak
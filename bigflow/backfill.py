@@ -0,0 +1,145 @@
+"""Running a workflow for a range of runtimes in a single process."""
+
+from __future__ import annotations
+
+import calendar
+import concurrent.futures
+import datetime as dt
+import logging
+import typing
+
+from typing import (
+    Iterator,
+    List,
+)
+
+from bigflow.commons import public
+
+if typing.TYPE_CHECKING:
+    from bigflow.workflow import Workflow
+
+
+logger = logging.getLogger(__name__)
+
+
+_PRESET_INTERVALS = {
+    '@hourly': dt.timedelta(hours=1),
+    '@daily': dt.timedelta(days=1),
+    '@weekly': dt.timedelta(weeks=1),
+}
+
+
+class BackfillError(Exception):
+    """Some runtimes of the backfill have failed."""
+
+    def __init__(self, failed: typing.Dict[dt.datetime, BaseException]):
+        self.failed = failed
+        super().__init__("Backfill failed for runtimes: " + ", ".join(str(r) for r in sorted(failed)))
+
+
+def _add_months(runtime: dt.datetime, months: int) -> dt.datetime:
+    month = runtime.month - 1 + months
+    year = runtime.year + month // 12
+    month = month % 12 + 1
+    day = min(runtime.day, calendar.monthrange(year, month)[1])
+    return runtime.replace(year=year, month=month, day=day)
+
+
+def _iter_cron(schedule_interval: str, first: dt.datetime) -> Iterator[dt.datetime]:
+    try:
+        import croniter
+    except ImportError:
+        raise ValueError(
+            f"Unable to generate runtimes for schedule interval {schedule_interval!r}, "
+            f"install 'croniter' package to use cron expressions")
+    it = croniter.croniter(schedule_interval, first - dt.timedelta(seconds=1))
+    while True:
+        yield it.get_next(dt.datetime)
+
+
+def iter_schedule(schedule_interval: str | None, first: dt.datetime) -> Iterator[dt.datetime]:
+    """Yields consecutive runtimes of the schedule, starting from `first`.
+
+    Airflow presets ('@once', '@hourly', '@daily', '@weekly', '@monthly', '@yearly') are supported
+    out of the box, cron expressions require the `croniter` package.
+    """
+    if schedule_interval in (None, '@once'):
+        yield first
+    elif schedule_interval in _PRESET_INTERVALS:
+        step = _PRESET_INTERVALS[schedule_interval]
+        runtime = first
+        while True:
+            yield runtime
+            runtime += step
+    elif schedule_interval in ('@monthly', '@yearly', '@annually'):
+        step = 1 if schedule_interval == '@monthly' else 12
+        n = 0
+        while True:
+            yield _add_months(first, n * step)
+            n += 1
+    else:
+        yield from _iter_cron(schedule_interval, first)
+
+
+@public()
+def generate_runtimes(workflow: Workflow, start: dt.datetime, end: dt.datetime) -> List[dt.datetime]:
+    """Returns runtimes which Airflow would execute for the workflow deployed with `--start-time` set to `start`.
+
+    Both `start` and `end` are translated by `workflow.start_time_factory` (like `bigflow build-dags` does
+    for DAG start date), then runtimes are generated from the `schedule_interval`, `end` is inclusive.
+    """
+    first = workflow.start_time_factory(start)
+    last = workflow.start_time_factory(end)
+
+    runtimes = []
+    for runtime in iter_schedule(workflow.schedule_interval, first):
+        if runtime > last:
+            break
+        runtimes.append(runtime)
+    return runtimes
+
+
+@public()
+def backfill(
+    workflow: Workflow,
+    start: dt.datetime,
+    end: dt.datetime,
+    parallel: int = 1,
+    **run_kwargs,
+) -> List[dt.datetime]:
+    """Runs the workflow for each runtime between `start` and `end`, returns list of processed runtimes.
+
+    Up to `parallel` runtimes are processed at the same time.  When the workflow `depends_on_past`
+    runtimes are always processed one after another and the backfill stops at the first failure.
+    Otherwise all runtimes are processed and `BackfillError` is raised at the end if any of them failed.
+    Other keyword arguments are passed to `Workflow.run` (`max_workers`, `retries`, etc).
+    """
+    if parallel < 1:
+        raise ValueError(f"`parallel` must be positive, got {parallel}")
+
+    runtimes = generate_runtimes(workflow, start, end)
+    logger.info("Backfill workflow %s, %d runtimes from %s to %s", workflow.workflow_id, len(runtimes), start, end)
+
+    if workflow.depends_on_past:
+        if parallel > 1:
+            logger.warning("Workflow %s depends on past, runtimes are processed sequentially", workflow.workflow_id)
+        for runtime in runtimes:
+            logger.info("Run workflow %s for runtime %s", workflow.workflow_id, runtime)
+            workflow.run(runtime, **run_kwargs)
+        return runtimes
+
+    failed = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="bigflow-backfill") as pool:
+        futures = {pool.submit(workflow.run, runtime, **run_kwargs): runtime for runtime in runtimes}
+        for future in concurrent.futures.as_completed(futures):
+            runtime = futures[future]
+            error = future.exception()
+            if error is not None:
+                logger.error("Workflow %s failed for runtime %s: %s", workflow.workflow_id, runtime, error)
+                failed[runtime] = error
+            else:
+                logger.info("Workflow %s finished for runtime %s", workflow.workflow_id, runtime)
+
+    if failed:
+        raise BackfillError(failed) from next(iter(failed.values()))
+    return runtimes
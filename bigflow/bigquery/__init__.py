@@ -26,7 +26,15 @@ def add_label(table_name, labels, ds=None): ...
 
 
 @public(alias_for=interactive.sensor)
-def sensor(table_alias, where_clause, ds=None): ...
+def sensor(
+        table_alias,
+        where_clause=None,
+        ds=None,
+        mode='query',
+        partition=None,
+        timeout_sec=3600,
+        poll_interval_sec=30,
+        max_poll_interval_sec=600): ...
 
 
 @public(alias_for=interactive.interactive_component)
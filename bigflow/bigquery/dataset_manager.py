@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import concurrent.futures
 import json
+import re
+import string
+import threading
+import time
 import uuid
 import functools
 import typing as tp
@@ -11,6 +16,11 @@ from pathlib import Path
 # hidden BQ and pandas imports due to https://github.com/allegro/bigflow/issues/149
 from typing import Dict, List
 
+from bigflow.bigquery import labels, load
+
+if tp.TYPE_CHECKING:
+    import bigflow.resource_context
+
 
 logger = logging.getLogger(__name__)
 
@@ -18,12 +28,119 @@ logger = logging.getLogger(__name__)
 DEFAULT_REGION = 'europe-west1'
 DEFAULT_MACHINE_TYPE = 'n1-standard-1'
 DEFAULT_LOCATION = 'EU'
+DEFAULT_TABLE_CACHE_TTL_SEC = 300
+DEFAULT_MAX_CONCURRENT_QUERIES = 8
+DEFAULT_PAGE_SIZE = 10000
+BATCH_FORMAT_ARROW = 'arrow'
+BATCH_FORMAT_PANDAS = 'pandas'
+DEFAULT_INSERT_CHUNK_ROWS = 500
+DEFAULT_INSERT_CHUNK_BYTES = 5 * 1024 * 1024
+DEFAULT_INSERT_PARALLELISM = 4
+DEFAULT_INSERT_RETRIES = 3
+INSERT_RETRY_PAUSE_SEC = 1.0
+SQL_TEMPLATE_CACHE_SIZE = 1024
+
+_CREATE_TABLE_RE = re.compile(
+    r'CREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMP(?:ORARY)?\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?([\w.\-]+)`?',
+    re.IGNORECASE)
 
 
 class AliasNotFoundError(ValueError):
     pass
 
 
+class StatementError(tp.NamedTuple):
+    index: int
+    sql: str | None
+    error: BaseException
+
+
+class QueryBatchError(Exception):
+    """Raised when some of concurrently executed statements have failed, `errors` holds all the failures."""
+
+    def __init__(self, errors: tp.List[StatementError]):
+        self.errors = errors
+        super().__init__('{failed} statement(s) failed: {details}'.format(
+            failed=len(errors),
+            details='; '.join('#{}: {}'.format(e.index, e.error) for e in errors)))
+
+
+class RejectedRecord(tp.NamedTuple):
+    index: int  # position of the record in the inserted records
+    record: dict
+    errors: tp.List[dict]
+
+
+class InsertError(ValueError):
+    """Raised when some records haven't been inserted, `rejected` holds the rejected records with their errors."""
+
+    def __init__(self, table_id: str, rejected: tp.List[RejectedRecord], failed_chunks: tp.List[tp.Tuple[int, BaseException]]):
+        self.table_id = table_id
+        self.rejected = rejected
+        self.failed_chunks = failed_chunks
+        super().__init__('{rejected} record(s) rejected and {chunks} chunk(s) failed when inserting to {table}: {details}'.format(
+            rejected=len(rejected),
+            chunks=len(failed_chunks),
+            table=table_id,
+            details='; '.join(
+                ['#{}: {}'.format(r.index, r.errors) for r in rejected[:10]] +
+                ['chunk at #{}: {}'.format(offset, e) for offset, e in failed_chunks[:10]])))
+
+
+def read_records(path: Path) -> tp.Iterator[dict]:
+    """Reads records from a JSON file with a list of records, or lazily from a newline-delimited JSON file."""
+    with open(path, 'r') as f:
+        first_char = f.read(1)
+        while first_char.isspace():
+            first_char = f.read(1)
+        f.seek(0)
+        if first_char == '[':
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def chunk_records(
+        records: tp.Iterable[dict],
+        max_rows: int = DEFAULT_INSERT_CHUNK_ROWS,
+        max_bytes: int = DEFAULT_INSERT_CHUNK_BYTES) -> tp.Iterator[tp.Tuple[int, tp.List[dict]]]:
+    """Splits records into chunks of at most `max_rows` records and (approximately) `max_bytes` of JSON.
+    Yields `(offset, chunk)` pairs, where `offset` is the index of the first record of the chunk."""
+    chunk, chunk_bytes, offset = [], 0, 0
+    for record in records:
+        size = len(json.dumps(record, default=str)) + 1
+        if chunk and (len(chunk) >= max_rows or chunk_bytes + size > max_bytes):
+            yield offset, chunk
+            offset += len(chunk)
+            chunk, chunk_bytes = [], 0
+        chunk.append(record)
+        chunk_bytes += size
+    if chunk:
+        yield offset, chunk
+
+
+def gather_queries(
+        futures: tp.Iterable[concurrent.futures.Future],
+        return_exceptions: bool = False) -> tp.List[tp.Any]:
+    """
+    Waits for all the futures, returns their results in the same order.
+    Raises `QueryBatchError` with errors of all failed statements, unless `return_exceptions` is set.
+    """
+    results = []
+    errors = []
+    for index, future in enumerate(list(futures)):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            errors.append(StatementError(index, getattr(future, 'sql', None), e))
+            results.append(e)
+    if errors and not return_exceptions:
+        raise QueryBatchError(errors)
+    return results
+
+
 def handle_key_error(method):
     logger.debug("Wrap %s with @handle_key_error", method)
 
@@ -40,6 +157,53 @@ def handle_key_error(method):
     return decorated
 
 
+class SqlTemplate(object):
+    """
+    SQL with `{alias}` placeholders, parsed once and rendered many times (use `compile_sql_template`).
+    Renders exactly like `sql.format(**variables)`.
+    """
+    _ROOT_NAME_RE = re.compile(r'[^.\[]*')
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self._parts = list(string.Formatter().parse(sql))
+        self.placeholders = frozenset(
+            self._ROOT_NAME_RE.match(field_name).group()
+            for _, field_name, _, _ in self._parts
+            if field_name is not None)
+        # placeholders like `{a.b}`, `{a[0]}` or `{a!r:>10}` are rendered by `str.format`
+        self._simple = all(
+            field_name is None or (not format_spec and conversion is None and field_name in self.placeholders)
+            for _, field_name, format_spec, conversion in self._parts)
+
+    def render(self, variables: tp.Mapping[str, tp.Any]) -> str:
+        if not self._simple:
+            return self.sql.format(**variables)
+        chunks = []
+        for literal_text, field_name, _, _ in self._parts:
+            chunks.append(literal_text)
+            if field_name is not None:
+                chunks.append(format(variables[field_name]))
+        return ''.join(chunks)
+
+    def unresolved_placeholders(self, names: tp.Iterable[str]) -> tp.List[str]:
+        return sorted(self.placeholders.difference(names))
+
+
+@functools.lru_cache(maxsize=SQL_TEMPLATE_CACHE_SIZE)
+def compile_sql_template(sql: str) -> SqlTemplate:
+    return SqlTemplate(sql)
+
+
+def check_sql_placeholders(sql: str, names: tp.Iterable[str]) -> None:
+    """Raises `AliasNotFoundError` when the SQL has placeholders not resolved by any of the `names`."""
+    missing = compile_sql_template(sql).unresolved_placeholders(names)
+    if missing:
+        raise AliasNotFoundError(
+            "'{missing_variable}' is missing in internal_tables or external_tables or extras.".format(
+                missing_variable="', '".join(missing)))
+
+
 def get_partition_from_run_datetime_or_none(run_datetime: str | None) -> str | None:
     """
     :param run_datetime: string run datetime in format YYYY-MM-DD HH:mm:ss or YYY-MM-DD
@@ -64,6 +228,8 @@ class TemplatedDatasetManager(object):
         self.external_tables = external_tables
         self.extras = extras
         self.run_datetime = run_datetime
+        self._template_variables: tp.Dict[str, tp.Dict[str, tp.Any]] = {}
+        self._template_variables_lock = threading.Lock()
 
         logger.debug(
             "Wrap %s with TemplatedDatasetManager, internal_tables %s,"
@@ -82,13 +248,31 @@ class TemplatedDatasetManager(object):
         return self.write(self.dataset_manager.write_append, table_name, sql, custom_run_datetime)
 
     def write_tmp(self, table_name, sql, custom_run_datetime=None):
-        self.internal_tables[table_name] = self.create_table_id(table_name)
+        self._add_internal_table(table_name)
         return self.write(self.dataset_manager.write_tmp, table_name, sql, custom_run_datetime)
 
+    def write_truncate_async(self, table_name, sql, custom_run_datetime=None):
+        return self.write(self.dataset_manager.write_truncate_async, table_name, sql, custom_run_datetime)
+
+    def write_append_async(self, table_name, sql, custom_run_datetime=None):
+        return self.write(self.dataset_manager.write_append_async, table_name, sql, custom_run_datetime)
+
+    def write_tmp_async(self, table_name, sql, custom_run_datetime=None):
+        self._add_internal_table(table_name)
+        return self.write(self.dataset_manager.write_tmp_async, table_name, sql, custom_run_datetime)
+
+    def _add_internal_table(self, table_name):
+        table_id = self.create_table_id(table_name)
+        if self.internal_tables.get(table_name) != table_id:
+            # replaced, not updated, so operations running concurrently render with a consistent copy
+            with self._template_variables_lock:
+                self.internal_tables = {**self.internal_tables, table_name: table_id}
+                self._template_variables.clear()
+
     @handle_key_error
     def write(self, write_callable, table_name, sql, custom_run_datetime=None):
         table_id = self.create_table_id(table_name)
-        return write_callable(table_id, sql.format(**self.template_variables(custom_run_datetime)))
+        return write_callable(table_id, self.render(sql, custom_run_datetime))
 
     def create_table_id(self, table_name):
         table_name_without_partition = table_name.split('$')[0]
@@ -97,41 +281,110 @@ class TemplatedDatasetManager(object):
             self.create_full_table_id(table_name_without_partition))
 
     @handle_key_error
-    def collect(self, sql, custom_run_datetime=None):
-        return self.dataset_manager.collect(sql.format(**self.template_variables(custom_run_datetime)))
+    def collect(self, sql, custom_run_datetime=None, dtypes=None, use_storage_api=False, maximum_bytes_billed=None):
+        return self.dataset_manager.collect(
+            self.render(sql, custom_run_datetime), dtypes, use_storage_api, maximum_bytes_billed)
+
+    @handle_key_error
+    def collect_arrow(self, sql, custom_run_datetime=None, use_storage_api=True):
+        return self.dataset_manager.collect_arrow(
+            self.render(sql, custom_run_datetime), use_storage_api)
 
     @handle_key_error
     def collect_list(self, sql: str, custom_run_datetime: tp.Optional[str] = None, record_as_dict: bool = False):
         return self.dataset_manager.collect_list(
-            sql.format(**self.template_variables(custom_run_datetime)), record_as_dict)
+            self.render(sql, custom_run_datetime), record_as_dict)
+
+    @handle_key_error
+    def iter_rows(
+            self,
+            sql: str,
+            custom_run_datetime: tp.Optional[str] = None,
+            page_size: int = DEFAULT_PAGE_SIZE,
+            as_dict: bool = False):
+        return self.dataset_manager.iter_rows(
+            self.render(sql, custom_run_datetime), page_size, as_dict)
+
+    @handle_key_error
+    def collect_batches(
+            self,
+            sql: str,
+            custom_run_datetime: tp.Optional[str] = None,
+            page_size: int = DEFAULT_PAGE_SIZE,
+            format: str = BATCH_FORMAT_ARROW):
+        return self.dataset_manager.collect_batches(
+            self.render(sql, custom_run_datetime), page_size, format)
+
+    @handle_key_error
+    def collect_async(self, sql, custom_run_datetime=None):
+        return self.dataset_manager.collect_async(self.render(sql, custom_run_datetime))
+
+    @handle_key_error
+    def collect_list_async(self, sql: str, custom_run_datetime: tp.Optional[str] = None, record_as_dict: bool = False):
+        return self.dataset_manager.collect_list_async(
+            self.render(sql, custom_run_datetime), record_as_dict)
 
     def dry_run(self, sql, custom_run_datetime=None):
-        return self.dataset_manager.dry_run(sql.format(**self.template_variables(custom_run_datetime)))
+        return self.dataset_manager.dry_run(self.render(sql, custom_run_datetime))
 
     def remove_dataset(self):
         return self.dataset_manager.remove_dataset()
 
+    def close(self):
+        return self.dataset_manager.close()
+
     def load_table_from_dataframe(self, table_name, df):
         table_id = self.create_table_id(table_name)
         return self.dataset_manager.load_table_from_dataframe(table_id, df)
 
+    def load_table_from_file(self, table_name, source, **load_options):
+        table_id = self.create_table_id(table_name)
+        return self.dataset_manager.load_table_from_file(table_id, source, **load_options)
+
+    def load_table_from_iterable(self, table_name, records, **load_options):
+        table_id = self.create_table_id(table_name)
+        return self.dataset_manager.load_table_from_iterable(table_id, records, **load_options)
+
     def create_table(self, create_query):
         return self.dataset_manager.create_table(create_query)
 
+    def create_table_async(self, create_query):
+        return self.dataset_manager.create_table_async(create_query)
+
     def create_full_table_id(self, table_name):
         return self.dataset_manager.dataset_id + '.' + table_name
 
     def table_exists(self, table_name):
         return self.dataset_manager.table_exists(table_name)
 
+    def invalidate_table_cache(self, table_name=None):
+        self.dataset_manager.table_cache.invalidate(table_name)
+
+    @handle_key_error
+    def render(self, sql, custom_run_datetime=None):
+        return compile_sql_template(sql).render(self._variables(custom_run_datetime))
+
     def template_variables(self, custom_run_datetime=None):
-        result = {}
-        result.update(self.internal_tables)
-        result.update(self.external_tables)
-        result.update(self.extras)
-        result['dt'] = custom_run_datetime or self.run_datetime
+        return dict(self._variables(custom_run_datetime))
+
+    def _variables(self, custom_run_datetime=None):
+        # cached per runtime, reset when `write_tmp` adds a table
+        dt = custom_run_datetime or self.run_datetime
+        result = self._template_variables.get(dt)
+        if result is None:
+            with self._template_variables_lock:
+                result = {}
+                result.update(self.internal_tables)
+                result.update(self.external_tables)
+                result.update(self.extras)
+                result['dt'] = dt
+                self._template_variables[dt] = result
         return result
 
+    def check_placeholders(self, sql):
+        """Raises `AliasNotFoundError` when the SQL references unknown tables or variables."""
+        check_sql_placeholders(sql, self._variables())
+
     def create_table_from_schema(
             self,
             table_name: str,
@@ -143,9 +396,10 @@ class TemplatedDatasetManager(object):
     def insert(
             self,
             table_name: str,
-            records: tp.Union[tp.List[dict], Path]):
+            records: tp.Union[tp.Iterable[dict], Path],
+            **insert_options):
         table_id = self.create_table_id(table_name)
-        return self.dataset_manager.insert(table_id, records)
+        return self.dataset_manager.insert(table_id, records, **insert_options)
 
 
 class PartitionedDatasetManager(object):
@@ -181,8 +435,98 @@ class PartitionedDatasetManager(object):
             False,
             custom_run_datetime)
 
-    def collect(self, sql, custom_run_datetime=None):
-        return self._dataset_manager.collect(sql, custom_run_datetime)
+    def write_truncate_async(self, table_name, sql, partitioned=True, custom_run_datetime=None) -> concurrent.futures.Future:
+        """Submits `write_truncate`, returns a future of its result.  See also `gather` and `batch`."""
+        return self._write(
+            self._dataset_manager.write_truncate_async,
+            table_name,
+            sql,
+            partitioned,
+            custom_run_datetime)
+
+    def write_append_async(self, table_name, sql, partitioned=True, custom_run_datetime=None) -> concurrent.futures.Future:
+        return self._write(
+            self._dataset_manager.write_append_async,
+            table_name,
+            sql,
+            partitioned,
+            custom_run_datetime)
+
+    def write_tmp_async(self, table_name, sql, custom_run_datetime=None) -> concurrent.futures.Future:
+        return self._write(
+            self._dataset_manager.write_tmp_async,
+            table_name,
+            sql,
+            False,
+            custom_run_datetime)
+
+    def collect(
+            self,
+            sql,
+            custom_run_datetime=None,
+            dtypes: tp.Optional[tp.Dict[str, tp.Any]] = None,
+            use_storage_api: bool = False,
+            maximum_bytes_billed: tp.Optional[int] = None):
+        """
+        Fetches the query result into a pandas data frame, `dtypes` maps column names to pandas dtypes.
+        Set `use_storage_api` to download the result as Arrow record batches
+        in parallel streams through the BigQuery Storage API.
+        With `maximum_bytes_billed`, BigQuery fails the query (without charges) when it would bill more bytes.
+        """
+        return self._dataset_manager.collect(sql, custom_run_datetime, dtypes, use_storage_api, maximum_bytes_billed)
+
+    def collect_arrow(self, sql, custom_run_datetime=None, use_storage_api: bool = True) -> 'pyarrow.Table':
+        """Fetches the query result into an Arrow table, through the BigQuery Storage API by default."""
+        return self._dataset_manager.collect_arrow(sql, custom_run_datetime, use_storage_api)
+
+    def collect_async(self, sql, custom_run_datetime=None) -> concurrent.futures.Future:
+        return self._dataset_manager.collect_async(sql, custom_run_datetime)
+
+    def iter_rows(
+            self,
+            sql: str,
+            custom_run_datetime: tp.Optional[str] = None,
+            page_size: int = DEFAULT_PAGE_SIZE,
+            as_dict: bool = False) -> tp.Iterator[tp.Union[dict, 'google.cloud.bigquery.table.Row']]:
+        """Lazily iterates over rows of the query result, fetching one page at a time."""
+        return self._dataset_manager.iter_rows(sql, custom_run_datetime, page_size, as_dict)
+
+    def collect_batches(
+            self,
+            sql: str,
+            custom_run_datetime: tp.Optional[str] = None,
+            page_size: int = DEFAULT_PAGE_SIZE,
+            format: str = BATCH_FORMAT_ARROW) -> tp.Iterator[tp.Union['pyarrow.RecordBatch', 'pandas.DataFrame']]:
+        """Lazily iterates over the query result as Arrow record batches ('arrow') or pandas data frames ('pandas')."""
+        return self._dataset_manager.collect_batches(sql, custom_run_datetime, page_size, format)
+
+    def collect_list_async(
+            self,
+            sql: str,
+            custom_run_datetime: tp.Optional[str] = None,
+            record_as_dict: bool = False) -> concurrent.futures.Future:
+        return self._dataset_manager.collect_list_async(sql, custom_run_datetime, record_as_dict)
+
+    def create_table_async(self, create_query) -> concurrent.futures.Future:
+        return self._dataset_manager.create_table_async(create_query)
+
+    def gather(self, *futures: concurrent.futures.Future, return_exceptions: bool = False) -> tp.List[tp.Any]:
+        """
+        Waits for all the submitted statements and returns their results.
+        Raises `QueryBatchError` with the errors of all failed statements, unless `return_exceptions` is set.
+        """
+        return gather_queries(futures, return_exceptions)
+
+    def batch(self) -> 'QueryBatch':
+        """
+        Context manager which submits statements concurrently and waits for all of them at exit:
+
+            with dataset.batch() as batch:
+                batch.write_tmp('a', 'SELECT ...')
+                batch.write_tmp('b', 'SELECT ...')
+            print(batch.results)
+        """
+        return QueryBatch(self)
 
     def collect_list(self, sql: str, custom_run_datetime: tp.Optional[str] = None, record_as_dict: bool = False):
         return self._dataset_manager.collect_list(sql, custom_run_datetime, record_as_dict)
@@ -193,6 +537,10 @@ class PartitionedDatasetManager(object):
     def create_table(self, create_query):
         return self._dataset_manager.create_table(create_query)
 
+    def render(self, sql, custom_run_datetime=None) -> str:
+        """Returns the SQL with all the table aliases and variables resolved."""
+        return self._dataset_manager.render(sql, custom_run_datetime)
+
     @property
     def runtime_str(self):
         return self._dataset_manager.run_datetime
@@ -224,10 +572,39 @@ class PartitionedDatasetManager(object):
     def remove_dataset(self):
         return self._dataset_manager.remove_dataset()
 
+    def close(self):
+        """Shuts down the pool of statements submitted with `*_async` methods, unless it's shared by the workflow."""
+        return self._dataset_manager.close()
+
     def load_table_from_dataframe(self, table_name, df, partitioned=True, custom_run_datetime=None):
         table_id = self._create_table_id(custom_run_datetime, table_name, partitioned)
         return self._dataset_manager.load_table_from_dataframe(table_id, df)
 
+    def load_table_from_file(self, table_name, source, partitioned=True, custom_run_datetime=None, **load_options):
+        """
+        Loads a file to the table (or its partition) with a load job.
+        `load_options` (`source_format`, `write_disposition`, `schema`) are passed to `DatasetManager.load_table_from_file`.
+        """
+        table_id = self._create_table_id(custom_run_datetime, table_name, partitioned)
+        return self._dataset_manager.load_table_from_file(table_id, source, **load_options)
+
+    def load_table_from_iterable(
+            self,
+            table_name,
+            records,
+            partitioned=True,
+            custom_run_datetime=None,
+            partition_field: tp.Optional[str] = None,
+            **load_options):
+        """
+        Loads records to the table (or its partition) with a load job - cheaper and faster than `insert` for big batches.
+        With `partition_field`, records are loaded to the partitions of their days, one load job per partition.
+        `load_options` (`source_format`, `write_disposition`, `schema`) are passed to `DatasetManager.load_table_from_iterable`.
+        """
+        table_id = self._create_table_id(custom_run_datetime, table_name, partitioned and not partition_field)
+        return self._dataset_manager.load_table_from_iterable(
+            table_id, records, partition_field=partition_field, **load_options)
+
     def create_table_from_schema(
             self,
             table_name: str,
@@ -238,11 +615,16 @@ class PartitionedDatasetManager(object):
     def insert(
             self,
             table_name: str,
-            records: tp.Union[tp.List[dict], Path],
+            records: tp.Union[tp.Iterable[dict], Path],
             partitioned: bool = True,
-            custom_run_datetime: tp.Optional[str] = None):
+            custom_run_datetime: tp.Optional[str] = None,
+            **insert_options):
+        """
+        Streams records (or records from a JSON / newline-delimited JSON file) to the table in parallel chunks.
+        `insert_options` (`chunk_rows`, `chunk_bytes`, `parallelism`, `retries`) are passed to `DatasetManager.insert`.
+        """
         table_id = self._create_table_id(custom_run_datetime, table_name, partitioned)
-        return self._dataset_manager.insert(table_id, records)
+        return self._dataset_manager.insert(table_id, records, **insert_options)
 
     def _write(self, write_callable, table_name, sql, partitioned, custom_run_datetime=None):
         table_id = self._create_table_id(custom_run_datetime, table_name, partitioned)
@@ -254,10 +636,118 @@ class PartitionedDatasetManager(object):
             table_name = table_name + '${partition}'.format(partition=custom_partition or self.partition)
         return table_name
 
+    def invalidate_table_cache(self, table_name: tp.Optional[str] = None):
+        """Forgets cached existence of the table (or all tables of the dataset), e.g. after it was dropped."""
+        self._dataset_manager.invalidate_table_cache(table_name)
+
     def _table_exists(self, table_name):
         return self._dataset_manager.table_exists(table_name)
 
 
+class QueryBatch(object):
+    """
+    Statements submitted concurrently through `PartitionedDatasetManager`.
+    When the `with` block exits, the batch waits for all the statements and stores their `results`.
+    """
+    def __init__(self, dataset_manager: PartitionedDatasetManager):
+        self._dataset_manager = dataset_manager
+        self.futures: tp.List[concurrent.futures.Future] = []
+        self.results: tp.List[tp.Any] | None = None
+
+    def _add(self, future: concurrent.futures.Future) -> concurrent.futures.Future:
+        self.futures.append(future)
+        return future
+
+    def write_truncate(self, table_name, sql, partitioned=True, custom_run_datetime=None):
+        return self._add(self._dataset_manager.write_truncate_async(table_name, sql, partitioned, custom_run_datetime))
+
+    def write_append(self, table_name, sql, partitioned=True, custom_run_datetime=None):
+        return self._add(self._dataset_manager.write_append_async(table_name, sql, partitioned, custom_run_datetime))
+
+    def write_tmp(self, table_name, sql, custom_run_datetime=None):
+        return self._add(self._dataset_manager.write_tmp_async(table_name, sql, custom_run_datetime))
+
+    def collect(self, sql, custom_run_datetime=None):
+        return self._add(self._dataset_manager.collect_async(sql, custom_run_datetime))
+
+    def collect_list(self, sql: str, custom_run_datetime: tp.Optional[str] = None, record_as_dict: bool = False):
+        return self._add(self._dataset_manager.collect_list_async(sql, custom_run_datetime, record_as_dict))
+
+    def create_table(self, create_query):
+        return self._add(self._dataset_manager.create_table_async(create_query))
+
+    def wait(self) -> tp.List[tp.Any]:
+        self.results = gather_queries(self.futures)
+        return self.results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.wait()
+        else:
+            # don't start queued statements, but let the running ones finish
+            for future in self.futures:
+                future.cancel()
+            concurrent.futures.wait(self.futures)
+
+
+class TableMetadataCache(object):
+    """
+    Names of tables of a single dataset, fetched with one `list_tables` call and kept for `ttl_sec` seconds.
+    Tables missing from the cache are checked with `get_table`, so tables created by others are still found.
+    """
+    def __init__(self,
+                 bigquery_client: 'google.cloud.bigquery.Client',
+                 dataset: 'google.cloud.bigquery.Dataset',
+                 ttl_sec: float = DEFAULT_TABLE_CACHE_TTL_SEC,
+                 clock: tp.Callable[[], float] = time.monotonic):
+        self.bigquery_client = bigquery_client
+        self.dataset = dataset
+        self.ttl_sec = ttl_sec
+        self._clock = clock
+        self._tables: tp.Set[str] | None = None
+        self._created: tp.Set[str] = set()  # tables created through the dataset manager
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _tables_or_refresh(self) -> tp.Set[str]:
+        with self._lock:
+            if self._tables is None or self._clock() - self._loaded_at > self.ttl_sec:
+                logger.debug('Listing tables of %s', self.dataset.dataset_id)
+                self._tables = {t.table_id for t in self.bigquery_client.list_tables(self.dataset)}
+                self._loaded_at = self._clock()
+            return self._tables
+
+    def table_exists(self, table_name: str) -> bool:
+        if table_name in self._created or table_name in self._tables_or_refresh():
+            return True
+
+        from google.api_core.exceptions import NotFound
+        try:
+            self.bigquery_client.get_table(self.dataset.table(table_name))
+        except NotFound:
+            return False
+        self.add(table_name)
+        return True
+
+    def add(self, table_name: str) -> None:
+        with self._lock:
+            self._created.add(table_name)
+
+    def invalidate(self, table_name: str | None = None) -> None:
+        """Forgets the table (or all tables), they are fetched again on the next check."""
+        with self._lock:
+            if table_name is None:
+                self._tables = None
+                self._created.clear()
+            else:
+                self._created.discard(table_name)
+                if self._tables is not None:
+                    self._tables.discard(table_name)
+
+
 class DatasetManager(object):
     """
     Manages BigQuery IO operations.
@@ -265,12 +755,63 @@ class DatasetManager(object):
     def __init__(self,
                  bigquery_client: 'google.cloud.bigquery.Client',
                  dataset: 'google.cloud.bigquery.Dataset',
-                 logger: logging.Logger):
+                 logger: logging.Logger,
+                 table_cache: TableMetadataCache | None = None,
+                 max_concurrent_queries: int = DEFAULT_MAX_CONCURRENT_QUERIES,
+                 bqstorage_client: 'google.cloud.bigquery_storage.BigQueryReadClient' | None = None,
+                 executor: concurrent.futures.ThreadPoolExecutor | None = None):
         from google.cloud import bigquery
         self.bigquery_client: bigquery.Client = bigquery_client
         self.dataset = dataset
         self.dataset_id = dataset.full_dataset_id.replace(':', '.')
         self.logger = logger
+        self.table_cache = table_cache or TableMetadataCache(bigquery_client, dataset)
+        self.max_concurrent_queries = max_concurrent_queries
+        # a shared pool (see `create_dataset_manager`) is left running, an own pool is shut down by `close`
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._executor_lock = threading.Lock()
+        self.bqstorage_client = bqstorage_client
+
+    def submit(self, sql: str | None, fn: tp.Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Runs `fn` in the background, at most `max_concurrent_queries` at a time.
+        The returned future has the `sql` attribute, used to report failed statements.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = create_query_pool(self.max_concurrent_queries)
+            future = self._executor.submit(fn, *args, **kwargs)
+        future.sql = sql
+        return future
+
+    def close(self):
+        """
+        Shuts down the own pool of statements submitted with `*_async` methods (called when the component ends).
+        Statements still running are not interrupted.  The manager may be used again, a new pool is created then.
+        """
+        with self._executor_lock:
+            if self._owns_executor and self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def write_truncate_async(self, table_id: str, sql: str) -> concurrent.futures.Future:
+        return self.submit(sql, self.write_truncate, table_id, sql)
+
+    def write_append_async(self, table_id: str, sql: str) -> concurrent.futures.Future:
+        return self.submit(sql, self.write_append, table_id, sql)
+
+    def write_tmp_async(self, table_id: str, sql: str) -> concurrent.futures.Future:
+        return self.submit(sql, self.write_tmp, table_id, sql)
+
+    def collect_async(self, sql: str) -> concurrent.futures.Future:
+        return self.submit(sql, self.collect, sql)
+
+    def collect_list_async(self, sql: str, record_as_dict: bool = False) -> concurrent.futures.Future:
+        return self.submit(sql, self.collect_list, sql, record_as_dict)
+
+    def create_table_async(self, create_query: str) -> concurrent.futures.Future:
+        return self.submit(create_query, self.create_table, create_query)
 
     def write_tmp(self, table_id: str, sql: str) -> 'google.cloud.bigquery.table.RowIterator':
         return self.write(table_id, sql, 'WRITE_TRUNCATE')
@@ -311,20 +852,99 @@ class DatasetManager(object):
         job = self.bigquery_client.query(
             create_query,
             job_config=job_config)
-        return job.result()
+        result = job.result()
+        self._on_table_created(create_query)
+        return result
+
+    def _on_table_created(self, create_query: str):
+        match = _CREATE_TABLE_RE.search(create_query)
+        if match:
+            self.table_cache.add(match.group(1).split('.')[-1])
+        else:
+            self.table_cache.invalidate()
 
-    def collect(self, sql: str) -> 'pandas.DataFrame':
-        return self._query(sql).to_dataframe()
+    def collect(
+            self,
+            sql: str,
+            dtypes: tp.Dict[str, tp.Any] | None = None,
+            use_storage_api: bool = False,
+            maximum_bytes_billed: int | None = None) -> 'pandas.DataFrame':
+        kwargs = {}
+        if dtypes:
+            kwargs['dtypes'] = dtypes
+        if use_storage_api:
+            kwargs.update(self._storage_api_kwargs())
+        job_config = None
+        if maximum_bytes_billed is not None:
+            from google.cloud import bigquery
+            job_config = bigquery.QueryJobConfig(maximum_bytes_billed=maximum_bytes_billed)
+        return self._query(sql, job_config).to_dataframe(**kwargs)
+
+    def collect_arrow(self, sql: str, use_storage_api: bool = True) -> 'pyarrow.Table':
+        if use_storage_api:
+            return self._query(sql).to_arrow(**self._storage_api_kwargs())
+        return self._query(sql).to_arrow(create_bqstorage_client=False)
+
+    def _storage_api_kwargs(self) -> dict:
+        client = self._get_bqstorage_client()
+        if client is None:
+            self.logger.warning('BigQuery Storage API is not available, fetching results through the REST API')
+            return {'create_bqstorage_client': False}
+        return {'bqstorage_client': client}
+
+    def _get_bqstorage_client(self) -> 'google.cloud.bigquery_storage.BigQueryReadClient' | None:
+        with self._executor_lock:
+            if self.bqstorage_client is None:
+                # returns None when google-cloud-bigquery-storage is not installed
+                ensure_client = getattr(self.bigquery_client, '_ensure_bqstorage_client', None)
+                self.bqstorage_client = ensure_client() if ensure_client else None
+            return self.bqstorage_client
 
     def collect_list(
             self,
             sql: str,
             record_as_dict: bool = False
     ) -> tp.List[tp.Dict] | tp.List['google.cloud.bigquery.table.Row']:
-        result = list(self._query(sql).result())
+        rows = self._query(sql).result()
         if record_as_dict:
-            result = [dict(e) for e in result]
-        return result
+            return [dict(e) for e in rows]
+        return list(rows)
+
+    def iter_rows(
+            self,
+            sql: str,
+            page_size: int = DEFAULT_PAGE_SIZE,
+            as_dict: bool = False) -> tp.Iterator[tp.Union[dict, 'google.cloud.bigquery.table.Row']]:
+        rows = self._query(sql).result(page_size=page_size)
+        for page in rows.pages:
+            for row in page:
+                yield dict(row) if as_dict else row
+
+    def collect_batches(
+            self,
+            sql: str,
+            page_size: int = DEFAULT_PAGE_SIZE,
+            format: str = BATCH_FORMAT_ARROW) -> tp.Iterator[tp.Union['pyarrow.RecordBatch', 'pandas.DataFrame']]:
+        if format not in (BATCH_FORMAT_ARROW, BATCH_FORMAT_PANDAS):
+            raise ValueError(f"Unknown batch format {format!r}, expected '{BATCH_FORMAT_ARROW}' or '{BATCH_FORMAT_PANDAS}'")
+        return self._collect_batches(sql, page_size, format)
+
+    def _collect_batches(self, sql: str, page_size: int, format: str):
+        rows = self._query(sql).result(page_size=page_size)
+        if format == BATCH_FORMAT_ARROW and hasattr(rows, 'to_arrow_iterable'):
+            yield from rows.to_arrow_iterable()
+        elif format == BATCH_FORMAT_PANDAS and hasattr(rows, 'to_dataframe_iterable'):
+            yield from rows.to_dataframe_iterable()
+        else:
+            # old google-cloud-bigquery, convert page by page
+            for page in rows.pages:
+                records = [dict(row) for row in page]
+                if format == BATCH_FORMAT_ARROW:
+                    import pyarrow
+                    yield pyarrow.RecordBatch.from_pylist(records)
+                else:
+                    import pandas
+                    yield pandas.DataFrame.from_records(records)
 
     def dry_run(self, sql: str) -> str:
         from google.cloud import bigquery
@@ -342,17 +962,81 @@ class DatasetManager(object):
     def load_table_from_dataframe(self, table_id: str, df) -> 'google.cloud.bigquery.table.RowIterator':
         return self.bigquery_client.load_table_from_dataframe(df, table_id).result()
 
+    def load_table_from_file(
+            self,
+            table_id: str,
+            source: tp.Union[Path, tp.BinaryIO],
+            source_format: str | None = None,
+            write_disposition: str = 'WRITE_APPEND',
+            schema: tp.Sequence[tp.Any] | None = None) -> 'google.cloud.bigquery.job.LoadJob':
+        """
+        Loads a file (Parquet, Avro, newline-delimited JSON, CSV or ORC) to the table with a single load job.
+        The format is detected from the file suffix, unless `source_format` is given.
+        """
+        if isinstance(source, Path):
+            source_format = source_format or load.source_format_of(source)
+            with open(source, 'rb') as f:
+                return self.load_table_from_file(table_id, f, source_format, write_disposition, schema)
+        if source_format is None:
+            raise ValueError("`source_format` is required when loading from a file object")
+
+        from google.cloud import bigquery
+        self.logger.info('LOADING %s TO TABLE: %s', source_format, table_id)
+        job_config = bigquery.LoadJobConfig()
+        job_config.source_format = source_format
+        job_config.write_disposition = write_disposition
+        if source_format == load.SOURCE_FORMAT_AVRO:
+            job_config.use_avro_logical_types = True
+        if schema:
+            job_config.schema = schema
+        return self.bigquery_client.load_table_from_file(source, table_id, rewind=True, job_config=job_config).result()
+
+    def _table_schema_or_none(self, table_id: str) -> tp.List['google.cloud.bigquery.SchemaField'] | None:
+        from google.api_core.exceptions import NotFound
+        try:
+            return self.bigquery_client.get_table(table_id).schema
+        except NotFound:
+            return None
+
+    def load_table_from_iterable(
+            self,
+            table_id: str,
+            records: tp.Iterable[dict],
+            source_format: str = load.SOURCE_FORMAT_PARQUET,
+            write_disposition: str = 'WRITE_APPEND',
+            schema: tp.Sequence[tp.Any] | None = None,
+            partition_field: str | None = None) -> tp.List['google.cloud.bigquery.job.LoadJob']:
+        """
+        Serialises records to spooled temporary files and loads them with load jobs.
+        Parquet and Avro files use the `schema` or the schema of the existing table.
+        When `partition_field` is given, records are split by the day of that field and each day is loaded
+        to its own partition (`table_id` must not contain a partition decorator then), in concurrent load jobs.
+        """
+        if partition_field and '$' in table_id:
+            raise ValueError(f"Table {table_id} has a partition decorator, it can't be loaded by `partition_field`")
+        if source_format != load.SOURCE_FORMAT_JSON and not schema:
+            schema = self._table_schema_or_none(table_id.split('$')[0])
+
+        spools = load.spool_records(records, source_format, schema, partition_field)
+        try:
+            futures = [
+                self.submit(
+                    None,
+                    self.load_table_from_file,
+                    table_id if partition is None else f'{table_id}${partition}',
+                    spool.file,
+                    source_format,
+                    write_disposition,
+                    schema)
+                for partition, spool in sorted(spools.items(), key=lambda item: item[0] or '')
+            ]
+            return gather_queries(futures)
+        finally:
+            for spool in spools.values():
+                spool.file.close()
+
     def table_exists(self, table_name: str) -> bool:
-        return self.bigquery_client.query('''
-            SELECT count(*) as table_exists
-            FROM `{dataset_id}.__TABLES__`
-            WHERE table_id='{table_name}'
-            '''.format(
-                dataset_id=self.dataset_id,
-                table_name=table_name)) \
-            .result() \
-            .to_dataframe()['table_exists'] \
-            .iloc[0] > 0
+        return self.table_cache.table_exists(table_name)
 
     def create_table_from_schema(
             self,
@@ -377,19 +1061,74 @@ class DatasetManager(object):
         self.logger.info(f'CREATING TABLE FROM SCHEMA: {table.schema}')
 
         self.bigquery_client.create_table(table)
+        self.table_cache.add(table.table_id)
 
     def insert(
             self,
             table_id: str,
-            records: tp.Union[tp.List[dict], Path]):
+            records: tp.Union[tp.Iterable[dict], Path],
+            chunk_rows: int = DEFAULT_INSERT_CHUNK_ROWS,
+            chunk_bytes: int = DEFAULT_INSERT_CHUNK_BYTES,
+            parallelism: int = DEFAULT_INSERT_PARALLELISM,
+            retries: int = DEFAULT_INSERT_RETRIES) -> int:
+        """
+        Streams records to the table in chunks of at most `chunk_rows` records / `chunk_bytes` bytes,
+        up to `parallelism` chunks at a time.  Chunks failed with an API error are retried up to `retries` times.
+        Records may be given as an iterable or a path to a JSON / newline-delimited JSON file (read lazily).
+        Returns the number of inserted records, raises `InsertError` with all the rejected records.
+        """
         self.logger.info('INSERTING RECORDS TO TABLE: %s', table_id)
         table = self.bigquery_client.get_table(table_id)
         if isinstance(records, Path):
-            with open(records, 'r') as f:
-                records = json.loads(f.read())
-        errors = self.bigquery_client.insert_rows(table, records)
-        if errors:
-            raise ValueError(errors)
+            records = read_records(records)
+
+        rejected: tp.List[RejectedRecord] = []
+        failed_chunks: tp.List[tp.Tuple[int, BaseException]] = []
+        inserted = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='bigquery-insert') as executor:
+            in_flight = {}
+
+            def collect(done):
+                nonlocal inserted
+                for future in done:
+                    offset, chunk = in_flight.pop(future)
+                    try:
+                        errors = future.result()
+                    except Exception as e:
+                        self.logger.error('Chunk of %d records at #%d failed: %s', len(chunk), offset, e)
+                        failed_chunks.append((offset, e))
+                        continue
+                    rejected.extend(
+                        RejectedRecord(offset + error['index'], chunk[error['index']], error['errors'])
+                        for error in errors)
+                    inserted += len(chunk) - len(errors)
+
+            for offset, chunk in chunk_records(records, chunk_rows, chunk_bytes):
+                if len(in_flight) >= 2 * parallelism:
+                    # don't read more records than needed to keep all workers busy
+                    done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    collect(done)
+                in_flight[executor.submit(self._insert_chunk, table, chunk, retries)] = (offset, chunk)
+            collect(concurrent.futures.wait(in_flight).done)
+
+        if rejected or failed_chunks:
+            raise InsertError(table_id, sorted(rejected, key=lambda r: r.index), sorted(failed_chunks, key=lambda c: c[0]))
+        self.logger.info('Inserted %d records to %s', inserted, table_id)
+        return inserted
+
+    def _insert_chunk(self, table, chunk: tp.List[dict], retries: int) -> tp.List[dict]:
+        # the same insert ids on every attempt, so BigQuery de-duplicates rows of an attempt which
+        # failed only on the client side (e.g. timed out after the rows were written)
+        row_ids = [str(uuid.uuid4()) for _ in chunk]
+        for attempt in range(retries + 1):
+            try:
+                return self.bigquery_client.insert_rows(table, chunk, row_ids=row_ids)
+            except Exception as e:
+                if attempt == retries or not _is_retryable(e):
+                    raise
+                pause = INSERT_RETRY_PAUSE_SEC * 2 ** attempt
+                self.logger.warning('Inserting chunk failed (%s), retry in %.1f s', e, pause)
+                time.sleep(pause)
 
     def _query(self, sql: str, job_config=None) -> 'google.cloud.bigquery.job.QueryJob':
         self.logger.info('COLLECTING DATA: %s', sql)
@@ -426,17 +1165,7 @@ def create_dataset(
         dataset_name=dataset_name))
     dataset.location = location
     bigquery_dataset = bigquery_client.create_dataset(dataset, exists_ok=True)
-    if dataset_new_labels:
-        logger.info(f'ADDING LABELS FOR DATASET: ${dataset_name}')
-        bigquery_dataset.labels = _prepare_labels(bigquery_dataset.labels, dataset_new_labels)
-        return bigquery_client.update_dataset(bigquery_dataset, ["labels"])
-    return bigquery_dataset
-
-
-def _prepare_labels(labels: Dict[str, str], new_labels: Dict[str, str]) -> Dict[str, str]:
-    labels_to_remove = {label_to_remove: None for label_to_remove in labels}
-    labels_to_remove.update(new_labels)
-    return labels_to_remove
+    return labels.reconcile_dataset_labels(bigquery_client, bigquery_dataset, dataset_new_labels)
 
 
 def random_uuid(suffix='') -> str:
@@ -459,16 +1188,49 @@ def upsert_tables_labels(
         dataset_name: str,
         tables_labels: Dict[str, Dict[str, str]] | None,
         bigquery_client: 'google.cloud.bigquery.Client'):
-    from google.cloud.exceptions import NotFound
-    if tables_labels:
-        for table_name, labels in tables_labels.items():
-            logger.info(f'ADDING LABELS FOR TABLE: ${table_name}')
-            try:
-                table = bigquery_client.get_table(dataset_name + '.' + table_name)
-            except NotFound:
-                continue
-            table.labels = _prepare_labels(table.labels, tables_labels[table_name])
-            bigquery_client.update_table(table, ["labels"])
+    labels.reconcile_tables_labels(bigquery_client, dataset_name, tables_labels)
+
+
+def _is_retryable(error: BaseException) -> bool:
+    from google.api_core import exceptions
+    return isinstance(error, (
+        exceptions.TooManyRequests,
+        exceptions.InternalServerError,
+        exceptions.BadGateway,
+        exceptions.ServiceUnavailable,
+        exceptions.GatewayTimeout,
+        ConnectionError,
+    ))
+
+
+def create_query_pool(max_concurrent_queries: int) -> concurrent.futures.ThreadPoolExecutor:
+    return concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent_queries, thread_name_prefix='bigquery-query')
+
+
+def _frozen_labels(labels: Dict[str, str] | None) -> tp.Tuple[tp.Tuple[str, str], ...]:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _ensure_shared_dataset(
+        resources: 'bigflow.resource_context.ResourceContext',
+        project_id: str,
+        credentials: 'google.auth.credentials.Credentials' | None,
+        location: str,
+        dataset_name: str,
+        dataset_labels: Dict[str, str] | None,
+        tables_labels: Dict[str, Dict[str, str]] | None,
+) -> tp.Tuple['google.cloud.bigquery.Client', 'google.cloud.bigquery.Dataset']:
+    client = resources.get_or_create(
+        ('bigquery_client', project_id, credentials, location),
+        lambda: create_bigquery_client(project_id, credentials, location))
+    dataset = resources.get_or_create(
+        ('bigquery_dataset', project_id, dataset_name, location, _frozen_labels(dataset_labels)),
+        lambda: create_dataset(dataset_name, client, location, dataset_labels))
+    resources.once(
+        ('bigquery_tables_labels', project_id, dataset_name,
+         tuple((table, _frozen_labels(table_labels)) for table, table_labels in sorted((tables_labels or {}).items()))),
+        lambda: upsert_tables_labels(dataset_name, tables_labels, client))
+    return client, dataset
 
 
 def create_dataset_manager(
@@ -482,7 +1244,9 @@ def create_dataset_manager(
         location: str = DEFAULT_LOCATION,
         logger: Logger | None = None,
         tables_labels: Dict[str, Dict[str, str]] | None = None,
-        dataset_labels: Dict[str, str] | None = None
+        dataset_labels: Dict[str, str] | None = None,
+        resources: 'bigflow.resource_context.ResourceContext' | None = None,
+        max_concurrent_queries: int = DEFAULT_MAX_CONCURRENT_QUERIES,
 ) -> tp.Tuple[str, PartitionedDatasetManager]:
     """
     Dataset manager factory.
@@ -501,6 +1265,14 @@ def create_dataset_manager(
     :param logger: custom logger.
     :param tables_labels: Dict with key as table_name and value as list of key/valued labels.
     :param dataset_labels: Dict with key/valued labels.
+     Only changed labels are updated. Labels are left untouched when the `BIGFLOW_SKIP_LABELS` environment variable is set
+     (labels are reconciled on deploy with `bigflow reconcile-labels`).
+    :param resources: workflow-scoped resource context. When provided, the BigQuery client is reused and
+     the dataset and labels are ensured only once for all dataset managers created with this context,
+     and they share the cache of existing tables.
+    :param max_concurrent_queries: max number of statements submitted with `*_async` methods running at the same time.
+     With `resources`, the pool running them is shared by all dataset managers created with this context
+     (and the same `max_concurrent_queries`), otherwise it's shut down by `close` when the component ends.
     :return: tuple (full dataset ID, dataset manager).
     """
     dataset_name = dataset_name or random_uuid(suffix='_test_case')
@@ -510,12 +1282,26 @@ def create_dataset_manager(
     if logger is None:
         logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s', level=logging.INFO)
         logger = logging.getLogger(__name__)
-
-    client = create_bigquery_client(project_id, credentials, location)
-    dataset = create_dataset(dataset_name, client, location, dataset_labels)
-
-    upsert_tables_labels(dataset_name, tables_labels, client)
-
-    core_dataset_manager = DatasetManager(client, dataset, logger)
+    if labels.skip_labels():
+        tables_labels, dataset_labels = None, None
+
+    if resources is None:
+        client = create_bigquery_client(project_id, credentials, location)
+        dataset = create_dataset(dataset_name, client, location, dataset_labels)
+        upsert_tables_labels(dataset_name, tables_labels, client)
+        table_cache = None
+        executor = None
+    else:
+        client, dataset = _ensure_shared_dataset(
+            resources, project_id, credentials, location, dataset_name, dataset_labels, tables_labels)
+        table_cache = resources.get_or_create(
+            ('bigquery_table_cache', project_id, dataset_name, location),
+            lambda: TableMetadataCache(client, dataset))
+        executor = resources.get_or_create(
+            ('bigquery_query_pool', max_concurrent_queries),
+            lambda: create_query_pool(max_concurrent_queries))
+
+    core_dataset_manager = DatasetManager(
+        client, dataset, logger, table_cache, max_concurrent_queries, executor=executor)
     templated_dataset_manager = TemplatedDatasetManager(core_dataset_manager, internal_tables, external_tables, extras, runtime)
     return dataset.full_dataset_id.replace(':', '.'), PartitionedDatasetManager(templated_dataset_manager, get_partition_from_run_datetime_or_none(runtime))
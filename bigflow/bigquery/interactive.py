@@ -2,7 +2,6 @@ import functools
 import hashlib
 import logging
 
-from inspect import getfullargspec
 
 import typing
 from pathlib import Path
@@ -15,7 +14,15 @@ import bigflow
 from .job import Job
 from .job import DEFAULT_RETRY_COUNT
 from .job import DEFAULT_RETRY_PAUSE_SEC
-from .dataset_manager import DEFAULT_LOCATION
+from .job import component_signature
+from .job import close_dataset_managers
+from .dataset_manager import DEFAULT_LOCATION, PartitionedDatasetManager
+from .dataset_manager import check_sql_placeholders, get_partition_from_run_datetime_or_none
+from . import readiness
+from .operations import DEFAULT_MAX_CONCURRENT_OPERATIONS, OperationGraph, OperationRecorder
+from .plan import create_recording_dataset_manager
+from .result_cache import QueryResultCache, has_unresolved_tables, is_cacheable, referenced_tables
+from .sampling import peek_query
 from .interface import Dataset, DEFAULT_RUNTIME
 from .. import public
 
@@ -77,6 +84,7 @@ class InteractiveDatasetManager(Dataset):
         logger.debug("Create InteractiveDatasetManager, config %s", self.config._as_dict())
 
     def write_truncate(self, table_name, sql, partitioned=True):
+        self._check_placeholders(sql)
         method = 'write_truncate'
         return self._tmp_interactive_component_factory(
             generate_component_name(method=method, table_name=table_name, sql=sql),
@@ -87,6 +95,7 @@ class InteractiveDatasetManager(Dataset):
             operation_name=DEFAULT_OPERATION_NAME)
 
     def write_append(self, table_name, sql, partitioned=True):
+        self._check_placeholders(sql)
         method = 'write_append'
         return self._tmp_interactive_component_factory(
             generate_component_name(method=method, table_name=table_name, sql=sql),
@@ -97,6 +106,7 @@ class InteractiveDatasetManager(Dataset):
             operation_name=DEFAULT_OPERATION_NAME)
 
     def write_tmp(self, table_name, sql):
+        self._check_placeholders(sql)
         method = 'write_tmp'
         return self._tmp_interactive_component_factory(
             generate_component_name(method=method, table_name=table_name, sql=sql),
@@ -106,6 +116,7 @@ class InteractiveDatasetManager(Dataset):
             operation_name=DEFAULT_OPERATION_NAME)
 
     def collect(self, sql):
+        self._check_placeholders(sql)
         method = 'collect'
         return self._tmp_interactive_component_factory(
             generate_component_name(method=method, table_name='', sql=sql),
@@ -114,6 +125,7 @@ class InteractiveDatasetManager(Dataset):
             operation_name=DEFAULT_OPERATION_NAME)
 
     def collect_list(self, sql: str, record_as_dict: bool = False):
+        self._check_placeholders(sql)
         method = 'collect_list'
         return self._tmp_interactive_component_factory(
             generate_component_name(method=method, table_name='', sql=sql),
@@ -123,6 +135,7 @@ class InteractiveDatasetManager(Dataset):
             operation_name=DEFAULT_OPERATION_NAME)
 
     def dry_run(self, sql):
+        self._check_placeholders(sql)
         method = 'dry_run'
         return self._tmp_interactive_component_factory(
             generate_component_name(method=method, table_name='', sql=sql),
@@ -182,6 +195,10 @@ class InteractiveDatasetManager(Dataset):
             method,
             operation_name=DEFAULT_OPERATION_NAME)
 
+    def _check_placeholders(self, sql):
+        check_sql_placeholders(sql, [
+            *self.config.internal_tables, *self.config.external_tables, *self.config.extras, 'dt'])
+
     def _tmp_interactive_component_factory(self, component_name, method, *args, **kwargs):
         logger.debug("Build tmp interactive component, name=%s, method=%s", component_name, method)
 
@@ -234,17 +251,81 @@ class InteractiveComponent(object):
             **dependency_config)
 
     @log_syntax_error
-    def run(self, runtime=DEFAULT_RUNTIME, operation_name=None):
+    def run(
+            self,
+            runtime=DEFAULT_RUNTIME,
+            operation_name=None,
+            cache=True,
+            upstream=False,
+            max_concurrent_operations=DEFAULT_MAX_CONCURRENT_OPERATIONS):
+        """Runs the component (or its single operation).  Results of `collect` are cached
+        on disk (see `QueryResultCache`), unless `cache` is False.
+
+        With `upstream` (the operation together with all the operations it depends on)
+        or `max_concurrent_operations` > 1, operations are recorded first (see `operations`),
+        then run in the order of their dependencies, and their results are returned."""
+        if upstream or max_concurrent_operations > 1:
+            return self._run_operations(runtime, operation_name, upstream, cache, max_concurrent_operations)
         _, component_callable = decorate_component_dependencies_with_operation_level_dataset_manager(
-            self._standard_component, operation_name=operation_name)
+            self._standard_component, operation_name=operation_name, result_cache=_result_cache(cache))
         job = Job(component_callable, **self._dependency_config)
         logger.info("Run interactive component, id=%s, component %s", job.id, job.component)
         return job.execute(bigflow.JobContext.make(runtime=runtime))
 
+    def operations(self, runtime=DEFAULT_RUNTIME) -> OperationGraph:
+        """Records operations of the component, without running them (collects return empty results),
+        and returns the graph of dependencies between them."""
+        recorder = OperationRecorder()
+        _, component_callable = decorate_component_dependencies_with_operation_level_dataset_manager(
+            self._standard_component, recorder=recorder)
+        job = Job(component_callable, **self._dependency_config)
+        logger.info("Record operations of interactive component, id=%s", job.id)
+        job._run_component(job._build_dependencies(
+            bigflow.JobContext.make(runtime=runtime).runtime_str,
+            dataset_manager_factory=create_recording_dataset_manager))
+        return OperationGraph(recorder.operations)
+
+    def _run_operations(self, runtime, operation_name, upstream, cache, max_concurrent_operations):
+        graph = self.operations(runtime)
+        if operation_name is None:
+            operations = graph.operations
+        elif upstream:
+            operations = graph.upstream(operation_name)
+        else:
+            operations = [operation for operation in graph.operations if operation.name == operation_name]
+
+        job = Job(self._standard_component, **self._dependency_config)
+        result_cache = _result_cache(cache)
+        dependencies = job._build_dependencies(bigflow.JobContext.make(runtime=runtime).runtime_str)
+        datasets = {
+            alias: OperationLevelDatasetManager(dataset_manager, peek=None, result_cache=result_cache)
+            for alias, dataset_manager in dependencies.items()
+        }
+        logger.info("Run %d operations of interactive component, id=%s", len(operations), job.id)
+        try:
+            return graph.execute(
+                lambda operation: getattr(datasets[operation.alias], operation.method)(**operation.arguments),
+                operations,
+                max_concurrent_operations)
+        finally:
+            close_dataset_managers(dependencies)
+
     @log_syntax_error
-    def peek(self, runtime, operation_name=DEFAULT_OPERATION_NAME, limit=DEFAULT_PEEK_LIMIT):
+    def peek(
+            self,
+            runtime,
+            operation_name=DEFAULT_OPERATION_NAME,
+            limit=DEFAULT_PEEK_LIMIT,
+            cache=True,
+            sample_percent=None,
+            columns=None,
+            maximum_bytes_billed=None):
         """Returns the result of the specified operation in the form of the pandas.DataFrame, without really running the
-        operation and affecting the table."""
+        operation and affecting the table.  The result is cached on disk, unless `cache` is False.
+
+        To make peeking huge tables cheap, pass `sample_percent` (tables are read with `TABLESAMPLE SYSTEM`),
+        `columns` (the result is projected to them, so BigQuery reads only the columns they depend on)
+        and `maximum_bytes_billed` (the query fails, without charges, when it would bill more)."""
 
         if runtime is None:
             raise ValueError(f"'runtime' can't be None")
@@ -252,9 +333,13 @@ class InteractiveComponent(object):
             raise ValueError(f"'operation_name' can't be None")
         if limit is None:
             raise ValueError(f"'limit' can't be None")
+        if sample_percent is not None and not 0 < sample_percent <= 100:
+            raise ValueError(f"'sample_percent' should be in (0, 100], got {sample_percent}")
 
         results_container, component_callable = decorate_component_dependencies_with_operation_level_dataset_manager(
-            self._standard_component, operation_name=operation_name, peek=True, peek_limit=limit)
+            self._standard_component, operation_name=operation_name, peek=True, peek_limit=limit,
+            result_cache=_result_cache(cache), peek_sample_percent=sample_percent, peek_columns=columns,
+            maximum_bytes_billed=maximum_bytes_billed)
 
         job = Job(component_callable, **self._dependency_config)
         job.execute(bigflow.JobContext.make(runtime=runtime))
@@ -272,11 +357,22 @@ class InteractiveComponent(object):
         return component_callable(**kwargs)
 
 
+def _result_cache(cache):
+    if cache is True:
+        return QueryResultCache()
+    return cache or None
+
+
 def decorate_component_dependencies_with_operation_level_dataset_manager(
         standard_component,
         operation_name=None,
         peek=None,
-        peek_limit=None):
+        peek_limit=None,
+        result_cache=None,
+        recorder=None,
+        peek_sample_percent=None,
+        peek_columns=None,
+        maximum_bytes_billed=None):
 
     logger.debug(
         "Decorate component dependencies with operation level dataset manager: component %s, operation %s, peek %s/%s",
@@ -284,10 +380,21 @@ def decorate_component_dependencies_with_operation_level_dataset_manager(
     )
 
     operation_settings = {'operation_name': operation_name, 'peek': peek, 'peek_limit': peek_limit}
+    if result_cache is not None:
+        operation_settings['result_cache'] = result_cache
+    if recorder is not None:
+        operation_settings['recorder'] = recorder
+    if peek_sample_percent is not None:
+        operation_settings['peek_sample_percent'] = peek_sample_percent
+    if peek_columns:
+        operation_settings['peek_columns'] = peek_columns
+    if maximum_bytes_billed is not None:
+        operation_settings['maximum_bytes_billed'] = maximum_bytes_billed
     results_container = []
 
-    def component_callable(**kwargs):
-        operation_level_dataset_managers = {k: OperationLevelDatasetManager(v, **operation_settings)
+    def component_callable(*args, **kwargs):
+        kwargs.update(zip(component_signature(standard_component).parameters, args))
+        operation_level_dataset_managers = {k: OperationLevelDatasetManager(v, alias=k, **operation_settings)
                                             for k, v in kwargs.items()}
 
         component_return_value = standard_component(**operation_level_dataset_managers)
@@ -298,34 +405,58 @@ def decorate_component_dependencies_with_operation_level_dataset_manager(
 
         return component_return_value
 
-    component_callable_with_proper_signature = "def reworked_function({signature}):\n    return original_func({kwargs})\n".format(
-        signature=','.join([arg for arg in getfullargspec(standard_component).args]),
-        kwargs=','.join(['{arg}={arg}'.format(arg=arg) for arg in getfullargspec(standard_component).args]))
-
-    logger.debug("Compile dynamic python code\n%s", component_callable_with_proper_signature)
-    component_callable_with_proper_signature_code = compile(component_callable_with_proper_signature, "fakesource",
-                                                            "exec")
-    fake_locals = {}
-    eval(component_callable_with_proper_signature_code, {'original_func': component_callable}, fake_locals)
-
-    component_callable = fake_locals['reworked_function']
+    # the wrapper keeps the signature of the component, which tells the job which datasets to pass
+    component_callable = functools.wraps(standard_component)(component_callable)
+    component_callable.__signature__ = component_signature(standard_component)
     component_callable.__name__ = operation_name or standard_component.__name__
 
     return results_container, component_callable
 
 
+def recorded(method):
+    """Records calls of the operation, when the dataset manager records operations (see `OperationRecorder`)."""
+
+    @functools.wraps(method)
+    def decorated(self, *args, **kwargs):
+        if self._recorder is not None:
+            arguments = component_signature(method).bind(self, *args, **kwargs).arguments
+            self._recorder.record(self, self._alias, method.__name__, {
+                name: value for name, value in arguments.items() if name != 'self'})
+        return method(self, *args, **kwargs)
+
+    return decorated
+
+
 class OperationLevelDatasetManager(Dataset):
     """
     Let's you run specified operation or peek a result of a specified operation.
     """
 
-    def __init__(self, dataset_manager, peek=False, operation_name=None, peek_limit=DEFAULT_PEEK_LIMIT):
+    def __init__(
+            self,
+            dataset_manager,
+            peek=False,
+            operation_name=None,
+            peek_limit=DEFAULT_PEEK_LIMIT,
+            result_cache=None,
+            recorder=None,
+            alias=None,
+            peek_sample_percent=None,
+            peek_columns=None,
+            maximum_bytes_billed=None):
         self._dataset_manager = dataset_manager
         self._peek = peek
         self._operation_name = operation_name
         self._peek_limit = peek_limit
+        self._peek_sample_percent = peek_sample_percent
+        self._peek_columns = peek_columns
+        self._maximum_bytes_billed = maximum_bytes_billed
+        self._result_cache = result_cache
+        self._recorder = recorder
+        self._alias = alias
         self._results_container = []
 
+    @recorded
     def write_truncate(self, table_name, sql, partitioned=True, custom_run_datetime=None, operation_name=None):
         return self._run_operation(
             operation_name=operation_name,
@@ -335,6 +466,7 @@ class OperationLevelDatasetManager(Dataset):
             partitioned=partitioned,
             custom_run_datetime=custom_run_datetime)
 
+    @recorded
     def write_append(self, table_name, sql, partitioned=True, custom_run_datetime=None, operation_name=None):
         return self._run_operation(
             operation_name=operation_name,
@@ -344,6 +476,7 @@ class OperationLevelDatasetManager(Dataset):
             partitioned=partitioned,
             custom_run_datetime=custom_run_datetime)
 
+    @recorded
     def write_tmp(self, table_name, sql, custom_run_datetime=None, operation_name=None):
         return self._run_operation(
             operation_name=operation_name,
@@ -352,13 +485,20 @@ class OperationLevelDatasetManager(Dataset):
             table_name=table_name,
             custom_run_datetime=custom_run_datetime)
 
+    @recorded
     def collect(self, sql, custom_run_datetime=None, operation_name=None):
         return self._run_operation(
             operation_name=operation_name,
-            method=self._dataset_manager.collect,
+            method=self._collect_cached,
             sql=sql,
             custom_run_datetime=custom_run_datetime)
 
+    def _collect_cached(self, sql, custom_run_datetime=None):
+        return self._cached(
+            sql, custom_run_datetime,
+            lambda: self._dataset_manager.collect(sql=sql, custom_run_datetime=custom_run_datetime))
+
+    @recorded
     def collect_list(
             self,
             sql: str,
@@ -372,6 +512,7 @@ class OperationLevelDatasetManager(Dataset):
             custom_run_datetime=custom_run_datetime,
             record_as_dict=record_as_dict)
 
+    @recorded
     def dry_run(self, sql, custom_run_datetime=None, operation_name=None):
         return self._run_operation(
             operation_name=operation_name,
@@ -379,10 +520,12 @@ class OperationLevelDatasetManager(Dataset):
             sql=sql,
             custom_run_datetime=custom_run_datetime)
 
+    @recorded
     def create_table(self, create_query, operation_name=None):
         if self._should_run_operation(operation_name):
             return self._results_container, self._dataset_manager.create_table(create_query=create_query)
 
+    @recorded
     def load_table_from_dataframe(self, table_name, df, partitioned=True, custom_run_datetime=None, operation_name=None):
         if self._should_peek_operation_results(operation_name):
             return df
@@ -393,6 +536,7 @@ class OperationLevelDatasetManager(Dataset):
                 custom_run_datetime=custom_run_datetime,
                 partitioned=partitioned)
 
+    @recorded
     def create_table_from_schema(
             self,
             table_name: str,
@@ -405,6 +549,7 @@ class OperationLevelDatasetManager(Dataset):
                 schema=schema,
                 table=table)
 
+    @recorded
     def insert(
             self,
             table_name: str,
@@ -419,6 +564,7 @@ class OperationLevelDatasetManager(Dataset):
                 records=records,
                 partitioned=partitioned)
 
+    @recorded
     def delete_dataset(self, operation_name=None):
         if self._should_run_operation(operation_name):
             return self._results_container, self._dataset_manager.remove_dataset()
@@ -427,6 +573,9 @@ class OperationLevelDatasetManager(Dataset):
     def dt(self):
         return self._dataset_manager.runtime_str
 
+    def render(self, sql, custom_run_datetime=None):
+        return self._dataset_manager.render(sql, custom_run_datetime)
+
     @property
     def extras(self):
         return self._dataset_manager.extras
@@ -456,8 +605,47 @@ class OperationLevelDatasetManager(Dataset):
         return self._dataset_manager.external_tables
 
     def _collect_select_result_to_pandas(self, sql):
-        sql = sql if 'limit' in sql.lower() else sql + '\nLIMIT {}'.format(str(self._peek_limit))
-        return self._dataset_manager.collect(sql)
+        sql = peek_query(sql, self._peek_limit, self._peek_sample_percent, self._peek_columns)
+        if self._maximum_bytes_billed is None:
+            return self._cached(sql, None, lambda: self._dataset_manager.collect(sql))
+        return self._cached(sql, None, lambda: self._dataset_manager.collect(
+            sql, maximum_bytes_billed=self._maximum_bytes_billed))
+
+    def _cached(self, sql, custom_run_datetime, collect):
+        key = self._result_cache_key(sql, custom_run_datetime)
+        if key is None:
+            return collect()
+        result = self._result_cache.get(key)
+        if result is None:
+            result = collect()
+            import pandas as pd
+            if isinstance(result, pd.DataFrame):
+                self._result_cache.put(key, result)
+        return result
+
+    def _result_cache_key(self, sql, custom_run_datetime):
+        # the key needs the rendered SQL and metadata of tables, available only from BigQuery dataset managers
+        if self._result_cache is None or not isinstance(self._dataset_manager, PartitionedDatasetManager):
+            return None
+        try:
+            rendered_sql = self._dataset_manager.render(sql, custom_run_datetime)
+            if not is_cacheable(rendered_sql) or has_unresolved_tables(rendered_sql, self.project_id):
+                return None
+            tables = referenced_tables(rendered_sql, default_project=self.project_id)
+            if not tables:
+                return None
+            tables_modified = {}
+            for table_id in tables:
+                table = self.client.get_table(table_id)
+                # data of views and external tables changes without changes of their modification time
+                if table.table_type != 'TABLE':
+                    logger.debug("Don't cache result of the query, %s is a %s", table_id, table.table_type)
+                    return None
+                tables_modified[table_id] = table.modified.isoformat()
+            return self._result_cache.key(rendered_sql, custom_run_datetime or self.dt, tables_modified)
+        except Exception as e:
+            logger.debug("Don't cache result of the query, unable to get modification time of its tables: %s", e)
+            return None
 
     def _run_operation(self, operation_name, method, sql, *args, **kwargs):
         if self._should_peek_operation_results(operation_name):
@@ -514,24 +702,64 @@ class DatasetConfigInternal(object):
         }
 
 
-def sensor(table_alias, where_clause, ds=None):
+def sensor(
+        table_alias,
+        where_clause=None,
+        ds=None,
+        mode=readiness.SENSOR_MODE_QUERY,
+        partition=None,
+        timeout_sec=readiness.DEFAULT_SENSOR_TIMEOUT_SEC,
+        poll_interval_sec=readiness.DEFAULT_POLL_INTERVAL_SEC,
+        max_poll_interval_sec=readiness.DEFAULT_MAX_POLL_INTERVAL_SEC):
+    """
+    Waits for a table.  In the 'query' mode (default), checks once if the table has rows matching `where_clause`.
 
-    def sensor_function(ds):
+    In the 'metadata' mode, `table_alias` may be a list of aliases.  The sensor checks (with one metadata query
+    per dataset) that all the tables have rows in the `partition` ('YYYYMMDD' of the runtime by default, may use
+    `{dt}`), or any rows when they aren't partitioned.  Only then `where_clause` (if given) is checked with a query.
+    Checks are repeated in-process, with growing pauses, for up to `timeout_sec`.
+    """
+    if mode not in (readiness.SENSOR_MODE_QUERY, readiness.SENSOR_MODE_METADATA):
+        raise ValueError(f"Unknown sensor mode {mode!r}")
+    table_aliases = [table_alias] if isinstance(table_alias, str) else list(table_alias)
+    if mode == readiness.SENSOR_MODE_QUERY and (where_clause is None or len(table_aliases) != 1):
+        raise ValueError("The 'query' mode requires a single table_alias and a where_clause")
+
+    def table_ready(ds, alias):
         result = ds.collect('''
         SELECT count(*) > 0 as table_ready
         FROM `{%(table_alias)s}`
         WHERE %(where_clause)s
         ''' % {
-            'table_alias': table_alias,
+            'table_alias': alias,
             'where_clause': where_clause
         })
+        return result.iloc[0]['table_ready']
+
+    def sensor_function(ds):
+        alias, = table_aliases
+        if not table_ready(ds, alias):
+            raise ValueError('{} is not ready'.format(alias))
+
+    def metadata_sensor_function(ds):
+        table_ids = {ds.render('{%s}' % alias): alias for alias in table_aliases}
+        partition_id = ds.render(partition) if partition else get_partition_from_run_datetime_or_none(ds.render('{dt}'))
+        not_ready = set(table_aliases)
+
+        def check():
+            ready = readiness.ready_tables(ds, [t for t, alias in table_ids.items() if alias in not_ready], partition_id)
+            for table_id in ready:
+                alias = table_ids[table_id]
+                if where_clause is None or table_ready(ds, alias):
+                    not_ready.discard(alias)
+            return not_ready
 
-        if not result.iloc[0]['table_ready']:
-            raise ValueError('{} is not ready'.format(table_alias))
+        readiness.poll(check, timeout_sec, poll_interval_sec, max_poll_interval_sec)
 
-    sensor_function.__name__ = 'wait_for_{}'.format(table_alias)
+    function = sensor_function if mode == readiness.SENSOR_MODE_QUERY else metadata_sensor_function
+    function.__name__ = 'wait_for_{}'.format('_'.join(table_aliases))
 
-    return sensor_function if ds is None else interactive_component(ds=ds)(sensor_function)
+    return function if ds is None else interactive_component(ds=ds)(function)
 
 
 @public(deprecate_reason="Pass labels as arguments to DatasetConfig")
@@ -1,9 +1,14 @@
+import asyncio
+import inspect
+import typing as tp
+import weakref
+
 import bigflow
 
-from inspect import getargspec
+from inspect import iscoroutinefunction
 
 from bigflow.workflow import DEFAULT_EXECUTION_TIMEOUT_IN_SECONDS
-from .dataset_manager import create_dataset_manager
+from .dataset_manager import create_dataset_manager, PartitionedDatasetManager
 
 import logging
 logger = logging.getLogger(__name__)
@@ -11,6 +16,39 @@ logger = logging.getLogger(__name__)
 DEFAULT_RETRY_COUNT = 3
 DEFAULT_RETRY_PAUSE_SEC = 60
 
+_component_signatures = weakref.WeakKeyDictionary()
+
+
+def component_signature(component) -> inspect.Signature:
+    """Returns the signature of the component, cached per component."""
+    try:
+        return _component_signatures[component]
+    except (KeyError, TypeError):
+        pass
+    signature = inspect.signature(component)
+    try:
+        _component_signatures[component] = signature
+    except TypeError:
+        # not weak-referenceable, so not cached
+        pass
+    return signature
+
+
+def component_dependencies(component) -> tp.List[str]:
+    """Returns names of (positional) arguments of the component, which are names of its dataset dependencies."""
+    return [
+        name
+        for name, parameter in component_signature(component).parameters.items()
+        if parameter.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    ]
+
+
+def close_dataset_managers(dependencies: tp.Dict[str, tp.Any]) -> None:
+    """Shuts down the query pools of dataset managers when the component ends, so their threads don't leak."""
+    for dataset_manager in dependencies.values():
+        if isinstance(dataset_manager, PartitionedDatasetManager):
+            dataset_manager.close()
+
 
 class Job(bigflow.Job):
 
@@ -32,24 +70,58 @@ class Job(bigflow.Job):
 
     def execute(self, context: bigflow.JobContext):
         logger.info("Execute job %s: %s", self.id, context)
-        return self._run_component(self._build_dependencies(context.runtime_str))
+        return self._run_component(self._build_dependencies(context.runtime_str, context.resources))
+
+    @property
+    def execute_async(self):
+        """Used by the 'asyncio' workflow executor, `None` for blocking components.
+
+        Only components defined with `async def` are awaited on the event loop.  Blocking components
+        wait for their statements in a thread, so they are executed like other blocking jobs -
+        in the worker pool of the executor, one thread per running job (bounded by `max_workers`).
+        Async components don't hold a thread while their statements run when they await
+        `asyncio.wrap_future(ds.<method>_async(...))` - statements are executed by the bounded
+        pool of the dataset manager (`max_concurrent_queries`).
+        """
+        if iscoroutinefunction(self._component):
+            return self._execute_component_async
+        return None
+
+    async def _execute_component_async(self, context: bigflow.JobContext):
+        logger.info("Execute job %s asynchronously: %s", self.id, context)
+        # creating dataset managers may call BigQuery (creates the dataset), so it's done in a thread
+        dependencies = await asyncio.get_running_loop().run_in_executor(
+            None, self._build_dependencies, context.runtime_str, context.resources)
+        try:
+            return await self._component(**dependencies)
+        finally:
+            close_dataset_managers(dependencies)
 
-    def _build_dependencies(self, runtime):
+    def _build_dependencies(self, runtime, resources=None, dataset_manager_factory=None):
         deps = {
             dependency_name: self._build_dependency(
                 dependency_config=self._find_config(dependency_name),
-                runtime=runtime)
+                runtime=runtime,
+                resources=resources,
+                dataset_manager_factory=dataset_manager_factory)
             for dependency_name in self._component_dependencies
         }
         logger.debug("Dependencies for %s are: %s", self.id, deps)
         return deps
 
     def _run_component(self, dependencies):
-        return self.component(**dependencies)
+        try:
+            result = self.component(**dependencies)
+            if asyncio.iscoroutine(result):
+                # async component executed outside of the 'asyncio' executor
+                result = asyncio.run(result)
+            return result
+        finally:
+            close_dataset_managers(dependencies)
 
     @property
     def _component_dependencies(self):
-        cdeps = [dependency_name for dependency_name in getargspec(self._component).args]
+        cdeps = component_dependencies(self._component)
         logger.debug("Component dependencies for %s are: %s", self.id, cdeps)
         return cdeps
 
@@ -64,9 +136,15 @@ class Job(bigflow.Job):
                 return config
         raise ValueError("Can't find config for dependency: " + target_dependency_name)
 
-    def _build_dependency(self, dependency_config, runtime):
+    def _build_dependency(self, dependency_config, runtime, resources=None, dataset_manager_factory=None):
         logger.debug("Build dataset manager for config %s", dependency_config)
-        _, dataset_manager = create_dataset_manager(
+        if resources is not None:
+            # clients, datasets and labels are shared by all jobs of the workflow
+            extra_kwargs = {'resources': resources}
+        else:
+            extra_kwargs = {}
+        _, dataset_manager = (dataset_manager_factory or create_dataset_manager)(
             runtime=runtime,
-            **dependency_config._as_dict())
+            **dependency_config._as_dict(),
+            **extra_kwargs)
         return dataset_manager
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""Reconciliation of dataset and table labels.
+
+Labels are compared with the current ones first, so only changed tables are updated,
+and only with the changed labels.  Tables are read and updated concurrently.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import os
+import typing as tp
+
+from bigflow.commons import public
+
+if tp.TYPE_CHECKING:
+    import bigflow
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+
+# set in an environment where labels are reconciled by `bigflow reconcile-labels` on deploy
+SKIP_LABELS_ENV = 'BIGFLOW_SKIP_LABELS'
+
+
+def labels_diff(current: tp.Mapping[str, str] | None, desired: tp.Mapping[str, str]) -> tp.Dict[str, str | None]:
+    """Returns labels to patch - changed or added labels, and `None` for labels to remove."""
+    current = current or {}
+    diff: tp.Dict[str, str | None] = {k: None for k in current if k not in desired}
+    diff.update({k: v for k, v in desired.items() if current.get(k) != v})
+    return diff
+
+
+def skip_labels() -> bool:
+    return os.environ.get(SKIP_LABELS_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+def reconcile_dataset_labels(
+        client: 'google.cloud.bigquery.Client',
+        dataset: 'google.cloud.bigquery.Dataset',
+        labels: tp.Mapping[str, str] | None) -> 'google.cloud.bigquery.Dataset':
+    """Updates labels of the dataset, when they differ from `labels`.  Returns the (updated) dataset."""
+    if not labels:
+        return dataset
+    diff = labels_diff(dataset.labels, labels)
+    if not diff:
+        logger.debug("Labels of dataset %s are up to date", dataset.dataset_id)
+        return dataset
+    logger.info("Update labels of dataset %s: %s", dataset.dataset_id, diff)
+    dataset.labels = diff
+    return client.update_dataset(dataset, ["labels"])
+
+
+def reconcile_tables_labels(
+        client: 'google.cloud.bigquery.Client',
+        dataset_name: str,
+        tables_labels: tp.Mapping[str, tp.Mapping[str, str]] | None,
+        max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS) -> tp.List[str]:
+    """
+    Updates labels of tables in the dataset, only when they differ from `tables_labels`.
+    Missing tables are skipped.  Returns names of updated tables.
+    """
+    if not tables_labels:
+        return []
+    from google.cloud.exceptions import NotFound
+
+    def get_table(table_name):
+        try:
+            return client.get_table(f"{dataset_name}.{table_name}")
+        except NotFound:
+            logger.debug("Table %s.%s doesn't exist, skip its labels", dataset_name, table_name)
+            return None
+
+    def update_table(table, diff):
+        logger.info("Update labels of table %s: %s", table.table_id, diff)
+        table.labels = diff
+        return client.update_table(table, ["labels"])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent_requests) as executor:
+        tables = dict(zip(tables_labels, executor.map(get_table, tables_labels)))
+        updates = {}
+        for table_name, table in tables.items():
+            if table is None:
+                continue
+            diff = labels_diff(table.labels, tables_labels[table_name])
+            if diff:
+                updates[table_name] = executor.submit(update_table, table, diff)
+        for future in updates.values():
+            future.result()
+
+    logger.debug("Labels of %d tables in %s updated, %d up to date",
+                 len(updates), dataset_name, sum(t is not None for t in tables.values()) - len(updates))
+    return sorted(updates)
+
+
+@public()
+def reconcile_labels(
+        project_id: str,
+        dataset_name: str,
+        tables_labels: tp.Mapping[str, tp.Mapping[str, str]] | None = None,
+        dataset_labels: tp.Mapping[str, str] | None = None,
+        credentials: 'google.auth.credentials.Credentials' | None = None,
+        location: str | None = None,
+        max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+        **_) -> tp.List[str]:
+    """Updates labels of an existing dataset and its tables.  Accepts the dataset config (`_as_dict()`) as kwargs."""
+    from .dataset_manager import DEFAULT_LOCATION, create_bigquery_client
+    from google.cloud.exceptions import NotFound
+
+    client = create_bigquery_client(project_id, credentials, location or DEFAULT_LOCATION)
+    if dataset_labels:
+        try:
+            dataset = client.get_dataset(f"{project_id}.{dataset_name}")
+        except NotFound:
+            logger.info("Dataset %s.%s doesn't exist, skip its labels", project_id, dataset_name)
+            return []
+        reconcile_dataset_labels(client, dataset, dataset_labels)
+    return reconcile_tables_labels(client, dataset_name, tables_labels, max_concurrent_requests)
+
+
+def _merge_labels(target: tp.Dict[str, str], labels: tp.Mapping[str, str], owner: str) -> None:
+    for key, value in labels.items():
+        if target.get(key, value) != value:
+            raise ValueError(f"Conflicting values of label {key} of {owner}: {target[key]!r} and {value!r}")
+        target[key] = value
+
+
+@public()
+def reconcile_workflow_labels(
+        workflow: 'bigflow.Workflow',
+        max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS) -> tp.Dict[str, tp.List[str]]:
+    """
+    Reconciles labels of all datasets used by BigQuery jobs of the workflow, each dataset once.
+    Labels of the same dataset configured by several jobs are merged, conflicting values raise `ValueError`.
+    Returns names of updated tables per dataset.
+    """
+    from .job import Job
+
+    configs = {}
+    for workflow_job in workflow._build_sequential_order():
+        job = workflow_job.job
+        if not isinstance(job, Job):
+            continue
+        for config in job.dependency_configuration.values():
+            config = config._as_dict()
+            if not (config.get('tables_labels') or config.get('dataset_labels')):
+                continue
+            dataset_id = f"{config['project_id']}.{config['dataset_name']}"
+            merged = configs.setdefault(dataset_id, {**config, 'tables_labels': {}, 'dataset_labels': {}})
+            _merge_labels(merged['dataset_labels'], config.get('dataset_labels') or {}, f"dataset {dataset_id}")
+            for table_name, labels in (config.get('tables_labels') or {}).items():
+                _merge_labels(
+                    merged['tables_labels'].setdefault(table_name, {}), labels, f"table {dataset_id}.{table_name}")
+
+    return {
+        dataset_id: reconcile_labels(**config, max_concurrent_requests=max_concurrent_requests)
+        for dataset_id, config in configs.items()
+    }
@@ -0,0 +1,230 @@
+"""Serialisation of records for BigQuery load jobs.
+
+Records are written to spooled temporary files (kept in memory until they grow over `max_memory_bytes`),
+one file per destination partition, in the Parquet, Avro or newline-delimited JSON format.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import tempfile
+import typing as tp
+
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+
+SOURCE_FORMAT_PARQUET = 'PARQUET'
+SOURCE_FORMAT_AVRO = 'AVRO'
+SOURCE_FORMAT_JSON = 'NEWLINE_DELIMITED_JSON'
+SOURCE_FORMATS = (SOURCE_FORMAT_PARQUET, SOURCE_FORMAT_AVRO, SOURCE_FORMAT_JSON)
+
+DEFAULT_SPOOL_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_ROW_GROUP_SIZE = 10000
+
+_SOURCE_FORMATS_BY_SUFFIX = {
+    '.parquet': SOURCE_FORMAT_PARQUET,
+    '.avro': SOURCE_FORMAT_AVRO,
+    '.json': SOURCE_FORMAT_JSON,
+    '.jsonl': SOURCE_FORMAT_JSON,
+    '.ndjson': SOURCE_FORMAT_JSON,
+    '.csv': 'CSV',
+    '.orc': 'ORC',
+}
+
+_AVRO_TYPES = {
+    'STRING': 'string',
+    'BYTES': 'bytes',
+    'INTEGER': 'long',
+    'INT64': 'long',
+    'FLOAT': 'double',
+    'FLOAT64': 'double',
+    'BOOLEAN': 'boolean',
+    'BOOL': 'boolean',
+    'DATE': {'type': 'int', 'logicalType': 'date'},
+    'TIME': {'type': 'long', 'logicalType': 'time-micros'},
+    'TIMESTAMP': {'type': 'long', 'logicalType': 'timestamp-micros'},
+    'DATETIME': {'type': 'string', 'logicalType': 'datetime'},
+}
+
+
+_ARROW_TYPES = {
+    'STRING': lambda pa: pa.string(),
+    'GEOGRAPHY': lambda pa: pa.string(),
+    'JSON': lambda pa: pa.string(),
+    'BYTES': lambda pa: pa.binary(),
+    'INTEGER': lambda pa: pa.int64(),
+    'INT64': lambda pa: pa.int64(),
+    'FLOAT': lambda pa: pa.float64(),
+    'FLOAT64': lambda pa: pa.float64(),
+    'NUMERIC': lambda pa: pa.decimal128(38, 9),
+    'BIGNUMERIC': lambda pa: pa.decimal256(76, 38),
+    'BOOLEAN': lambda pa: pa.bool_(),
+    'BOOL': lambda pa: pa.bool_(),
+    'DATE': lambda pa: pa.date32(),
+    'TIME': lambda pa: pa.time64('us'),
+    'TIMESTAMP': lambda pa: pa.timestamp('us', tz='UTC'),
+    'DATETIME': lambda pa: pa.timestamp('us'),
+}
+
+
+class _SpooledFile(tempfile.SpooledTemporaryFile):
+    # `io` methods missing before Python 3.11, required by fastavro and pyarrow
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def writable(self):
+        return True
+
+
+def source_format_of(path: Path) -> str:
+    try:
+        return _SOURCE_FORMATS_BY_SUFFIX[path.suffix.lower()]
+    except KeyError:
+        raise ValueError(f"Can't detect the format of {path}, please provide `source_format`")
+
+
+def partition_of(value: tp.Any) -> str:
+    """Returns the `YYYYMMDD` partition of a date, a datetime or a 'YYYY-MM-DD...' string."""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime('%Y%m%d')
+    if isinstance(value, str) and len(value) >= 10:
+        return value[:10].replace('-', '')
+    raise ValueError(f"Can't get a partition from {value!r}")
+
+
+def _field_dict(field) -> dict:
+    return field if isinstance(field, dict) else field.to_api_repr()
+
+
+def avro_schema(bigquery_schema: tp.Sequence[tp.Any], name: str = 'Record') -> dict:
+    """Converts a BigQuery schema (`SchemaField` objects or their dict representations) to an Avro schema."""
+    fields = []
+    for field in map(_field_dict, bigquery_schema):
+        field_type = field['type'].upper()
+        if field_type in ('RECORD', 'STRUCT'):
+            avro_type = avro_schema(field.get('fields', ()), name=f"{name}_{field['name']}")
+        elif field_type in _AVRO_TYPES:
+            avro_type = _AVRO_TYPES[field_type]
+        else:
+            raise ValueError(f"Type {field_type} of field {field['name']} can't be loaded from Avro, use Parquet")
+        mode = field.get('mode', 'NULLABLE').upper()
+        if mode == 'REPEATED':
+            avro_type = {'type': 'array', 'items': avro_type}
+        elif mode == 'NULLABLE':
+            avro_type = ['null', avro_type]
+        fields.append({'name': field['name'], 'type': avro_type})
+    return {'type': 'record', 'name': name, 'fields': fields}
+
+
+def arrow_schema(bigquery_schema: tp.Sequence[tp.Any]) -> 'pyarrow.Schema':
+    """Converts a BigQuery schema (`SchemaField` objects or their dict representations) to an Arrow schema."""
+    import pyarrow
+    return pyarrow.schema([_arrow_field(pyarrow, field) for field in map(_field_dict, bigquery_schema)])
+
+
+def _arrow_field(pa, field: dict) -> 'pyarrow.Field':
+    field_type = field['type'].upper()
+    if field_type in ('RECORD', 'STRUCT'):
+        arrow_type = pa.struct([_arrow_field(pa, f) for f in map(_field_dict, field.get('fields', ()))])
+    elif field_type in _ARROW_TYPES:
+        arrow_type = _ARROW_TYPES[field_type](pa)
+    else:
+        raise ValueError(f"Unsupported type {field_type} of field {field['name']}")
+    mode = field.get('mode', 'NULLABLE').upper()
+    if mode == 'REPEATED':
+        arrow_type = pa.list_(arrow_type)
+    return pa.field(field['name'], arrow_type, nullable=mode != 'REQUIRED')
+
+
+class RecordSpool:
+    """Writes records to a spooled temporary file in the given format.
+
+    Parquet files use the Arrow schema converted from `schema`, or inferred from the first row group
+    when there is no `schema` (so the first rows must not have nulls in place of values).
+    """
+
+    def __init__(
+            self,
+            source_format: str,
+            schema: tp.Sequence[tp.Any] | None = None,
+            max_memory_bytes: int = DEFAULT_SPOOL_MEMORY_BYTES,
+            row_group_size: int = DEFAULT_ROW_GROUP_SIZE):
+        if source_format not in SOURCE_FORMATS:
+            raise ValueError(f"Records can be loaded only as {', '.join(SOURCE_FORMATS)}, got {source_format!r}")
+        if source_format == SOURCE_FORMAT_AVRO and not schema:
+            raise ValueError("Schema is required to load records as Avro")
+        self.source_format = source_format
+        self.file = _SpooledFile(max_size=max_memory_bytes)
+        self.rows = 0
+        self._row_group_size = row_group_size
+        self._buffer: tp.List[dict] = []
+        self._parquet_writer = None
+        self._parquet_schema = arrow_schema(schema) if schema and source_format == SOURCE_FORMAT_PARQUET else None
+        self._avro_writer = None
+        if source_format == SOURCE_FORMAT_AVRO:
+            from fastavro import parse_schema
+            from fastavro.write import Writer
+            self._avro_writer = Writer(self.file, parse_schema(avro_schema(schema)))
+
+    def write(self, record: dict) -> None:
+        self.rows += 1
+        if self.source_format == SOURCE_FORMAT_JSON:
+            self.file.write(json.dumps(record, default=str).encode())
+            self.file.write(b'\n')
+        elif self.source_format == SOURCE_FORMAT_AVRO:
+            self._avro_writer.write(record)
+        else:
+            self._buffer.append(record)
+            if len(self._buffer) >= self._row_group_size:
+                self._flush_parquet()
+
+    def _flush_parquet(self) -> None:
+        import pyarrow
+        import pyarrow.parquet
+        if self._parquet_writer is None:
+            table = pyarrow.Table.from_pylist(self._buffer, schema=self._parquet_schema)
+            self._parquet_writer = pyarrow.parquet.ParquetWriter(self.file, table.schema)
+        else:
+            table = pyarrow.Table.from_pylist(self._buffer, schema=self._parquet_writer.schema)
+        self._parquet_writer.write_table(table)
+        self._buffer = []
+
+    def close(self) -> tp.BinaryIO:
+        """Finishes the file and returns it, rewound to the beginning."""
+        if self._avro_writer is not None:
+            self._avro_writer.flush()
+        if self._buffer:
+            self._flush_parquet()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        self.file.seek(0)
+        return self.file
+
+
+def spool_records(
+        records: tp.Iterable[dict],
+        source_format: str,
+        schema: tp.Sequence[tp.Any] | None = None,
+        partition_field: str | None = None,
+        max_memory_bytes: int = DEFAULT_SPOOL_MEMORY_BYTES) -> tp.Dict[str | None, RecordSpool]:
+    """Writes records to spools - one per partition (by the value of `partition_field`), or a single one (key `None`)."""
+    spools: tp.Dict[str | None, RecordSpool] = {}
+    for record in records:
+        partition = partition_of(record[partition_field]) if partition_field else None
+        spool = spools.get(partition)
+        if spool is None:
+            spool = spools[partition] = RecordSpool(source_format, schema, max_memory_bytes)
+        spool.write(record)
+    for spool in spools.values():
+        spool.close()
+    logger.debug("Spooled %d records to %d files", sum(s.rows for s in spools.values()), len(spools))
+    return spools
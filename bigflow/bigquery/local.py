@@ -0,0 +1,347 @@
+"""Hermetic stand-in for BigQuery, for tests of components.
+
+`LocalDatasetManager` implements the `DatasetManager` interface on an embedded SQLite database,
+so components run with no network and no project.  Tables are stored under their full ids
+(`project.dataset.table`) and SQL is executed by SQLite, after backticked names are turned into
+quoted identifiers - queries have to stick to the SQL common to both engines.
+
+Partitions are kept in the `_PARTITIONTIME` column (`YYYY-MM-DD`, or `YYYY-MM-DD HH:00:00` for hourly partitions),
+filled by writes to partition decorators (`table$YYYYMMDD`, `table$YYYYMMDDHH`, `table$YYYYMM` or `table$YYYY`).  Like in BigQuery, the column isn't returned by queries, select it with an alias,
+or filter with `DATE(_PARTITIONTIME) = '{dt}'`, which works on both engines.
+"""
+
+from __future__ import annotations
+
+import datetime
+import decimal
+import functools
+import json
+import logging
+import re
+import sqlite3
+import threading
+import typing as tp
+
+from pathlib import Path
+from types import SimpleNamespace
+
+import bigflow
+from bigflow.commons import public
+
+from .dataset_manager import DatasetManager, PartitionedDatasetManager, TemplatedDatasetManager
+from .dataset_manager import DEFAULT_MAX_CONCURRENT_QUERIES, DEFAULT_PAGE_SIZE, _CREATE_TABLE_RE
+from .dataset_manager import get_partition_from_run_datetime_or_none, random_uuid, read_records
+from .interface import DEFAULT_RUNTIME
+from .job import Job
+
+
+logger = logging.getLogger(__name__)
+
+
+PARTITION_COLUMN = '_PARTITIONTIME'
+
+_BACKTICKED_RE = re.compile(r'`([^`]*)`')
+_CREATE_OR_REPLACE_RE = re.compile(r'CREATE\s+OR\s+REPLACE\s+', re.IGNORECASE)
+# BigQuery table options, not known to SQLite
+_TABLE_OPTIONS_RE = re.compile(r'\)\s*(?:PARTITION\s+BY|CLUSTER\s+BY|OPTIONS)\b.*$', re.IGNORECASE | re.DOTALL)
+
+
+def to_sqlite(sql: str) -> str:
+    """
+    >>> to_sqlite('SELECT * FROM `p.d.table` WHERE x = "a"')
+    'SELECT * FROM "p.d.table" WHERE x = "a"'
+    """
+    return _BACKTICKED_RE.sub(r'"\1"', sql)
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _to_sqlite_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+# lengths of partition decorators of time-unit partitioned tables, with formats of their `_PARTITIONTIME`
+_PARTITION_FORMATS = {
+    4: ('%Y', '%Y-%m-%d'),
+    6: ('%Y%m', '%Y-%m-%d'),
+    8: ('%Y%m%d', '%Y-%m-%d'),
+    10: ('%Y%m%d%H', '%Y-%m-%d %H:%M:%S'),
+}
+
+
+def _split_partition(table_id: str) -> tp.Tuple[str, str | None]:
+    """
+    >>> _split_partition('p.d.table$2020010112')
+    ('p.d.table', '2020-01-01 12:00:00')
+    """
+    table_id, _, partition = table_id.partition('$')
+    if not partition:
+        return table_id, None
+    if not partition.isdigit() or len(partition) not in _PARTITION_FORMATS:
+        raise ValueError(f"Unsupported partition decorator ${partition} of {table_id}, "
+                         f"expected YYYY, YYYYMM, YYYYMMDD or YYYYMMDDHH")
+    decorator_format, partition_format = _PARTITION_FORMATS[len(partition)]
+    return table_id, datetime.datetime.strptime(partition, decorator_format).strftime(partition_format)
+
+
+@public()
+class LocalDatabase(object):
+    """SQLite database (in memory by default) with tables of local dataset managers, shared by them."""
+
+    def __init__(self, path: str | Path = ':memory:'):
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        self.lock = threading.RLock()
+
+    def query(self, sql: str, parameters: tp.Sequence = ()) -> tp.Tuple[tp.List[str], tp.List[tuple]]:
+        """Executes the SQL, returns names of result columns (without `_PARTITIONTIME`) and rows."""
+        with self.lock:
+            cursor = self.connection.execute(sql, parameters)
+            columns = [d[0] for d in cursor.description or ()]
+            rows = cursor.fetchall()
+        if PARTITION_COLUMN not in columns:
+            return columns, rows
+        keep = [i for i, column in enumerate(columns) if column != PARTITION_COLUMN]
+        return [columns[i] for i in keep], [tuple(row[i] for i in keep) for row in rows]
+
+    def execute(self, sql: str, parameters: tp.Sequence = ()) -> None:
+        with self.lock:
+            self.connection.execute(sql, parameters)
+            self.connection.commit()
+
+    def table_exists(self, table_id: str) -> bool:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?", (table_id,)
+            ).fetchone() is not None
+
+    def columns(self, table_id: str) -> tp.List[str]:
+        with self.lock:
+            return [row[1] for row in self.connection.execute(f"PRAGMA table_info({_quote(table_id)})")]
+
+    def insert(self, table_id: str, columns: tp.Sequence[str], rows: tp.Iterable[tp.Sequence]) -> int:
+        """Inserts rows to the table, which is created (or extended) with missing columns."""
+        with self.lock:
+            existing = self.columns(table_id)
+            if not existing:
+                self.connection.execute(
+                    f"CREATE TABLE {_quote(table_id)} ({', '.join(_quote(c) for c in columns)})")
+            for column in columns:
+                if existing and column not in existing:
+                    self.connection.execute(f"ALTER TABLE {_quote(table_id)} ADD COLUMN {_quote(column)}")
+            cursor = self.connection.executemany(
+                f"INSERT INTO {_quote(table_id)} ({', '.join(_quote(c) for c in columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})",
+                ([_to_sqlite_value(v) for v in row] for row in rows))
+            self.connection.commit()
+            return cursor.rowcount
+
+
+class _LocalTableCache(object):
+    """Existence of tables is checked in the database, there is nothing to cache."""
+
+    def __init__(self, database: LocalDatabase, dataset_id: str):
+        self.database = database
+        self.dataset_id = dataset_id
+
+    def table_exists(self, table_name: str) -> bool:
+        return self.database.table_exists(f"{self.dataset_id}.{table_name}")
+
+    def add(self, table_name: str) -> None:
+        pass
+
+    def invalidate(self, table_name: str | None = None) -> None:
+        pass
+
+
+@public()
+class LocalDatasetManager(DatasetManager):
+    """
+    `DatasetManager` running statements on a `LocalDatabase` instead of BigQuery.
+    Supports writes (also to partitions), `create_table`, `collect`, `collect_arrow`, `collect_list`,
+    `iter_rows`, `insert`, `create_table_from_schema`, `load_table_from_dataframe` and `remove_dataset`.
+    """
+
+    def __init__(
+            self,
+            database: LocalDatabase,
+            project_id: str,
+            dataset_name: str,
+            logger: logging.Logger = logger,
+            max_concurrent_queries: int = DEFAULT_MAX_CONCURRENT_QUERIES):
+        # google-cloud-bigquery isn't needed, so the base class isn't initialized
+        self.database = database
+        self.bigquery_client = None
+        self.bqstorage_client = None
+        self.dataset = SimpleNamespace(
+            project=project_id, dataset_id=dataset_name, full_dataset_id=f"{project_id}:{dataset_name}")
+        self.dataset_id = f"{project_id}.{dataset_name}"
+        self.logger = logger
+        self.table_cache = _LocalTableCache(database, self.dataset_id)
+        self.max_concurrent_queries = max_concurrent_queries
+        self._executor = None
+        self._owns_executor = True
+        self._executor_lock = threading.Lock()
+
+    def write(self, table_id: str, sql: str, mode: str):
+        self.logger.info('%s to %s', mode, table_id)
+        table_id, partition = _split_partition(table_id)
+        with self.database.lock:
+            columns, rows = self.database.query(to_sqlite(sql))
+            if partition is not None:
+                columns = [*columns, PARTITION_COLUMN]
+                rows = [(*row, partition) for row in rows]
+            if mode == 'WRITE_TRUNCATE' and self.database.table_exists(table_id):
+                if partition is None:
+                    self.database.execute(f"DROP TABLE {_quote(table_id)}")
+                elif PARTITION_COLUMN in self.database.columns(table_id):
+                    self.database.execute(
+                        f"DELETE FROM {_quote(table_id)} WHERE {PARTITION_COLUMN} = ?", (partition,))
+                elif self.database.query(f"SELECT 1 FROM {_quote(table_id)} LIMIT 1")[1]:
+                    # an empty table (e.g. created with DDL) gets the partition column with the first write
+                    raise ValueError(f"Table {table_id} is not partitioned, can't truncate its partition {partition}")
+            self.database.insert(table_id, columns, rows)
+
+    def create_table(self, create_query: str):
+        self.logger.info('CREATE TABLE: %s', create_query)
+        match = _CREATE_TABLE_RE.search(create_query)
+        if match is None:
+            raise ValueError(f"Can't find the table name in: {create_query}")
+        table_id = self._full_table_id(match.group(1))
+        sql = create_query[:match.start(1)].rstrip('`') + _quote(table_id) + create_query[match.end(1):].lstrip('`')
+        sql = _TABLE_OPTIONS_RE.sub(')', to_sqlite(sql))
+        if _CREATE_OR_REPLACE_RE.search(sql):
+            self.database.execute(f"DROP TABLE IF EXISTS {_quote(table_id)}")
+            sql = _CREATE_OR_REPLACE_RE.sub('CREATE ', sql, count=1)
+        self.database.execute(sql)
+
+    def collect(self, sql: str, dtypes=None, use_storage_api: bool = False, maximum_bytes_billed=None):
+        import pandas
+        columns, rows = self.database.query(to_sqlite(sql))
+        df = pandas.DataFrame.from_records(rows, columns=columns)
+        return df.astype(dtypes) if dtypes else df
+
+    def collect_arrow(self, sql: str, use_storage_api: bool = True):
+        import pyarrow
+        columns, rows = self.database.query(to_sqlite(sql))
+        return pyarrow.table({column: [row[i] for row in rows] for i, column in enumerate(columns)})
+
+    def collect_list(self, sql: str, record_as_dict: bool = False):
+        columns, rows = self.database.query(to_sqlite(sql))
+        if record_as_dict:
+            return [dict(zip(columns, row)) for row in rows]
+        from google.cloud.bigquery.table import Row
+        field_to_index = {column: i for i, column in enumerate(columns)}
+        return [Row(row, field_to_index) for row in rows]
+
+    def iter_rows(self, sql: str, page_size: int = DEFAULT_PAGE_SIZE, as_dict: bool = False):
+        return iter(self.collect_list(sql, record_as_dict=as_dict))
+
+    def dry_run(self, sql: str) -> str:
+        self.database.query(f"EXPLAIN {to_sqlite(sql)}")
+        return "The query is valid, it is executed locally and costs nothing."
+
+    def remove_dataset(self):
+        _, tables = self.database.query(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ?", (self.dataset_id + '.%',))
+        for (table_id,) in tables:
+            self.database.execute(f"DROP TABLE {_quote(table_id)}")
+
+    def load_table_from_dataframe(self, table_id: str, df):
+        table_id, partition = _split_partition(table_id)
+        records = df.astype(object).where(df.notna(), None).to_dict('records')
+        self._insert_records(table_id, partition, records)
+
+    def create_table_from_schema(
+            self,
+            table_id: str,
+            schema: tp.Union[tp.List[dict], Path, None] = None,
+            table=None):
+        if schema and table:
+            raise ValueError("You can't provide both schema and table, because the table you provide"
+                             "should already contain the schema.")
+        if not schema and not table:
+            raise ValueError("You must provide either schema or table.")
+        if isinstance(schema, Path):
+            schema = json.loads(schema.read_text())
+
+        if table is None:
+            columns = [(field['name'], field.get('type', '')) for field in schema]
+            partitioned = True
+        else:
+            columns = [(field.name, field.field_type) for field in table.schema]
+            partitioned = table.time_partitioning is not None
+        if partitioned:
+            columns.append((PARTITION_COLUMN, 'TEXT'))
+
+        table_id = self._full_table_id(table_id)
+        self.logger.info('CREATING TABLE FROM SCHEMA: %s', columns)
+        self.database.execute(
+            f"CREATE TABLE IF NOT EXISTS {_quote(table_id)} ({', '.join(f'{_quote(n)} {t}' for n, t in columns)})")
+
+    def insert(self, table_id: str, records: tp.Union[tp.Iterable[dict], Path], **insert_options) -> int:
+        self.logger.info('INSERTING RECORDS TO TABLE: %s', table_id)
+        table_id, partition = _split_partition(table_id)
+        if not self.database.table_exists(table_id):
+            raise ValueError('Table {id} does not exist'.format(id=table_id))
+        if isinstance(records, Path):
+            records = read_records(records)
+        return self._insert_records(table_id, partition, list(records))
+
+    def _insert_records(self, table_id: str, partition: str | None, records: tp.List[dict]) -> int:
+        columns = list(dict.fromkeys(key for record in records for key in record))
+        rows = [[record.get(column) for column in columns] for record in records]
+        if partition is not None:
+            columns.append(PARTITION_COLUMN)
+            rows = [[*row, partition] for row in rows]
+        if not columns:
+            return 0
+        return self.database.insert(table_id, columns, rows)
+
+    def _full_table_id(self, table_name: str) -> str:
+        parts = table_name.split('.')
+        if len(parts) == 1:
+            return f"{self.dataset_id}.{table_name}"
+        if len(parts) == 2:
+            return f"{self.dataset.project}.{table_name}"
+        return table_name
+
+
+@public()
+def create_local_dataset_manager(
+        project_id: str,
+        runtime: str,
+        dataset_name: str | None = None,
+        internal_tables: tp.List[str] | None = None,
+        external_tables: tp.Dict[str, str] | None = None,
+        extras: tp.Dict | None = None,
+        database: LocalDatabase | None = None,
+        **_,
+) -> tp.Tuple[str, PartitionedDatasetManager]:
+    """
+    Works like `create_dataset_manager`, but the dataset lives in the local `database`
+    (a new in-memory one by default).  Credentials, location, labels etc. are ignored.
+    """
+    dataset_name = dataset_name or random_uuid(suffix='_test_case')
+    core_dataset_manager = LocalDatasetManager(database or LocalDatabase(), project_id, dataset_name)
+    templated_dataset_manager = TemplatedDatasetManager(
+        core_dataset_manager, internal_tables or [], external_tables or {}, extras or {}, runtime)
+    return core_dataset_manager.dataset_id, PartitionedDatasetManager(
+        templated_dataset_manager, get_partition_from_run_datetime_or_none(runtime))
+
+
+@public()
+def run_job_locally(job: Job, runtime: str = DEFAULT_RUNTIME, database: LocalDatabase | None = None):
+    """Executes the component of the BigQuery job with local dataset managers, all of them sharing the `database`."""
+    database = database or LocalDatabase()
+    runtime_str = bigflow.JobContext.make(runtime=runtime).runtime_str
+    logger.info("Run job %s locally for %s", job.id, runtime_str)
+    return job._run_component(job._build_dependencies(
+        runtime_str, dataset_manager_factory=functools.partial(create_local_dataset_manager, database=database)))
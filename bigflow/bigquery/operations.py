@@ -0,0 +1,146 @@
+"""Operation-level execution plans of interactive components.
+
+A component is executed once in the recording mode (statements aren't run, collects return empty results),
+which captures the ordered list of its operations - target tables, tables read by their SQL (through placeholders
+or full table names) and the rendered SQL.
+The list is turned into a table-level dependency graph, so independent operations can run concurrently,
+and a single operation can be run together with the operations it depends on.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import threading
+import typing as tp
+
+from bigflow.commons import public
+
+from .dataset_manager import compile_sql_template
+from .result_cache import referenced_tables
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_CONCURRENT_OPERATIONS = 1
+
+# operations with effects which can't be tracked per table, run after all the previous and before all the next ones
+BARRIER_METHODS = frozenset(['create_table', 'delete_dataset'])
+
+
+@public()
+class Operation(tp.NamedTuple):
+    index: int
+    name: tp.Optional[str]
+    alias: str
+    method: str
+    arguments: tp.Dict[str, tp.Any]
+    sql: tp.Optional[str] = None
+    writes: tp.Optional[str] = None
+    reads: tp.FrozenSet[str] = frozenset()
+
+    @property
+    def barrier(self) -> bool:
+        return self.method in BARRIER_METHODS
+
+    def depends_on(self, other: 'Operation') -> bool:
+        """Tells if the operation has to run after the `other` (earlier) operation."""
+        if self.barrier or other.barrier:
+            return True
+        if other.writes is not None and (other.writes in self.reads or other.writes == self.writes):
+            return True
+        return self.writes is not None and self.writes in other.reads
+
+
+class OperationRecorder(object):
+    """Collects operations issued by a component through `OperationLevelDatasetManager`s in the recording mode."""
+
+    def __init__(self):
+        self.operations: tp.List[Operation] = []
+        self._lock = threading.Lock()
+
+    def record(self, dataset, alias: str, method: str, arguments: tp.Dict[str, tp.Any]) -> Operation:
+        arguments = dict(arguments)
+        name = arguments.pop('operation_name', None)
+        custom_run_datetime = arguments.get('custom_run_datetime')
+        sql = arguments.get('sql')
+        reads = frozenset()
+        if sql is not None:
+            tables = compile_sql_template(sql).placeholders - set(dataset.extras) - {'dt'}
+            sql = dataset.render(sql, custom_run_datetime)
+            # tables may also be referenced by their full names, without placeholders
+            reads = frozenset(
+                [dataset.render('{%s}' % table) for table in tables]
+                + referenced_tables(sql, dataset.project_id))
+        elif 'create_query' in arguments:
+            sql = arguments['create_query']
+        table_name = arguments.get('table_name')
+        writes = f"{dataset.project_id}.{dataset.dataset_name}.{table_name.split('$')[0]}" if table_name else None
+        with self._lock:
+            operation = Operation(len(self.operations), name, alias, method, arguments, sql, writes, reads)
+            self.operations.append(operation)
+        logger.debug("Record operation %s", operation)
+        return operation
+
+
+@public()
+class OperationGraph(object):
+    """Recorded operations of a component with dependencies between them (indexes of the operations)."""
+
+    def __init__(self, operations: tp.Sequence[Operation]):
+        self.operations = list(operations)
+        self.dependencies: tp.Dict[int, tp.FrozenSet[int]] = {
+            operation.index: frozenset(
+                other.index for other in self.operations[:position] if operation.depends_on(other))
+            for position, operation in enumerate(self.operations)
+        }
+
+    def upstream(self, operation_name: str) -> tp.List[Operation]:
+        """Returns the operation (all the operations with the name) and all the operations it depends on, in order."""
+        selected = {operation.index for operation in self.operations if operation.name == operation_name}
+        if not selected:
+            raise ValueError("Operation '{}' not found".format(operation_name))
+        stack = list(selected)
+        while stack:
+            for dependency in self.dependencies[stack.pop()]:
+                if dependency not in selected:
+                    selected.add(dependency)
+                    stack.append(dependency)
+        return [operation for operation in self.operations if operation.index in selected]
+
+    def execute(
+            self,
+            run: tp.Callable[[Operation], tp.Any],
+            operations: tp.Optional[tp.Sequence[Operation]] = None,
+            max_concurrent_operations: int = DEFAULT_MAX_CONCURRENT_OPERATIONS) -> tp.List[tp.Any]:
+        """
+        Runs the operations (all by default) with `run`, each one after the operations it depends on,
+        at most `max_concurrent_operations` at a time.  Returns results in the order of the operations.
+        Stops at the first failed operation (operations already running are finished) and raises its error.
+        """
+        operations = self.operations if operations is None else operations
+        selected = {operation.index for operation in operations}
+        waiting = {index: self.dependencies[index] & selected for index in sorted(selected)}
+        done = set()
+        results = {}
+        by_index = {operation.index: operation for operation in operations}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent_operations) as executor:
+            running = {}
+            while waiting or running:
+                for index in [i for i, dependencies in waiting.items() if dependencies <= done]:
+                    del waiting[index]
+                    logger.info("Run operation %s", by_index[index])
+                    running[executor.submit(run, by_index[index])] = index
+                finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    index = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        for other in running:
+                            other.cancel()
+                        raise error
+                    results[index] = future.result()
+                    done.add(index)
+        return [results[index] for index in sorted(selected)]
@@ -0,0 +1,294 @@
+"""Cost planning of BigQuery workflows (the `bigflow plan` command).
+
+Components of all BigQuery jobs are executed with recording dataset managers, which don't run
+any statement (collects return empty results).  Recorded statements are dry-run concurrently,
+so the plan tells how many bytes each statement, each job and the whole workflow would process.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import functools
+import logging
+import threading
+import typing as tp
+
+from types import SimpleNamespace
+
+import bigflow
+from bigflow.commons import public
+from bigflow.resource_context import ResourceContext
+
+from .dataset_manager import DatasetManager, PartitionedDatasetManager, TemplatedDatasetManager
+from .dataset_manager import DEFAULT_LOCATION, BATCH_FORMAT_ARROW, DEFAULT_PAGE_SIZE
+from .dataset_manager import create_bigquery_client, get_partition_from_run_datetime_or_none
+from .job import Job
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_PRICE_PER_TIB_USD = 6.25
+DEFAULT_MAX_CONCURRENT_DRY_RUNS = 8
+
+_TIB = 2 ** 40
+
+
+def _cost_usd(bytes_processed: int, price_per_tib_usd: float) -> float:
+    return bytes_processed / _TIB * price_per_tib_usd
+
+
+def _display_cost(cost_usd: tp.Optional[float]) -> tp.Optional[float]:
+    # costs are rounded only in the printed plan
+    return None if cost_usd is None else round(cost_usd, 2)
+
+
+class RecordedStatement(tp.NamedTuple):
+    operation: str
+    sql: str
+    destination: tp.Optional[str] = None
+    default_dataset: tp.Optional[str] = None
+
+
+@public()
+class StatementPlan(tp.NamedTuple):
+    operation: str
+    sql: str
+    destination: tp.Optional[str]
+    bytes_processed: tp.Optional[int]
+    cost_usd: tp.Optional[float]
+    error: tp.Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {**self._asdict(), 'cost_usd': _display_cost(self.cost_usd)}
+
+
+@public()
+class JobPlan(tp.NamedTuple):
+    job_id: str
+    statements: tp.List[StatementPlan]
+    error: tp.Optional[str] = None
+
+    @property
+    def bytes_processed(self) -> int:
+        return sum(s.bytes_processed or 0 for s in self.statements)
+
+    @property
+    def cost_usd(self) -> float:
+        return sum(s.cost_usd or 0 for s in self.statements)
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.job_id,
+            'bytes_processed': self.bytes_processed,
+            'cost_usd': _display_cost(self.cost_usd),
+            'error': self.error,
+            'statements': [s.to_dict() for s in self.statements],
+        }
+
+
+@public()
+class WorkflowPlan(tp.NamedTuple):
+    workflow_id: str
+    runtime: str
+    price_per_tib_usd: float
+    jobs: tp.List[JobPlan]
+
+    @property
+    def bytes_processed(self) -> int:
+        return sum(j.bytes_processed for j in self.jobs)
+
+    @property
+    def cost_usd(self) -> float:
+        # computed from the total, costs of small statements don't vanish in rounding
+        return _cost_usd(self.bytes_processed, self.price_per_tib_usd)
+
+    @property
+    def errors(self) -> tp.List[str]:
+        result = []
+        for job in self.jobs:
+            if job.error:
+                result.append(f"{job.job_id}: {job.error}")
+            result.extend(f"{job.job_id}: {s.error}" for s in job.statements if s.error)
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            'workflow_id': self.workflow_id,
+            'runtime': self.runtime,
+            'price_per_tib_usd': self.price_per_tib_usd,
+            'bytes_processed': self.bytes_processed,
+            'cost_usd': _display_cost(self.cost_usd),
+            'jobs': [j.to_dict() for j in self.jobs],
+        }
+
+
+class RecordingDatasetManager(DatasetManager):
+    """
+    Records statements instead of running them.  Collects return empty results,
+    so components which depend on the collected data may fail - the plan reports it as the job error.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements: tp.List[RecordedStatement] = []
+        self._statements_lock = threading.Lock()
+
+    def _record(self, operation: str, sql: str, destination: str | None = None, default_dataset: str | None = None):
+        logger.debug("Record %s: %s", operation, sql)
+        with self._statements_lock:
+            self.statements.append(RecordedStatement(operation, sql, destination, default_dataset))
+
+    def write(self, table_id: str, sql: str, mode: str):
+        self._record(mode, sql, destination=table_id)
+
+    def table_exists_or_error(self, table_id: str):
+        pass
+
+    def create_table(self, create_query: str):
+        self._record('CREATE_TABLE', create_query, default_dataset=self.dataset_id)
+
+    def collect(self, sql: str, dtypes=None, use_storage_api: bool = False, maximum_bytes_billed=None):
+        import pandas
+        self._record('COLLECT', sql)
+        return pandas.DataFrame()
+
+    def collect_arrow(self, sql: str, use_storage_api: bool = True):
+        import pyarrow
+        self._record('COLLECT', sql)
+        return pyarrow.table({})
+
+    def collect_list(self, sql: str, record_as_dict: bool = False):
+        self._record('COLLECT', sql)
+        return []
+
+    def iter_rows(self, sql: str, page_size: int = DEFAULT_PAGE_SIZE, as_dict: bool = False):
+        self._record('COLLECT', sql)
+        return iter(())
+
+    def collect_batches(self, sql: str, page_size: int = DEFAULT_PAGE_SIZE, format: str = BATCH_FORMAT_ARROW):
+        self._record('COLLECT', sql)
+        return iter(())
+
+    def dry_run(self, sql: str) -> str:
+        self._record('DRY_RUN', sql)
+        return "The query is recorded by the planner."
+
+    def remove_dataset(self):
+        logger.info("Skip removing dataset %s", self.dataset_id)
+
+    def load_table_from_dataframe(self, table_id: str, df):
+        logger.info("Skip loading a data frame to %s", table_id)
+
+    def load_table_from_file(self, table_id: str, source, *args, **kwargs):
+        logger.info("Skip loading %s to %s", source, table_id)
+
+    def load_table_from_iterable(self, table_id: str, records, *args, **kwargs):
+        logger.info("Skip loading records to %s", table_id)
+        return 0
+
+    def create_table_from_schema(self, table_id: str, *args, **kwargs):
+        logger.info("Skip creating table %s", table_id)
+
+    def insert(self, table_id: str, records, *args, **kwargs):
+        logger.info("Skip inserting records to %s", table_id)
+        return 0
+
+
+def create_recording_dataset_manager(
+        project_id: str,
+        runtime: str,
+        dataset_name: str | None = None,
+        internal_tables: tp.List[str] | None = None,
+        external_tables: tp.Dict[str, str] | None = None,
+        extras: tp.Dict | None = None,
+        credentials: 'google.auth.credentials.Credentials' | None = None,
+        location: str = DEFAULT_LOCATION,
+        resources: ResourceContext | None = None,
+        dataset_managers: tp.List[RecordingDatasetManager] | None = None,
+        **_,
+) -> tp.Tuple[str, PartitionedDatasetManager]:
+    """
+    Works like `create_dataset_manager`, but neither creates the dataset nor updates labels.
+    The created `RecordingDatasetManager` is appended to `dataset_managers`.
+    """
+    resources = resources or ResourceContext()
+    client = resources.get_or_create(
+        ('bigquery_client', project_id, credentials, location),
+        lambda: create_bigquery_client(project_id, credentials, location))
+    dataset_id = f"{project_id}.{dataset_name}"
+    dataset = SimpleNamespace(project=project_id, dataset_id=dataset_name, full_dataset_id=f"{project_id}:{dataset_name}")
+    core_dataset_manager = RecordingDatasetManager(client, dataset, logger)
+    if dataset_managers is not None:
+        dataset_managers.append(core_dataset_manager)
+    templated_dataset_manager = TemplatedDatasetManager(
+        core_dataset_manager, internal_tables or [], external_tables or {}, extras or {}, runtime)
+    return dataset_id, PartitionedDatasetManager(
+        templated_dataset_manager, get_partition_from_run_datetime_or_none(runtime))
+
+
+def _record_job(
+        job: Job,
+        runtime_str: str,
+        resources: ResourceContext) -> tp.Tuple[tp.List[tp.Tuple[tp.Any, RecordedStatement]], str | None]:
+    dataset_managers: tp.List[RecordingDatasetManager] = []
+    error = None
+    try:
+        job._run_component(job._build_dependencies(
+            runtime_str, resources,
+            dataset_manager_factory=functools.partial(create_recording_dataset_manager, dataset_managers=dataset_managers)))
+    except Exception as e:
+        logger.warning("Component of job %s failed during planning: %s", job.id, e)
+        error = f"{type(e).__name__}: {e}"
+    return [(dm.bigquery_client, statement) for dm in dataset_managers for statement in dm.statements], error
+
+
+def estimate_statement(
+        client: 'google.cloud.bigquery.Client',
+        statement: RecordedStatement,
+        price_per_tib_usd: float = DEFAULT_PRICE_PER_TIB_USD) -> StatementPlan:
+    """Dry-runs the statement (with the query cache disabled, like the first run on production)."""
+    from google.cloud import bigquery
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False, use_legacy_sql=False)
+    if statement.default_dataset:
+        job_config.default_dataset = statement.default_dataset
+    try:
+        query_job = client.query(statement.sql, job_config=job_config)
+    except Exception as e:
+        return StatementPlan(statement.operation, statement.sql, statement.destination, None, None, str(e))
+    bytes_processed = query_job.total_bytes_processed or 0
+    return StatementPlan(
+        statement.operation, statement.sql, statement.destination,
+        bytes_processed, _cost_usd(bytes_processed, price_per_tib_usd))
+
+
+@public()
+def plan_workflow(
+        workflow: bigflow.Workflow,
+        runtime: str,
+        price_per_tib_usd: float = DEFAULT_PRICE_PER_TIB_USD,
+        max_concurrent_dry_runs: int = DEFAULT_MAX_CONCURRENT_DRY_RUNS) -> WorkflowPlan:
+    """
+    Records statements of all BigQuery jobs of the workflow for the `runtime`
+    and estimates their costs with dry runs (`max_concurrent_dry_runs` at a time).
+    Jobs of other types are reported with no statements.
+    """
+    context = bigflow.JobContext.make(runtime=runtime, workflow=workflow)
+    resources = ResourceContext()
+    recorded = []
+    for workflow_job in workflow._build_sequential_order():
+        job = workflow_job.job
+        if isinstance(job, Job):
+            statements, error = _record_job(job, context.runtime_str, resources)
+        else:
+            statements, error = [], None
+            logger.info("Job %s is not a BigQuery job, it is not planned", job.id)
+        recorded.append((job.id, statements, error))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent_dry_runs) as executor:
+        futures = [
+            (job_id, [executor.submit(estimate_statement, client, s, price_per_tib_usd) for client, s in statements], error)
+            for job_id, statements, error in recorded
+        ]
+        jobs = [JobPlan(job_id, [f.result() for f in statements], error) for job_id, statements, error in futures]
+    return WorkflowPlan(workflow.workflow_id, context.runtime_str, price_per_tib_usd, jobs)
@@ -0,0 +1,84 @@
+"""Checking readiness of tables with partition metadata, used by the `sensor` in the 'metadata' mode.
+
+Partitions of many tables are checked with a single `INFORMATION_SCHEMA.PARTITIONS` query per dataset,
+which reads only metadata.  Checks are repeated in-process, with exponential backoff and jitter, until a deadline.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import time
+import typing as tp
+
+from collections import defaultdict
+
+
+logger = logging.getLogger(__name__)
+
+
+SENSOR_MODE_QUERY = 'query'
+SENSOR_MODE_METADATA = 'metadata'
+
+DEFAULT_SENSOR_TIMEOUT_SEC = 3600
+DEFAULT_POLL_INTERVAL_SEC = 30
+DEFAULT_MAX_POLL_INTERVAL_SEC = 600
+DEFAULT_POLL_JITTER = 0.2
+
+
+def partitions_queries(table_ids: tp.Iterable[str], partition_id: str) -> tp.Dict[str, str]:
+    """Returns a query per dataset (`project.dataset`), which lists the partition `partition_id` of the tables
+    and the tables which aren't partitioned."""
+    tables_by_dataset = defaultdict(list)
+    for table_id in table_ids:
+        dataset_id, table_name = table_id.rsplit('.', 1)
+        tables_by_dataset[dataset_id].append(table_name)
+    return {
+        dataset_id: f"""
+        SELECT table_name, partition_id, total_rows
+        FROM `{dataset_id}.INFORMATION_SCHEMA.PARTITIONS`
+        WHERE table_name IN ({', '.join(_literal(t) for t in sorted(tables))})
+        AND (partition_id = {_literal(partition_id)} OR partition_id IS NULL)
+        """
+        for dataset_id, tables in tables_by_dataset.items()
+    }
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def ready_tables(ds, table_ids: tp.Sequence[str], partition_id: str) -> tp.Set[str]:
+    """Returns ids of tables which have rows in the partition (or any rows, when they aren't partitioned)."""
+    ready = set()
+    for dataset_id, sql in partitions_queries(table_ids, partition_id).items():
+        partitions = ds.collect(sql=sql)
+        for row in partitions.itertuples():
+            if row.total_rows and row.total_rows > 0:
+                ready.add(f"{dataset_id}.{row.table_name}")
+    return ready
+
+
+def poll(
+        check: tp.Callable[[], tp.Collection[str]],
+        timeout_sec: float = DEFAULT_SENSOR_TIMEOUT_SEC,
+        poll_interval_sec: float = DEFAULT_POLL_INTERVAL_SEC,
+        max_poll_interval_sec: float = DEFAULT_MAX_POLL_INTERVAL_SEC,
+        jitter: float = DEFAULT_POLL_JITTER) -> None:
+    """
+    Calls `check` (which returns names of things which are not ready yet) until it returns nothing.
+    Pauses between checks grow twice up to `max_poll_interval_sec`, each randomized by +/- `jitter`.
+    Raises `ValueError` when things aren't ready after `timeout_sec`.
+    """
+    deadline = time.monotonic() + timeout_sec
+    pause = poll_interval_sec
+    while True:
+        not_ready = check()
+        if not not_ready:
+            return
+        pause_with_jitter = pause * random.uniform(1 - jitter, 1 + jitter)
+        if time.monotonic() + pause_with_jitter > deadline:
+            raise ValueError(f"{', '.join(sorted(not_ready))} not ready after {timeout_sec} seconds")
+        logger.info("%s not ready, next check in %.0f seconds", ', '.join(sorted(not_ready)), pause_with_jitter)
+        time.sleep(pause_with_jitter)
+        pause = min(pause * 2, max_poll_interval_sec)
@@ -0,0 +1,142 @@
+"""On-disk cache of query results for interactive runs (`InteractiveComponent.run` / `peek`).
+
+Results are stored as Parquet files, keyed by the rendered SQL, the runtime and the last modification
+times of the tables referenced by the query, so a result is fetched again as soon as any of the tables changes.
+Least recently used results are evicted when the cache grows over `max_size_bytes`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import typing as tp
+import uuid
+
+from pathlib import Path
+
+from bigflow.commons import public
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CACHE_PATH = Path(".bigflow") / "query_cache"
+DEFAULT_MAX_SIZE_BYTES = 1024 ** 3
+
+_BACKTICKED_TABLE_RE = re.compile(r'`([\w\-]+(?:\.[\w\-]+){1,2})`')
+_UNQUOTED_TABLE_RE = re.compile(r'\b(?:FROM|JOIN)\s+([a-zA-Z_][\w\-]*(?:\.[\w\-]+){1,2})\b', re.IGNORECASE)
+# names after FROM / JOIN, which are neither subqueries nor `UNNEST`
+_FROM_ITEM_RE = re.compile(r'\b(?:FROM|JOIN)\s+(`[^`]*`|[a-zA-Z_][\w\-.*]*)', re.IGNORECASE)
+
+# results of queries using these functions change without changes of the tables
+_NONDETERMINISTIC_RE = re.compile(
+    r'\b(CURRENT_(DATE|DATETIME|TIME|TIMESTAMP)|NOW|RAND|GENERATE_UUID|SESSION_USER)\s*\(', re.IGNORECASE)
+
+
+def referenced_tables(sql: str, default_project: str | None = None) -> tp.List[str]:
+    """Returns ids (`project.dataset.table`) of tables referenced by the query.
+    Tables without a project (`dataset.table`) are completed with `default_project`."""
+    tables = set()
+    for match in [*_BACKTICKED_TABLE_RE.findall(sql), *_UNQUOTED_TABLE_RE.findall(sql)]:
+        parts = match.split('.')
+        if len(parts) == 2:
+            if default_project is None:
+                continue
+            parts = [default_project, *parts]
+        tables.add('.'.join(parts))
+    return sorted(tables)
+
+
+def has_unresolved_tables(sql: str, default_project: str | None = None) -> bool:
+    """Tells if the query reads tables not returned by `referenced_tables`, like wildcard tables (`p.d.events_*`)
+    or tables without a project, when there is no `default_project`."""
+    for match in _FROM_ITEM_RE.findall(sql):
+        name = match.strip('`')
+        if '*' in name:
+            return True
+        if match.startswith('`') and not _BACKTICKED_TABLE_RE.fullmatch(match):
+            return True
+        if name.count('.') == 1 and default_project is None:
+            return True
+    return False
+
+
+def is_cacheable(sql: str) -> bool:
+    return not _NONDETERMINISTIC_RE.search(sql)
+
+
+@public()
+class QueryResultCache:
+    """Thread-safe cache of pandas data frames stored as Parquet files in a local directory."""
+
+    def __init__(self, path: tp.Union[str, Path] = DEFAULT_CACHE_PATH, max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES):
+        self.path = Path(path)
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(sql: str, runtime: str | None, tables_modified: tp.Mapping[str, str]) -> str:
+        payload = json.dumps([sql, runtime, sorted(tables_modified.items())])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.parquet"
+
+    def get(self, key: str) -> tp.Optional['pandas.DataFrame']:
+        import pandas
+        file = self._file(key)
+        try:
+            df = pandas.read_parquet(file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Unable to read cached query result %s: %s", file, e)
+            return None
+        try:
+            os.utime(file)  # mark as recently used
+        except OSError:
+            pass
+        logger.info("Use cached query result %s", file)
+        return df
+
+    def put(self, key: str, df: 'pandas.DataFrame') -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.path / f"{key}.{uuid.uuid4().hex}.tmp"
+        try:
+            df.to_parquet(tmp_file)
+            os.replace(tmp_file, self._file(key))
+        except Exception as e:
+            logger.warning("Unable to cache query result: %s", e)
+            if tmp_file.exists():
+                tmp_file.unlink()
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            files = []
+            for file in self.path.glob('*.parquet'):
+                try:
+                    stat = file.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, file))
+            total = sum(size for _, size, _ in files)
+            for _, size, file in sorted(files):
+                if total <= self.max_size_bytes:
+                    break
+                logger.debug("Evict cached query result %s", file)
+                try:
+                    file.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            for file in self.path.glob('*.parquet'):
+                file.unlink()
@@ -0,0 +1,125 @@
+"""Rewriting of SQL templates for cheap peeks (`InteractiveComponent.peek`).
+
+`TABLESAMPLE SYSTEM` makes BigQuery read only a random subset of storage blocks of each sampled table,
+and projecting the result to a few columns makes it skip the other columns of the source tables,
+so peeking a query over huge tables bills a fraction of the bytes the full query would.
+"""
+
+from __future__ import annotations
+
+import re
+import typing as tp
+
+
+# `{alias}` or backticked table names after FROM / JOIN, with an optional alias
+# (unquoted names aren't sampled, they may be CTEs or array paths)
+_TABLE_RE = re.compile(
+    r'\b(?:FROM|JOIN)\s+(?:`[^`]+`|\{\w+\})'
+    r'(?:\s+(?:AS\s+)?(?!(?:ON|USING|WHERE|GROUP|ORDER|LIMIT|HAVING|QUALIFY|WINDOW|UNION|INTERSECT|EXCEPT'
+    r'|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|TABLESAMPLE|FOR)\b)[A-Za-z_]\w*)?',
+    re.IGNORECASE)
+_TABLESAMPLE_RE = re.compile(r'\s*TABLESAMPLE\b', re.IGNORECASE)
+_SYSTEM_TIME_RE = re.compile(r'\s+FOR\s+SYSTEM_TIME\s+AS\s+OF\b', re.IGNORECASE)
+_SUBQUERY_RE = re.compile(r'\s*(?:SELECT|WITH)\b', re.IGNORECASE)
+# ends the `FOR SYSTEM_TIME AS OF` expression (together with `,`, `;` and the closing parenthesis)
+_CLAUSE_RE = re.compile(
+    r'(?<!\w)(?:WHERE|GROUP|ORDER|LIMIT|HAVING|QUALIFY|WINDOW|UNION|INTERSECT|EXCEPT'
+    r'|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|ON|USING|TABLESAMPLE)\b',
+    re.IGNORECASE)
+
+
+def _scan(sql: str, start: int = 0) -> tp.Iterator[tp.Tuple[int, int]]:
+    """Yields positions of characters outside of string literals and quoted names, with the depth of parentheses."""
+    depth = 0
+    position = start
+    while position < len(sql):
+        char = sql[position]
+        if char in '\'"`':
+            end = sql.find(char, position + 1)
+            position = len(sql) if end == -1 else end + 1
+            continue
+        if char == ')':
+            depth -= 1
+        yield position, depth
+        if char == '(':
+            depth += 1
+        position += 1
+
+
+def _parentheses(sql: str) -> tp.List[tp.Tuple[int, int, bool]]:
+    """Returns (start, end, is subquery) of all pairs of parentheses."""
+    result = []
+    opened = []
+    for position, _ in _scan(sql):
+        if sql[position] == '(':
+            opened.append(position)
+        elif sql[position] == ')' and opened:
+            start = opened.pop()
+            result.append((start, position, bool(_SUBQUERY_RE.match(sql, start + 1))))
+    return result
+
+
+def _is_function_argument(parentheses: tp.List[tp.Tuple[int, int, bool]], position: int) -> bool:
+    """Tells if the innermost parentheses around `position` are not a subquery, e.g. `EXTRACT(DAY FROM x)`."""
+    enclosing = [p for p in parentheses if p[0] < position < p[1]]
+    return bool(enclosing) and not max(enclosing)[2]
+
+
+def _system_time_end(sql: str, start: int) -> int:
+    """Returns the end of the `FOR SYSTEM_TIME AS OF` expression starting at `start`."""
+    stop = len(sql)
+    for position, depth in _scan(sql, start):
+        if depth < 0 or depth == 0 and (sql[position] in ',;' or _CLAUSE_RE.match(sql, position)):
+            stop = position
+            break
+    return len(sql[:stop].rstrip())
+
+
+def sample_tables(sql: str, percent: float) -> str:
+    """
+    Adds `TABLESAMPLE SYSTEM (percent PERCENT)` to tables read by the query (after FROM and JOIN).
+    Tables already sampled and `FROM` in function arguments (like `EXTRACT(DAY FROM created_at)`)
+    are left as they are.  The sample follows the `FOR SYSTEM_TIME AS OF` clause of the table.
+
+    >>> sample_tables('SELECT * FROM `{events}` e JOIN `p.d.users` AS u USING (user_id)', 1)
+    'SELECT * FROM `{events}` e TABLESAMPLE SYSTEM (1 PERCENT) JOIN `p.d.users` AS u TABLESAMPLE SYSTEM (1 PERCENT) USING (user_id)'
+    """
+    parentheses = _parentheses(sql)
+    parts = []
+    copied = 0
+    for match in _TABLE_RE.finditer(sql):
+        end = match.end()
+        system_time = _SYSTEM_TIME_RE.match(sql, end)
+        if system_time:
+            end = _system_time_end(sql, system_time.end())
+        if _TABLESAMPLE_RE.match(sql, end) or _is_function_argument(parentheses, match.start()):
+            continue
+        parts.append(sql[copied:end])
+        parts.append(f" TABLESAMPLE SYSTEM ({percent:g} PERCENT)")
+        copied = end
+    parts.append(sql[copied:])
+    return ''.join(parts)
+
+
+def project_columns(sql: str, columns: tp.Sequence[str]) -> str:
+    """
+    >>> project_columns('SELECT * FROM `{events}`;', ['user_id', 'event_time'])
+    'SELECT `user_id`, `event_time` FROM (\\nSELECT * FROM `{events}`\\n)'
+    """
+    return "SELECT {} FROM (\n{}\n)".format(
+        ', '.join(f"`{column}`" for column in columns),
+        sql.strip().rstrip(';'))
+
+
+def peek_query(
+        sql: str,
+        limit: int,
+        sample_percent: float | None = None,
+        columns: tp.Sequence[str] | None = None) -> str:
+    """Returns the query peeking the first `limit` rows of the result of `sql`, optionally
+    computed from samples of the tables and projected to `columns`."""
+    if sample_percent is not None:
+        sql = sample_tables(sql, sample_percent)
+    if columns:
+        return project_columns(sql, columns) + '\nLIMIT {}'.format(limit)
+    return sql if 'limit' in sql.lower() else sql + '\nLIMIT {}'.format(str(limit))
@@ -1,5 +1,6 @@
 import argparse
 import importlib
+import json
 import os
 import pathlib
 import subprocess
@@ -17,6 +18,7 @@ from typing import Tuple, Iterator, Optional
 import fnmatch
 
 import bigflow as bf
+import bigflow.backfill
 import bigflow.build.pip
 import bigflow.resources
 import bigflow.commons as bf_commons
@@ -24,7 +26,9 @@ import bigflow.build.dist
 import bigflow.build.dev
 import bigflow.build.operate
 import bigflow.build.spec
+import bigflow.metrics
 import bigflow.migrate
+import bigflow.runstate
 import bigflow.deploy
 import bigflow.scaffold
 import bigflow.version
@@ -136,24 +140,61 @@ def set_configuration_env(env):
         print(f"bf_env is : {os.environ.get('bf_env', None)}")
 
 
-def execute_job(root_package: Path, workflow_id: str, job_id: str, runtime=None):
+def execute_job(
+        root_package: Path,
+        workflow_id: str,
+        job_id: str,
+        runtime=None,
+        retries: bool = False,
+        timeouts: bool = False,
+        resume: bool = False,
+        metrics_file: Optional[str] = None,
+):
     """
     Executes the job with the `workflow_id`, with job id `job_id`
 
     @param runtime: str determine partition that will be used for write operations.
+    @param retries: bool retry the job according to its `retry_count` and `retry_pause_sec`.
+    @param timeouts: bool kill the job when it exceeds its `execution_timeout_sec`.
+    @param resume: bool skip the job if it already succeeded for the runtime.
+    @param metrics_file: str write execution metrics of the job to this file.
     """
     w = find_workflow(root_package, workflow_id)
-    w.run_job(job_id, runtime)
-
-
-def execute_workflow(root_package: Path, workflow_id: str, runtime=None):
+    w.run_job(job_id, runtime, retries=retries, timeouts=timeouts, resume=resume,
+              listeners=_metrics_listeners(metrics_file))
+
+
+def execute_workflow(
+        root_package: Path,
+        workflow_id: str,
+        runtime=None,
+        max_workers: int = 1,
+        executor: str = 'thread',
+        retries: bool = False,
+        timeouts: bool = False,
+        resume: bool = False,
+        metrics_file: Optional[str] = None,
+):
     """
     Executes the workflow with the `workflow_id`
 
     @param runtime: str determine partition that will be used for write operations.
+    @param max_workers: int maximum number of jobs executed concurrently.
+    @param executor: str 'thread', 'process' or 'asyncio' - how concurrent jobs are executed.
+    @param retries: bool retry failed jobs according to their `retry_count` and `retry_pause_sec`.
+    @param timeouts: bool kill jobs which exceed their `execution_timeout_sec`.
+    @param resume: bool skip jobs which already succeeded for the runtime.
+    @param metrics_file: str write execution metrics of jobs to this file.
     """
     w = find_workflow(root_package, workflow_id)
-    w.run(runtime)
+    w.run(runtime, max_workers=max_workers, executor=executor, retries=retries, timeouts=timeouts, resume=resume,
+          listeners=_metrics_listeners(metrics_file))
+
+
+def _metrics_listeners(metrics_file: Optional[str]) -> list:
+    if metrics_file is None:
+        return []
+    return [bigflow.metrics.JobMetricsCollector(metrics_file)]
 
 
 def read_project_name_from_setup() -> Optional[str]:
@@ -207,7 +248,13 @@ def import_deployment_config(deployment_config_path: str, property_name: str):
 def cli_run(project_package: str,
             runtime: Optional[str] = None,
             full_job_id: Optional[str] = None,
-            workflow_id: Optional[str] = None) -> None:
+            workflow_id: Optional[str] = None,
+            max_workers: int = 1,
+            executor: str = 'thread',
+            retries: bool = False,
+            timeouts: bool = False,
+            resume: bool = False,
+            metrics_file: Optional[str] = None) -> None:
     """
     Runs the specified job or workflow
 
@@ -215,6 +262,12 @@ def cli_run(project_package: str,
     @param runtime: Optional[str] Date of XXX in format "%Y-%m-%d %H:%M:%S"
     @param full_job_id: Optional[str] Represents both workflow_id and job_id in a string in format "<workflow_id>.<job_id>"
     @param workflow_id: Optional[str] The id of the workflow that should be executed
+    @param max_workers: int Maximum number of workflow jobs executed concurrently
+    @param executor: str Concurrent jobs are executed in threads ('thread'), processes ('process') or on an event loop ('asyncio')
+    @param retries: bool Retry failed jobs according to their `retry_count` and `retry_pause_sec`
+    @param timeouts: bool Kill jobs which exceed their `execution_timeout_sec`
+    @param resume: bool Skip jobs which already succeeded for the runtime in a previous run
+    @param metrics_file: Optional[str] Append execution metrics of jobs to this file (JSON lines, or Prometheus for *.prom)
     @return:
     """
 
@@ -227,13 +280,108 @@ def cli_run(project_package: str,
         except ValueError:
             raise ValueError(
                 'You should specify job using the workflow_id and job_id parameters - --job <workflow_id>.<job_id>.')
-        execute_job(project_package, workflow_id, job_id, runtime=runtime)
+        execute_job(project_package, workflow_id, job_id, runtime=runtime, retries=retries, timeouts=timeouts,
+                    resume=resume, metrics_file=metrics_file)
     elif workflow_id is not None:
-        execute_workflow(project_package, workflow_id, runtime=runtime)
+        execute_workflow(project_package, workflow_id, runtime=runtime, max_workers=max_workers, executor=executor,
+                         retries=retries, timeouts=timeouts, resume=resume, metrics_file=metrics_file)
     else:
         raise ValueError('You must provide the --job or --workflow for the run command.')
 
 
+def _parse_cli_datetime(value: str) -> datetime:
+    if value == 'NOW':
+        return datetime.now()
+    return bf.workflow._parse_runtime_str(value)
+
+
+def cli_backfill(project_package: str,
+                 workflow_id: str,
+                 start: str,
+                 end: str,
+                 parallel: int = 1,
+                 metrics_file: Optional[str] = None,
+                 **run_kwargs) -> None:
+    """
+    Runs the workflow for all runtimes between `start` and `end`, in a single process
+
+    @param project_package: str The main package of a user's project
+    @param workflow_id: str The id of the workflow that should be executed
+    @param start: str The first runtime in format "%Y-%m-%d %H:%M:%S" or "%Y-%m-%d"
+    @param end: str The last runtime in format "%Y-%m-%d %H:%M:%S" or "%Y-%m-%d"
+    @param parallel: int Maximum number of runtimes processed concurrently
+    @param metrics_file: Optional[str] Write execution metrics of jobs to this file
+    @param run_kwargs: Options passed to `Workflow.run` - `max_workers`, `executor`, `retries`, `timeouts`, `resume`
+    @return:
+    """
+    bigflow.build.pip.check_requirements_needs_recompile(Path("resources/requirements.txt"))
+
+    w = find_workflow(project_package, workflow_id)
+    bigflow.backfill.backfill(
+        w,
+        start=_parse_cli_datetime(start),
+        end=_parse_cli_datetime(end),
+        parallel=parallel,
+        listeners=_metrics_listeners(metrics_file),
+        **run_kwargs,
+    )
+
+
+def cli_plan(project_package: str,
+             workflow_id: str,
+             runtime: str,
+             output: Optional[str] = None,
+             max_cost_usd: Optional[float] = None,
+             **plan_kwargs) -> None:
+    """
+    Estimates bytes processed by all BigQuery statements of the workflow, prints the plan as JSON
+
+    @param project_package: str The main package of a user's project
+    @param workflow_id: str The id of the workflow that should be planned
+    @param runtime: str Runtime in format "%Y-%m-%d %H:%M:%S" or "%Y-%m-%d"
+    @param output: Optional[str] Write the plan to this file instead of the standard output
+    @param max_cost_usd: Optional[float] Fail when the estimated cost of the workflow is higher or unknown
+    @param plan_kwargs: Options passed to `plan_workflow` - `price_per_tib_usd`, `max_concurrent_dry_runs`
+    @return:
+    """
+    import bigflow.bigquery.plan
+
+    w = find_workflow(project_package, workflow_id)
+    plan = bigflow.bigquery.plan.plan_workflow(w, runtime, **plan_kwargs)
+    plan_json = json.dumps(plan.to_dict(), indent=2)
+    if output is None:
+        print(plan_json)
+    else:
+        Path(output).write_text(plan_json)
+
+    for error in plan.errors:
+        logger.warning("Unable to estimate %s", error)
+    logger.info("Workflow %s will process %d bytes and cost %.2f USD", workflow_id, plan.bytes_processed, plan.cost_usd)
+    if max_cost_usd is not None and plan.errors:
+        # statements which failed to dry-run may process any number of bytes
+        raise ValueError(
+            f"Estimated cost of the workflow is unknown, {len(plan.errors)} statements or components "
+            f"can't be estimated, so it can't be checked against {max_cost_usd} USD")
+    if max_cost_usd is not None and plan.cost_usd > max_cost_usd:
+        raise ValueError(f"Estimated cost of the workflow {plan.cost_usd:.2f} USD exceeds {max_cost_usd} USD")
+
+
+def cli_reconcile_labels(project_package: str, workflow_id: Optional[str] = None) -> None:
+    """
+    Updates changed labels of datasets and tables used by BigQuery jobs of the workflow (or of all workflows)
+
+    @param project_package: str The main package of a user's project
+    @param workflow_id: Optional[str] The id of the workflow, all workflows of the project when not given
+    @return:
+    """
+    import bigflow.bigquery.labels
+
+    workflows = [find_workflow(project_package, workflow_id)] if workflow_id else walk_workflows(project_package)
+    for w in workflows:
+        for dataset_id, tables in bigflow.bigquery.labels.reconcile_workflow_labels(w).items():
+            logger.info("Labels of %s reconciled, updated tables: %s", dataset_id, ", ".join(tables) or "none")
+
+
 def _parse_args(project_name: Optional[str], args) -> Namespace:
     parser = argparse.ArgumentParser(description=f'Welcome to BigFlow CLI.'
                                                   '\nType: bigflow {command} -h to print detailed help for a selected command.')
@@ -250,6 +398,9 @@ def _parse_args(project_name: Optional[str], args) -> Namespace:
                                        help='BigFlow command to execute')
 
     _create_run_parser(subparsers, project_name)
+    _create_backfill_parser(subparsers, project_name)
+    _create_plan_parser(subparsers, project_name)
+    _create_reconcile_labels_parser(subparsers, project_name)
     _create_deploy_dags_parser(subparsers)
     _create_deploy_image_parser(subparsers)
     _create_deploy_parser(subparsers)
@@ -363,6 +514,116 @@ def _create_run_parser(subparsers, project_name):
                         help='The date and time when this job or workflow should be started. '
                              'The default is now (%(default)s). '
                              'Examples: 2019-01-01, 2020-01-01 01:00:00')
+    _add_job_execution_arguments(parser)
+    _add_parsers_common_arguments(parser)
+
+    if project_name is None:
+        parser.add_argument('--project-package',
+                            required=True,
+                            type=str,
+                            help='The main package of your project. '
+                                 'Should contain `setup.py`')
+
+
+def _add_job_execution_arguments(parser):
+    parser.add_argument('--max-workers',
+                        type=int, default=1,
+                        help='Maximum number of jobs of the workflow executed concurrently. '
+                             'Jobs are started as soon as all their upstream jobs are finished. '
+                             'The default is %(default)s (run jobs one after another).')
+    parser.add_argument('--executor',
+                        choices=['thread', 'process', 'asyncio'], default='thread',
+                        help='Run concurrent jobs in threads, in separate processes, or on an asyncio event loop '
+                             '(async jobs share one thread, other jobs run in threads). The default is %(default)s.')
+    parser.add_argument('--retries',
+                        action='store_true', default=False,
+                        help='Retry failed jobs according to their `retry_count` and `retry_pause_sec`, '
+                             'the pause is doubled after each attempt.')
+    parser.add_argument('--timeouts',
+                        action='store_true', default=False,
+                        help='Execute each job in a separate process and kill it '
+                             'when it exceeds its `execution_timeout_sec`.')
+    parser.add_argument('--resume',
+                        action='store_true', default=False,
+                        help='Record finished jobs in a local state file (%s) and skip jobs '
+                             'which already succeeded for the same runtime.' % bigflow.runstate.DEFAULT_RUN_STATE_PATH)
+    parser.add_argument('--metrics-file',
+                        type=str, default=None,
+                        help='Write wall time, CPU time and peak memory of each job to this file. '
+                             'Records are appended as JSON lines, files with the `.prom` suffix '
+                             'are written in the Prometheus text format.')
+
+
+def _create_backfill_parser(subparsers, project_name):
+    parser = subparsers.add_parser('backfill',
+                                   description='BigFlow CLI backfill command -- run a workflow for a range of runtimes')
+    parser.add_argument('-w', '--workflow',
+                        type=str, required=True,
+                        help='The id of the workflow to backfill.')
+    parser.add_argument('-s', '--start',
+                        type=bf_commons.valid_datetime, required=True,
+                        help='The first runtime, interpreted like `--start-time` of the build-dags command. '
+                             'Examples: 2019-01-01, 2020-01-01 01:00:00')
+    parser.add_argument('-e', '--end',
+                        type=bf_commons.valid_datetime, required=True,
+                        help='The last runtime (inclusive), interpreted like `--start-time` of the build-dags command.')
+    parser.add_argument('--parallel',
+                        type=int, default=1,
+                        help='Maximum number of runtimes processed concurrently. '
+                             'Ignored for workflows with `depends_on_past`. The default is %(default)s.')
+    _add_job_execution_arguments(parser)
+    _add_parsers_common_arguments(parser)
+
+    if project_name is None:
+        parser.add_argument('--project-package',
+                            required=True,
+                            type=str,
+                            help='The main package of your project. '
+                                 'Should contain `setup.py`')
+
+
+def _create_plan_parser(subparsers, project_name):
+    parser = subparsers.add_parser('plan',
+                                   description='BigFlow CLI plan command -- estimate bytes processed and cost '
+                                               'of all BigQuery statements of a workflow with dry runs')
+    parser.add_argument('-w', '--workflow',
+                        type=str, required=True,
+                        help='The id of the workflow to plan.')
+    parser.add_argument('-r', '--runtime',
+                        type=str, default=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        help='The runtime used to render statements. '
+                             'The default is now (%(default)s). '
+                             'Examples: 2019-01-01, 2020-01-01 01:00:00')
+    parser.add_argument('-o', '--output',
+                        type=str, default=None,
+                        help='Write the plan (JSON) to this file instead of the standard output.')
+    parser.add_argument('--max-cost',
+                        type=float, default=None,
+                        help='Fail when the estimated cost of the workflow (in USD) is higher, '
+                             'or unknown because some statements can\'t be dry-run.')
+    parser.add_argument('--price-per-tib',
+                        type=float, default=6.25,
+                        help='On-demand price of 1 TiB processed, in USD. The default is %(default)s.')
+    parser.add_argument('--max-concurrent-dry-runs',
+                        type=int, default=8,
+                        help='Maximum number of dry runs sent at the same time. The default is %(default)s.')
+    _add_parsers_common_arguments(parser)
+
+    if project_name is None:
+        parser.add_argument('--project-package',
+                            required=True,
+                            type=str,
+                            help='The main package of your project. '
+                                 'Should contain `setup.py`')
+
+
+def _create_reconcile_labels_parser(subparsers, project_name):
+    parser = subparsers.add_parser('reconcile-labels',
+                                   description='BigFlow CLI reconcile-labels command -- update changed labels '
+                                               'of datasets and tables used by BigQuery jobs, run it on deploy')
+    parser.add_argument('-w', '--workflow',
+                        type=str, default=None,
+                        help='The id of the workflow. Labels of all workflows are reconciled when not given.')
     _add_parsers_common_arguments(parser)
 
     if project_name is None:
@@ -876,7 +1137,29 @@ def cli(raw_args) -> None:
     if operation == 'run':
         set_configuration_env(parsed_args.config)
         root_package = find_root_package(project_name, read_project_package(parsed_args))
-        cli_run(root_package, parsed_args.runtime, parsed_args.job, parsed_args.workflow)
+        cli_run(root_package, parsed_args.runtime, parsed_args.job, parsed_args.workflow,
+                max_workers=parsed_args.max_workers, executor=parsed_args.executor,
+                retries=parsed_args.retries, timeouts=parsed_args.timeouts, resume=parsed_args.resume,
+                metrics_file=parsed_args.metrics_file)
+    elif operation == 'backfill':
+        set_configuration_env(parsed_args.config)
+        root_package = find_root_package(project_name, read_project_package(parsed_args))
+        cli_backfill(root_package, parsed_args.workflow, parsed_args.start, parsed_args.end,
+                     parallel=parsed_args.parallel,
+                     max_workers=parsed_args.max_workers, executor=parsed_args.executor,
+                     retries=parsed_args.retries, timeouts=parsed_args.timeouts, resume=parsed_args.resume,
+                     metrics_file=parsed_args.metrics_file)
+    elif operation == 'plan':
+        set_configuration_env(parsed_args.config)
+        root_package = find_root_package(project_name, read_project_package(parsed_args))
+        cli_plan(root_package, parsed_args.workflow, parsed_args.runtime,
+                 output=parsed_args.output, max_cost_usd=parsed_args.max_cost,
+                 price_per_tib_usd=parsed_args.price_per_tib,
+                 max_concurrent_dry_runs=parsed_args.max_concurrent_dry_runs)
+    elif operation == 'reconcile-labels':
+        set_configuration_env(parsed_args.config)
+        root_package = find_root_package(project_name, read_project_package(parsed_args))
+        cli_reconcile_labels(root_package, parsed_args.workflow)
     elif operation == 'deploy-image':
         _cli_deploy_image(parsed_args)
     elif operation == 'deploy-dags':
@@ -7,7 +7,7 @@ from textwrap import dedent, indent
 from pathlib import Path
 from datetime import datetime
 
-from bigflow import commons
+from bigflow import analysis, commons
 from bigflow.workflow import DEFAULT_EXECUTION_TIMEOUT, Workflow, WorkflowJob
 
 
@@ -46,6 +46,12 @@ def generate_dag_file(
 
     logger.info("dag_file_path: %s", dag_file_path)
 
+    # priority hints are emitted only when jobs declare their expected duration
+    if analysis.has_expected_durations(workflow.definition):
+        priority_weights = workflow.analyze().priority_weights()
+    else:
+        priority_weights = {}
+
     dag_chunks = []
     dag_chunks.append(dedent(f"""\
         # This file was generated by `bigflow build-dags`
@@ -138,9 +144,18 @@ def generate_dag_file(
             if IS_COMPOSER_2_X:
                 {pod_operator_params_var}['config_file'] = "/home/airflow/composer_kube_config"
                 {pod_operator_params_var}['kubernetes_conn_id'] = "kubernetes_default"
+            """))
+
+        if job.id in priority_weights:
+            dag_chunks[-1] += dedent(f"""\
+                {pod_operator_params_var}['priority_weight'] = {priority_weights[job.id]!r}
+                {pod_operator_params_var}['weight_rule'] = 'absolute'
+                """)
+
+        dag_chunks[-1] += dedent(f"""\
 
             {job_var} = KubernetesPodOperator(**{pod_operator_params_var})
-            """))
+            """)
 
         for d in dependencies:
             up_job_var = f"t{d.job.id}"
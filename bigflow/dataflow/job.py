@@ -1,5 +1,7 @@
+import asyncio
 import typing
 import logging
+import time
 import uuid
 import inspect
 
@@ -68,6 +70,7 @@ class PipelineOptionsDict(TypedDict, total=False):
 class BeamJob(Job):
 
     pipeline_level_execution_timeout_shift = 120  # 2 minutes
+    status_poll_interval_sec = 10  # used by `execute_async`
 
     def __init__(
             self,
@@ -161,6 +164,40 @@ class BeamJob(Job):
         logger.info("wait pipeline result...")
         self.wait_pipeline_result(result)
 
+    async def execute_async(self, context: JobContext):
+        """Like `execute`, but doesn't block the event loop while the pipeline is running."""
+        loop = asyncio.get_running_loop()
+        pipeline = self.test_pipeline or self.new_pipeline(context)
+
+        logger.info("init beam pipeline...")
+        self.init_pipeline(context, pipeline)
+
+        logger.info("run beam pipeline...")
+        # submitting may take a while (staging files), the runner may also block until the pipeline is finished
+        result = await loop.run_in_executor(None, self.run_pipeline, context, pipeline)
+
+        logger.info("poll pipeline result...")
+        await self.wait_pipeline_result_async(result)
+
+    async def wait_pipeline_result_async(self, result: PipelineResult):
+        if not (self.wait_until_finish and self.execution_timeout_sec):
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self.execution_timeout_sec - self.pipeline_level_execution_timeout_shift
+        while True:
+            # reading the state may call the runner API
+            state = await loop.run_in_executor(None, lambda: result.state)
+            if PipelineState.is_terminal(state):
+                break
+            if time.monotonic() >= deadline:
+                result.cancel()
+                raise RuntimeError(f'Job {self.id} timed out ({self.execution_timeout_sec})')
+            await asyncio.sleep(min(self.status_poll_interval_sec, max(0, deadline - time.monotonic())))
+
+        if state in (PipelineState.FAILED, PipelineState.CANCELLED):
+            raise RuntimeError(f'Job {self.id} finished with state {state}')
+
     def wait_pipeline_result(self, result: PipelineResult):
         if self.wait_until_finish and self.execution_timeout_sec:
             timeout_in_milliseconds = 1000 * (self.execution_timeout_sec - self.pipeline_level_execution_timeout_shift)
@@ -0,0 +1,590 @@
+"""Execution of workflow jobs.
+
+Jobs are scheduled according to the workflow graph - each job is started as soon
+as all its parents have finished, so independent branches run concurrently.
+Optionally `retry_count`, `retry_pause_sec` and `execution_timeout_sec` of jobs are
+honoured the same way as Airflow does it on production.
+Wall time, CPU time and peak RSS of each job are measured and reported to listeners.
+Jobs implementing `execute_async` (or a coroutine `execute`, see `bigflow.workflow.AsyncJob`)
+may be executed concurrently on a single asyncio event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import concurrent.futures
+import inspect
+import logging
+import multiprocessing
+import sys
+import time
+import typing
+
+from typing import (
+    Any,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+if typing.TYPE_CHECKING:
+    from bigflow.results import MemoStore
+    from bigflow.runstate import RunStateStore
+    from bigflow.workflow import JobContext, JobListener, WorkflowJob
+
+
+logger = logging.getLogger(__name__)
+
+
+EXECUTOR_THREAD = 'thread'
+EXECUTOR_PROCESS = 'process'
+EXECUTOR_ASYNCIO = 'asyncio'
+EXECUTORS = (EXECUTOR_THREAD, EXECUTOR_PROCESS, EXECUTOR_ASYNCIO)
+
+# how long a child process which has sent the result of a job may take to exit
+CHILD_EXIT_TIMEOUT_SEC = 10
+
+
+def _create_pool(executor: str, max_workers: int) -> concurrent.futures.Executor:
+    if executor == EXECUTOR_THREAD:
+        return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bigflow-job")
+    elif executor == EXECUTOR_PROCESS:
+        return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    raise ValueError(f"Unknown pool executor {executor!r}, expected {EXECUTOR_THREAD!r} or {EXECUTOR_PROCESS!r}")
+
+
+class JobTimeoutError(Exception):
+    """Job was killed, because it exceeded its `execution_timeout_sec`."""
+
+
+class JobStats(NamedTuple):
+    """Resources used by a single job execution (including all its attempts).
+
+    `peak_rss_bytes` is the peak memory of the process which executed the job.  When the job
+    is executed in the main process (or in a reused pool worker) it's the peak of the whole process
+    observed until the job has finished.  It's `None` when the platform doesn't report it.
+    `cpu_time_sec` is `None` for async jobs, which share the event loop thread.
+    """
+
+    wall_time_sec: float
+    cpu_time_sec: Optional[float]
+    peak_rss_bytes: Optional[int]
+    attempts: int
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+class _ResourceUsage:
+    """Usage reported by child processes which executed attempts of a job."""
+
+    def __init__(self):
+        self.attempts = 0
+        self.cpu_time_sec = 0.0
+        self.peak_rss_bytes: Optional[int] = None
+
+    def add_child_usage(self, cpu_time_sec: float, peak_rss_bytes: Optional[int]) -> None:
+        self.cpu_time_sec += cpu_time_sec
+        if peak_rss_bytes is not None:
+            self.peak_rss_bytes = max(self.peak_rss_bytes or 0, peak_rss_bytes)
+
+
+def _mp_context() -> multiprocessing.context.BaseContext:
+    # 'fork' doesn't require jobs to be picklable, fallback to the default one when not available
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def _execute_in_child(job: WorkflowJob, context: JobContext, conn) -> None:
+    # executed from child process
+    try:
+        import tblib.pickling_support
+        tblib.pickling_support.install()
+    except ImportError:
+        pass
+    with conn:
+        try:
+            result = job.execute(context)
+        except BaseException as e:
+            conn.send(('error', e, _child_usage()))
+        else:
+            try:
+                conn.send(('ok', result, _child_usage()))
+            except Exception as e:
+                # result is not picklable
+                conn.send(('ok', None, _child_usage()))
+                logger.warning("Unable to pass result of job %s to the parent process: %s", job, e)
+
+
+def _child_usage() -> Tuple[float, Optional[int]]:
+    return time.process_time(), _peak_rss_bytes()
+
+
+def _execute_with_timeout(
+    job: WorkflowJob,
+    context: JobContext,
+    timeout: float,
+    usage: Optional[_ResourceUsage] = None,
+) -> typing.Any:
+    """Executes the job in a child process, the process is killed when `timeout` expires."""
+
+    mp = _mp_context()
+    parent_conn, child_conn = mp.Pipe(duplex=False)
+    process = mp.Process(target=_execute_in_child, args=(job, context, child_conn), daemon=True)
+    process.start()
+    child_conn.close()
+
+    finished = False
+    try:
+        if not parent_conn.poll(timeout):
+            raise JobTimeoutError(f"Job {job.id} exceeded execution timeout of {timeout} seconds")
+        try:
+            status, value, child_usage = parent_conn.recv()
+        except EOFError:
+            process.join()
+            raise RuntimeError(f"Process of job {job.id} was unexpectedly terminated, exit code {process.exitcode}")
+        finished = True
+    finally:
+        if finished:
+            # the child is usually still exiting right after it has sent the result
+            process.join(CHILD_EXIT_TIMEOUT_SEC)
+            if process.is_alive():
+                logger.warning("Process %d of job %s hasn't exited after the job has finished, kill it",
+                               process.pid, job.id)
+                process.kill()
+        elif process.is_alive():
+            logger.error("Kill process %d of job %s", process.pid, job.id)
+            process.kill()
+        process.join()
+        parent_conn.close()
+
+    if usage is not None:
+        usage.add_child_usage(*child_usage)
+    if status == 'error':
+        raise value
+    return value
+
+
+def execute_job(
+    job: WorkflowJob,
+    context: JobContext,
+    retries: bool = False,
+    timeouts: bool = False,
+    usage: Optional[_ResourceUsage] = None,
+) -> typing.Any:
+    """Executes a single job, returns its result.
+
+    When `retries` is set a failed job is retried up to `job.retry_count` times,
+    the pause between attempts starts at `job.retry_pause_sec` and doubles after each attempt.
+    When `timeouts` is set each attempt is executed in a separate process,
+    which is killed after `job.execution_timeout_sec`.
+    """
+    attempts = 1 + (job.retry_count if retries else 0)
+
+    for attempt in range(1, attempts + 1):
+        logger.debug("Execute job %s, attempt %d of %d", job, attempt, attempts)
+        if usage is not None:
+            usage.attempts = attempt
+        try:
+            if timeouts and job.execution_timeout_sec:
+                return _execute_with_timeout(job, context, job.execution_timeout_sec, usage)
+            else:
+                return job.execute(context)
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            pause = job.retry_pause_sec * 2 ** (attempt - 1)
+            logger.warning(
+                "Job %s failed (attempt %d of %d), retry in %s seconds: %s",
+                job.id, attempt, attempts, pause, e)
+            time.sleep(pause)
+
+
+def execute_measured_job(
+    job: WorkflowJob,
+    context: JobContext,
+    retries: bool = False,
+    timeouts: bool = False,
+) -> Tuple[Any, Optional[Exception], JobStats]:
+    """Executes the job like `execute_job`, returns its result (or error) and used resources."""
+    usage = _ResourceUsage()
+    started = time.perf_counter()
+    cpu_started = time.thread_time()
+    result = error = None
+    try:
+        result = execute_job(job, context, retries, timeouts, usage)
+    except Exception as e:
+        error = e
+    peak_rss_bytes = _peak_rss_bytes()
+    if usage.peak_rss_bytes is not None:
+        # the job was executed in child processes
+        peak_rss_bytes = usage.peak_rss_bytes
+    stats = JobStats(
+        wall_time_sec=time.perf_counter() - started,
+        cpu_time_sec=time.thread_time() - cpu_started + usage.cpu_time_sec,
+        peak_rss_bytes=peak_rss_bytes,
+        attempts=usage.attempts,
+    )
+    return result, error, stats
+
+
+def async_execute_method(job) -> Optional[typing.Callable[[JobContext], typing.Awaitable]]:
+    """Returns coroutine function executing the (not wrapped) job, `None` for blocking jobs."""
+    execute_async = getattr(job, 'execute_async', None)
+    if execute_async is not None:
+        return execute_async
+    execute = getattr(job, 'execute', None)
+    if inspect.iscoroutinefunction(execute):
+        return execute
+    return None
+
+
+async def execute_measured_job_async(
+    job: WorkflowJob,
+    context: JobContext,
+    retries: bool = False,
+    timeouts: bool = False,
+    pool: Optional[concurrent.futures.Executor] = None,
+) -> Tuple[Any, Optional[Exception], JobStats]:
+    """Asyncio counterpart of `execute_measured_job`, blocking jobs are executed in the `pool`."""
+    execute_async = async_execute_method(job.job)
+    if execute_async is None:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, execute_measured_job, job, context, retries, timeouts)
+
+    attempts = 1 + (job.retry_count if retries else 0)
+    timeout = job.execution_timeout_sec if timeouts else None
+    started = time.perf_counter()
+    result = error = None
+
+    for attempt in range(1, attempts + 1):
+        logger.debug("Execute async job %s, attempt %d of %d", job, attempt, attempts)
+        try:
+            if timeout:
+                try:
+                    result = await asyncio.wait_for(execute_async(context), timeout)
+                except asyncio.TimeoutError:
+                    raise JobTimeoutError(f"Job {job.id} exceeded execution timeout of {timeout} seconds")
+            else:
+                result = await execute_async(context)
+            error = None
+            break
+        except Exception as e:
+            error = e
+            if attempt == attempts:
+                break
+            pause = job.retry_pause_sec * 2 ** (attempt - 1)
+            logger.warning(
+                "Job %s failed (attempt %d of %d), retry in %s seconds: %s",
+                job.id, attempt, attempts, pause, e)
+            await asyncio.sleep(pause)
+
+    stats = JobStats(
+        wall_time_sec=time.perf_counter() - started,
+        cpu_time_sec=None,
+        peak_rss_bytes=_peak_rss_bytes(),
+        attempts=attempt,
+    )
+    return result, error, stats
+
+
+class WorkflowExecutor:
+    """Runs jobs of a workflow graph on a bounded pool of workers.
+
+    Arguments:
+      jobs - all jobs of the graph, in sequential run order (used as a tiebreaker between ready jobs)
+      parental_map - maps each job into the list of jobs it depends on
+      max_workers - maximum number of jobs executed at the same time
+      executor - 'thread', 'process' (jobs and the context must be picklable) or 'asyncio'
+        (async jobs are awaited on a single event loop, other jobs are executed in threads)
+      retries - retry failed jobs, see `execute_job`
+      timeouts - kill jobs which exceed their execution timeout, see `execute_job`
+      state_store - successfully finished jobs are recorded there
+      resume - skip jobs which are already recorded as finished in the `state_store`, their results
+        are loaded from the `memo_store` (downstream jobs can't read them when they aren't memoised)
+      memo_store - results of finished jobs are memoised there, jobs with a memoised result
+        (for the same code, runtime and upstream jobs) are skipped
+      listeners - notified when each job starts, ends or fails (see `bigflow.workflow.JobListener`),
+        listeners are always called from the thread which runs the executor
+
+    When `max_workers` is 1 and the thread executor is used all jobs are executed
+    one after another in the current thread.  For the 'asyncio' executor `max_workers`
+    limits the number of jobs running at the same time.
+    """
+
+    def __init__(
+        self,
+        jobs: List[WorkflowJob],
+        parental_map: Dict[WorkflowJob, List[WorkflowJob]],
+        max_workers: int = 1,
+        executor: str = EXECUTOR_THREAD,
+        retries: bool = False,
+        timeouts: bool = False,
+        state_store: Optional[RunStateStore] = None,
+        resume: bool = False,
+        memo_store: Optional[MemoStore] = None,
+        listeners: Sequence[JobListener] = (),
+    ):
+        if max_workers < 1:
+            raise ValueError(f"`max_workers` must be positive, got {max_workers}")
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor {executor!r}, expected one of {', '.join(EXECUTORS)}")
+
+        self.jobs = jobs
+        self.parental_map = parental_map
+        self.max_workers = max_workers
+        self.executor = executor
+        self.retries = retries
+        self.timeouts = timeouts
+        self.state_store = state_store
+        self.resume = resume
+        self.memo_store = memo_store
+        self.listeners = list(listeners)
+        self._memo_keys: Dict[WorkflowJob, str] = {}
+
+        if resume and state_store is None:
+            raise ValueError("`state_store` is required to resume a workflow run")
+
+    def run(self, context: JobContext) -> None:
+        completed = self._find_completed_jobs(context)
+        completed |= self._load_memoised_jobs(context, completed)
+        if self.executor == EXECUTOR_ASYNCIO:
+            self._run_asyncio(context, completed)
+        elif self.max_workers == 1 and self.executor == EXECUTOR_THREAD:
+            self._run_sequentially(context, completed)
+        else:
+            self._run_concurrently(context, completed)
+
+    def _find_completed_jobs(self, context: JobContext) -> Set[WorkflowJob]:
+        if not self.resume:
+            return set()
+        completed_ids = self.state_store.completed_jobs(context.workflow_id, context.runtime_str)
+        completed = {job for job in self.jobs if job.id in completed_ids}
+        if completed:
+            logger.info("Resume run of workflow %s, skip %d already finished jobs: %s",
+                        context.workflow_id, len(completed), ", ".join(sorted(job.id for job in completed)))
+        return completed
+
+    def _load_memoised_jobs(self, context: JobContext, completed: Set[WorkflowJob]) -> Set[WorkflowJob]:
+        if self.memo_store is None:
+            self._mark_results_unavailable(context, completed)
+            return set()
+
+        import bigflow.results
+        memoised = set()
+        unavailable = set()
+        for job in self.jobs:  # upstream jobs go first
+            upstream_keys = [self._memo_keys[p] for p in self.parental_map.get(job, ()) if p in self._memo_keys]
+            key = bigflow.results.memo_key(
+                context.workflow_id, job.job, context.runtime_str, upstream_keys, env=context.env)
+            self._memo_keys[job] = key
+            found, result = self.memo_store.load(key)
+            if found:
+                # results of jobs skipped by `resume` are loaded too, downstream jobs may need them
+                self._store_result(job, context, result)
+                if job not in completed:
+                    memoised.add(job)
+            elif job in completed:
+                unavailable.add(job)
+
+        if memoised:
+            logger.info("Skip %d jobs with memoised results: %s",
+                        len(memoised), ", ".join(sorted(job.id for job in memoised)))
+        self._mark_results_unavailable(context, unavailable)
+        return memoised
+
+    def _mark_results_unavailable(self, context: JobContext, jobs: Set[WorkflowJob]) -> None:
+        if context.results is None:
+            return
+        for job in jobs:
+            if not context.results.contains(context.runtime_str, job.id):
+                context.results.mark_unavailable(
+                    context.runtime_str, job.id,
+                    f"No result of job {job.id} for runtime {context.runtime_str}, the job was skipped "
+                    f"because it had already finished - run the workflow with `memoize=True` together with "
+                    f"`resume=True` to restore results of resumed jobs")
+
+    def _store_result(self, job: WorkflowJob, context: JobContext, result: Any) -> None:
+        if context.results is not None:
+            context.results.put(context.runtime_str, job.id, result)
+
+    def _notify(self, event: str, job: WorkflowJob, *args) -> None:
+        for listener in self.listeners:
+            try:
+                getattr(listener, event)(job.job, *args)
+            except Exception:
+                # broken instrumentation should never break the workflow
+                logger.exception("Listener %r failed on %s of job %s", listener, event, job.id)
+
+    def _on_job_started(self, job: WorkflowJob, context: JobContext) -> None:
+        self._notify('on_job_start', job, context)
+
+    def _on_job_finished(self, job: WorkflowJob, context: JobContext, stats: JobStats, result: Any) -> None:
+        self._store_result(job, context, result)
+        if self.memo_store is not None and job in self._memo_keys:
+            self.memo_store.save(self._memo_keys[job], result)
+        if self.state_store is not None:
+            self.state_store.mark_completed(context.workflow_id, job.id, context.runtime_str)
+        self._notify('on_job_end', job, context, stats)
+
+    def _on_job_failed(
+        self,
+        job: WorkflowJob,
+        context: JobContext,
+        error: BaseException,
+        stats: Optional[JobStats],
+    ) -> None:
+        self._notify('on_job_error', job, context, error, stats)
+
+    def _run_sequentially(self, context: JobContext, completed: Set[WorkflowJob]) -> None:
+        for job in self.jobs:
+            if job in completed:
+                continue
+            self._on_job_started(job, context)
+            result, error, stats = execute_measured_job(job, context, retries=self.retries, timeouts=self.timeouts)
+            if error is not None:
+                self._on_job_failed(job, context, error, stats)
+                raise error
+            self._on_job_finished(job, context, stats, result)
+
+    def _run_concurrently(self, context: JobContext, completed: Set[WorkflowJob]) -> None:
+        graph = _GraphProgress(self.jobs, self.parental_map, completed)
+
+        # each attempt is already executed in its own (killable) process when timeouts are enforced,
+        # also workers of `ProcessPoolExecutor` are not allowed to spawn child processes
+        executor = EXECUTOR_THREAD if self.timeouts else self.executor
+
+        logger.info("Run %d jobs with %d %s workers", graph.jobs_count, self.max_workers, self.executor)
+        with _create_pool(executor, self.max_workers) as pool:
+            running: Dict[concurrent.futures.Future, WorkflowJob] = {}
+            while True:
+                while graph.has_ready_jobs():
+                    job = graph.pop_ready_job()
+                    logger.debug("Submit job %s", job)
+                    self._on_job_started(job, context)
+                    running[pool.submit(execute_measured_job, job, context, self.retries, self.timeouts)] = job
+
+                if not running:
+                    break
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    error = future.exception()  # the pool itself has failed
+                    result = stats = None
+                    if error is None:
+                        result, error, stats = future.result()
+                    self._on_job_done(graph, job, context, result, error, stats)
+
+        graph.raise_first_error()
+
+    def _run_asyncio(self, context: JobContext, completed: Set[WorkflowJob]) -> None:
+        graph = _GraphProgress(self.jobs, self.parental_map, completed)
+        logger.info("Run %d jobs with up to %d jobs on asyncio loop", graph.jobs_count, self.max_workers)
+
+        async def run_jobs():
+            # blocking (not async) jobs are executed in threads
+            with _create_pool(EXECUTOR_THREAD, self.max_workers) as pool:
+                running: Dict[asyncio.Future, WorkflowJob] = {}
+                while True:
+                    while graph.has_ready_jobs() and len(running) < self.max_workers:
+                        job = graph.pop_ready_job()
+                        logger.debug("Start job %s", job)
+                        self._on_job_started(job, context)
+                        task = asyncio.ensure_future(
+                            execute_measured_job_async(job, context, self.retries, self.timeouts, pool))
+                        running[task] = job
+
+                    if not running:
+                        break
+
+                    done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        job = running.pop(task)
+                        result, error, stats = task.result()
+                        self._on_job_done(graph, job, context, result, error, stats)
+
+        asyncio.run(run_jobs())
+        graph.raise_first_error()
+
+    def _on_job_done(
+        self,
+        graph: _GraphProgress,
+        job: WorkflowJob,
+        context: JobContext,
+        result: Any,
+        error: Optional[BaseException],
+        stats: Optional[JobStats],
+    ) -> None:
+        if error is not None:
+            logger.error("Job %s failed: %s", job, error)
+            self._on_job_failed(job, context, error, stats)
+        else:
+            self._on_job_finished(job, context, stats, result)
+        graph.mark_done(job, error)
+
+
+class _GraphProgress:
+    """Tracks which jobs of the graph are ready to be started."""
+
+    def __init__(
+        self,
+        jobs: List[WorkflowJob],
+        parental_map: Dict[WorkflowJob, List[WorkflowJob]],
+        completed: Set[WorkflowJob],
+    ):
+        self.children: Dict[WorkflowJob, List[WorkflowJob]] = collections.defaultdict(list)
+        for job, parents in parental_map.items():
+            for parent in parents:
+                self.children[parent].append(job)
+
+        self.waiting_for = {
+            job: set(parental_map.get(job, ())) - completed
+            for job in jobs
+            if job not in completed
+        }
+        self.ready = collections.deque(job for job in jobs if job in self.waiting_for and not self.waiting_for[job])
+        self.errors: List[BaseException] = []
+
+    @property
+    def jobs_count(self) -> int:
+        return len(self.waiting_for)
+
+    def has_ready_jobs(self) -> bool:
+        # stop scheduling new jobs after the first failure, but let running ones finish
+        return bool(self.ready) and not self.errors
+
+    def pop_ready_job(self) -> WorkflowJob:
+        return self.ready.popleft()
+
+    def mark_done(self, job: WorkflowJob, error: Optional[BaseException]) -> None:
+        if error is not None:
+            self.errors.append(error)
+            return
+        for child in self.children[job]:
+            if child not in self.waiting_for:
+                continue  # already finished in the resumed run
+            self.waiting_for[child].discard(job)
+            if not self.waiting_for[child]:
+                self.ready.append(child)
+
+    def raise_first_error(self) -> None:
+        if self.errors:
+            raise self.errors[0]
@@ -0,0 +1,151 @@
+"""Collecting execution metrics of workflow jobs - wall time, CPU time and peak memory.
+
+Metrics may be written as JSON lines (one record per job execution, appended)
+or in the Prometheus text exposition format (e.g. for the node-exporter textfile collector).
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+import os
+import threading
+
+from pathlib import Path
+from typing import (
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from bigflow.commons import public
+from bigflow.executor import JobStats
+from bigflow.workflow import Job, JobContext, JobListener
+
+
+logger = logging.getLogger(__name__)
+
+
+FORMAT_JSON_LINES = 'jsonl'
+FORMAT_PROMETHEUS = 'prometheus'
+
+_PROMETHEUS_SUFFIXES = ('.prom',)
+
+
+@public()
+class JobMetrics(NamedTuple):
+    workflow_id: Optional[str]
+    job_id: str
+    runtime: str
+    status: str  # 'success' or 'error'
+    finished_at: str
+    wall_time_sec: Optional[float]
+    cpu_time_sec: Optional[float]
+    peak_rss_bytes: Optional[int]
+    attempts: Optional[int]
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict(), sort_keys=True)
+
+
+_PROMETHEUS_METRICS = [
+    ('bigflow_job_wall_time_seconds', 'wall_time_sec', "Wall time of the job execution, including retries."),
+    ('bigflow_job_cpu_time_seconds', 'cpu_time_sec', "CPU time used by the job."),
+    ('bigflow_job_peak_rss_bytes', 'peak_rss_bytes', "Peak resident memory of the process which executed the job."),
+    ('bigflow_job_attempts', 'attempts', "Number of attempts made to execute the job."),
+]
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus_text(records: List[JobMetrics]) -> str:
+    """Renders records in the Prometheus text format, the latest record wins for each (workflow, job, runtime)."""
+    latest: Dict[Tuple[Optional[str], str, str], JobMetrics] = {}
+    for record in records:
+        latest[record.workflow_id, record.job_id, record.runtime] = record
+
+    lines = []
+    for name, field, description in _PROMETHEUS_METRICS:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        for record in latest.values():
+            value = getattr(record, field)
+            if value is None:
+                continue
+            labels = ",".join(
+                f'{label}="{_escape_label_value(str(label_value))}"'
+                for label, label_value in [
+                    ('workflow', record.workflow_id or ''),
+                    ('job', record.job_id),
+                    ('runtime', record.runtime),
+                    ('status', record.status),
+                ])
+            lines.append(f"{name}{{{labels}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+@public()
+class JobMetricsCollector(JobListener):
+    """Records metrics of each executed job, pass it to `Workflow.run(listeners=[...])`.
+
+    When `path` is set the metrics are written there as soon as a job finishes.  In the JSON lines
+    format records are appended to the file, in the Prometheus format the whole file is replaced.
+    The format is guessed from the file suffix (`.prom` means Prometheus) unless `format` is given.
+    One collector may be shared by many concurrent workflow runs.
+    """
+
+    def __init__(self, path: Union[str, Path, None] = None, format: Optional[str] = None):
+        if format is None:
+            format = FORMAT_PROMETHEUS if path is not None and Path(path).suffix in _PROMETHEUS_SUFFIXES else FORMAT_JSON_LINES
+        if format not in (FORMAT_JSON_LINES, FORMAT_PROMETHEUS):
+            raise ValueError(f"Unknown metrics format {format!r}, expected {FORMAT_JSON_LINES!r} or {FORMAT_PROMETHEUS!r}")
+        self.path = Path(path) if path is not None else None
+        self.format = format
+        self.records: List[JobMetrics] = []
+        self._lock = threading.Lock()
+
+    def on_job_end(self, job: Job, context: JobContext, stats: JobStats) -> None:
+        self._record(job, context, 'success', stats)
+
+    def on_job_error(self, job: Job, context: JobContext, error: BaseException, stats: Optional[JobStats]) -> None:
+        self._record(job, context, 'error', stats)
+
+    def _record(self, job: Job, context: JobContext, status: str, stats: Optional[JobStats]) -> None:
+        stats_fields = stats._asdict() if stats is not None else dict.fromkeys(JobStats._fields)
+        record = JobMetrics(
+            workflow_id=context.workflow_id,
+            job_id=job.id,
+            runtime=context.runtime_str,
+            status=status,
+            finished_at=dt.datetime.now().isoformat(),
+            **stats_fields,
+        )
+        logger.debug("Job metrics: %s", record)
+        with self._lock:
+            self.records.append(record)
+            if self.path is not None:
+                self._write(record)
+
+    def _write(self, record: JobMetrics) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.format == FORMAT_JSON_LINES:
+            with open(self.path, 'a') as f:
+                f.write(record.to_json() + "\n")
+        else:
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            tmp_path.write_text(to_prometheus_text(self.records))
+            os.replace(tmp_path, self.path)
+
+    def to_json_lines(self) -> str:
+        with self._lock:
+            return "".join(record.to_json() + "\n" for record in self.records)
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            return to_prometheus_text(self.records)
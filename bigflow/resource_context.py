@@ -0,0 +1,84 @@
+"""Resources shared by jobs of a workflow executed in the same process.
+
+Jobs often need the same expensive objects (API clients) or perform the same idempotent
+set-up calls (creating datasets, upserting labels).  `ResourceContext` keeps such objects
+for the lifetime of a workflow, so they are created once instead of once per job.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    TypeVar,
+)
+
+from bigflow.commons import public
+
+
+logger = logging.getLogger(__name__)
+
+_T = TypeVar('_T')
+
+
+@public()
+class ResourceContext:
+    """Thread-safe cache of resources, keyed by arbitrary hashable keys.
+
+    Each resource is created only once, even when many jobs ask for it concurrently.
+    Failed creation is not cached.  The context is not shared between processes -
+    a copy sent to another process (e.g. a job executed with the 'process' executor) starts empty.
+    """
+
+    def __init__(self):
+        self._resources: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], _T]) -> _T:
+        """Returns the resource stored under the `key`, calls `factory` to create it when missing."""
+        try:
+            return self._resources[key]
+        except KeyError:
+            pass
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            if key not in self._resources:
+                logger.debug("Create shared resource %r", key)
+                self._resources[key] = factory()
+            return self._resources[key]
+
+    def once(self, key: Hashable, action: Callable[[], Any]) -> None:
+        """Calls the idempotent `action` only for the first time for the given `key`."""
+        def run_action():
+            action()
+            return True
+        self.get_or_create(key, run_action)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Forgets the resource, it will be created again on the next request."""
+        self._resources.pop(key, None)
+
+    def clear(self) -> None:
+        self._resources.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._resources
+
+    def __getstate__(self):
+        # resources (clients, connections) are not meant to be shared between processes
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def __repr__(self):
+        return f"ResourceContext({len(self._resources)} resources)"
@@ -0,0 +1,295 @@
+"""Passing results between jobs of a workflow and memoising them between runs.
+
+`ResultStore` keeps values returned by `Job.execute` for each (runtime, job_id), so downstream
+jobs may read results of their upstream jobs via `JobContext.upstream_result`.  Large values
+are pickled and spilled to disk.
+
+`MemoStore` persists job results between runs.  A job is memoised under a key built from its id,
+the runtime, the env, the hash of its code and attributes, and the keys of its upstream jobs - so a job
+is executed again when its code, its configuration or the code of any of its upstream jobs has changed.
+"""
+
+from __future__ import annotations
+
+import abc
+import datetime
+import enum
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import uuid
+import weakref
+
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from bigflow.commons import public
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_SPILL_THRESHOLD_BYTES = 1024 * 1024
+DEFAULT_MEMO_PATH = Path(".bigflow") / "memo"
+# nesting level of job attributes included in the memo key
+_MAX_CONFIG_DEPTH = 8
+
+_MISSING = object()
+
+
+class _SpilledValue:
+
+    def __init__(self, path: Path, size: int):
+        self.path = path
+        self.size = size
+
+    def load(self) -> Any:
+        with open(self.path, 'rb') as f:
+            return pickle.load(f)
+
+
+class _UnavailableResult:
+    """Placeholder of a result which is known to be missing (e.g. of a job skipped when resuming a run)."""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+@public()
+class ResultStore:
+    """Thread-safe store of job results, keyed by (runtime, job_id).
+
+    Values which are larger than `spill_threshold_bytes` when pickled are kept on disk
+    (in `spill_dir` or in a temporary directory removed at exit).  The store is picklable,
+    so jobs executed in other processes see results of their upstream jobs.
+    """
+
+    def __init__(
+        self,
+        spill_dir: Union[str, Path, None] = None,
+        spill_threshold_bytes: int = DEFAULT_SPILL_THRESHOLD_BYTES,
+    ):
+        self.spill_threshold_bytes = spill_threshold_bytes
+        self._spill_dir = Path(spill_dir) if spill_dir is not None else None
+        self._values: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_spill_dir(self) -> Path:
+        if self._spill_dir is None:
+            self._spill_dir = Path(tempfile.mkdtemp(prefix="bigflow-results-"))
+            weakref.finalize(self, shutil.rmtree, str(self._spill_dir), True)
+        self._spill_dir.mkdir(parents=True, exist_ok=True)
+        return self._spill_dir
+
+    def put(self, runtime: str, job_id: str, value: Any) -> None:
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug("Result of job %s is not picklable, keep it in memory: %s", job_id, e)
+            data = None
+
+        if data is not None and len(data) > self.spill_threshold_bytes:
+            path = self._ensure_spill_dir() / f"{uuid.uuid4().hex}.pickle"
+            path.write_bytes(data)
+            logger.debug("Spill result of job %s (%d bytes) to %s", job_id, len(data), path)
+            value = _SpilledValue(path, len(data))
+
+        with self._lock:
+            self._values[runtime, job_id] = value
+
+    def get(
+        self,
+        runtime: str,
+        job_id: str,
+        expected_type: Optional[Type] = None,
+        default: Any = _MISSING,
+    ) -> Any:
+        """Returns result of the job, raises `KeyError` when there is no result and no `default`.
+
+        When `expected_type` is set the result is checked to be an instance of that type.
+        """
+        with self._lock:
+            value = self._values.get((runtime, job_id), _MISSING)
+        if value is _MISSING or isinstance(value, _UnavailableResult):
+            if default is not _MISSING:
+                return default
+            if value is _MISSING:
+                raise KeyError(f"No result of job {job_id} for runtime {runtime}")
+            raise KeyError(value.reason)
+        if isinstance(value, _SpilledValue):
+            value = value.load()
+        if expected_type is not None and not isinstance(value, expected_type):
+            raise TypeError(
+                f"Result of job {job_id} has type {type(value).__name__}, expected {expected_type.__name__}")
+        return value
+
+    def mark_unavailable(self, runtime: str, job_id: str, reason: str) -> None:
+        """Records that the job has finished, but its result is unknown - `get` raises `KeyError` with the `reason`."""
+        with self._lock:
+            self._values.setdefault((runtime, job_id), _UnavailableResult(reason))
+
+    def contains(self, runtime: str, job_id: str) -> bool:
+        with self._lock:
+            value = self._values.get((runtime, job_id), _MISSING)
+        return value is not _MISSING and not isinstance(value, _UnavailableResult)
+
+    def clear(self, runtime: Optional[str] = None) -> None:
+        with self._lock:
+            keys = [k for k in self._values if runtime is None or k[0] == runtime]
+            for key in keys:
+                value = self._values.pop(key)
+                if isinstance(value, _SpilledValue):
+                    try:
+                        value.path.unlink()
+                    except FileNotFoundError:
+                        pass
+
+    def __getstate__(self):
+        with self._lock:
+            values = {}
+            for key, value in self._values.items():
+                try:
+                    pickle.dumps(value)
+                except Exception:
+                    logger.warning("Result of job %s can't be passed to another process", key[1])
+                    continue
+                values[key] = value
+        # spilled files are shared, but only the original store removes them
+        return {
+            'spill_threshold_bytes': self.spill_threshold_bytes,
+            'spill_dir': self._spill_dir,
+            'values': values,
+        }
+
+    def __setstate__(self, state):
+        self.spill_threshold_bytes = state['spill_threshold_bytes']
+        self._spill_dir = state['spill_dir']
+        self._values = state['values']
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"ResultStore({len(self._values)} results)"
+
+
+def _source_of(obj: Any) -> str:
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        return getattr(obj, '__qualname__', None) or type(obj).__qualname__
+
+
+def job_code_hash(job: Any) -> str:
+    """Hash of the job class and its component / entry point sources."""
+    h = hashlib.sha256()
+    for obj in (type(job), getattr(job, 'component', None), getattr(job, 'entry_point', None)):
+        if obj is not None:
+            h.update(_source_of(obj).encode())
+    return h.hexdigest()
+
+
+def _stable_repr(value: Any, depth: int = 0) -> str:
+    """Representation of (configuration) values which doesn't depend on object ids nor on ordering of sets."""
+    if value is None or isinstance(value, (bool, int, float, str, bytes, enum.Enum, Path,
+                                           datetime.date, datetime.time, datetime.timedelta)):
+        return repr(value)
+    if depth >= _MAX_CONFIG_DEPTH:
+        return type(value).__qualname__
+    if isinstance(value, dict):
+        items = sorted(f"{_stable_repr(k, depth + 1)}: {_stable_repr(v, depth + 1)}" for k, v in value.items())
+        return "{" + ", ".join(items) + "}"
+    if isinstance(value, (set, frozenset)):
+        return "{" + ", ".join(sorted(_stable_repr(v, depth + 1) for v in value)) + "}"
+    if isinstance(value, (list, tuple)):
+        return type(value).__qualname__ + "(" + ", ".join(_stable_repr(v, depth + 1) for v in value) + ")"
+    if callable(value) and hasattr(value, '__qualname__'):
+        return f"{getattr(value, '__module__', '')}.{value.__qualname__}"
+    state = getattr(value, '__dict__', None)
+    if state is not None:
+        return type(value).__qualname__ + _stable_repr(state, depth + 1)
+    return type(value).__qualname__
+
+
+def job_config_hash(job: Any) -> str:
+    """Hash of the attributes of the job instance (e.g. dataset configs passed to the constructor)."""
+    return hashlib.sha256(_stable_repr(getattr(job, '__dict__', {})).encode()).hexdigest()
+
+
+def memo_key(
+    workflow_id: Optional[str],
+    job: Any,
+    runtime: str,
+    upstream_keys: Iterable[str],
+    env: Optional[str] = None,
+) -> str:
+    h = hashlib.sha256()
+    parts = (workflow_id or '', env or '', job.id, runtime, job_code_hash(job), job_config_hash(job))
+    for part in (*parts, *sorted(upstream_keys)):
+        h.update(part.encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+@public()
+class MemoStore(abc.ABC):
+    """Persistent store of memoised job results.  Implementations must be thread-safe."""
+
+    @abc.abstractmethod
+    def load(self, key: str) -> Tuple[bool, Any]:
+        """Returns `(True, result)` when the result is memoised, `(False, None)` otherwise."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def save(self, key: str, result: Any) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+@public()
+class FileMemoStore(MemoStore):
+    """Keeps pickled results in a local directory, one file per key."""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_MEMO_PATH):
+        self.path = Path(path)
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.pickle"
+
+    def load(self, key: str) -> Tuple[bool, Any]:
+        try:
+            with open(self._file(key), 'rb') as f:
+                return True, pickle.load(f)
+        except FileNotFoundError:
+            return False, None
+        except Exception as e:
+            logger.warning("Unable to load memoised result %s: %s", key, e)
+            return False, None
+
+    def save(self, key: str, result: Any) -> None:
+        try:
+            data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning("Result is not picklable, it won't be memoised: %s", e)
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path / f"{key}.{uuid.uuid4().hex}.tmp"
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, self._file(key))
+
+    def clear(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,147 @@
+"""Persistent state of workflow runs, used to resume failed runs.
+
+Store keeps track of jobs which were successfully finished
+for each (workflow_id, job_id, runtime).
+"""
+
+from __future__ import annotations
+
+import abc
+import contextlib
+import datetime as dt
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterator,
+    Optional,
+    Set,
+    Union,
+)
+
+from bigflow.commons import public
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_RUN_STATE_PATH = Path(".bigflow") / "run_state.sqlite"
+
+
+@public()
+class RunStateStore(abc.ABC):
+    """Base class for run state stores.  Implementations must be thread-safe."""
+
+    @abc.abstractmethod
+    def completed_jobs(self, workflow_id: str, runtime: str) -> Set[str]:
+        """Returns ids of jobs which were successfully finished for the runtime."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def mark_completed(self, workflow_id: str, job_id: str, runtime: str) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def clear(self, workflow_id: str, runtime: Optional[str] = None) -> None:
+        """Forgets state of the workflow - for the single runtime or for all of them."""
+        raise NotImplementedError
+
+    def is_completed(self, workflow_id: str, job_id: str, runtime: str) -> bool:
+        return job_id in self.completed_jobs(workflow_id, runtime)
+
+
+@public()
+class SqliteRunStateStore(RunStateStore):
+    """Keeps state in a local SQLite database."""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_RUN_STATE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS completed_jobs (
+                    workflow_id TEXT NOT NULL,
+                    job_id TEXT NOT NULL,
+                    runtime TEXT NOT NULL,
+                    finished_at TEXT NOT NULL,
+                    PRIMARY KEY (workflow_id, job_id, runtime)
+                )
+            """)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # new connection for each operation - sqlite connections can't be shared between threads
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def completed_jobs(self, workflow_id: str, runtime: str) -> Set[str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT job_id FROM completed_jobs WHERE workflow_id = ? AND runtime = ?",
+                (workflow_id, runtime),
+            ).fetchall()
+        return {job_id for (job_id,) in rows}
+
+    def mark_completed(self, workflow_id: str, job_id: str, runtime: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completed_jobs VALUES (?, ?, ?, ?)",
+                (workflow_id, job_id, runtime, dt.datetime.now().isoformat()),
+            )
+
+    def clear(self, workflow_id: str, runtime: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            if runtime is None:
+                conn.execute("DELETE FROM completed_jobs WHERE workflow_id = ?", (workflow_id,))
+            else:
+                conn.execute(
+                    "DELETE FROM completed_jobs WHERE workflow_id = ? AND runtime = ?",
+                    (workflow_id, runtime))
+
+
+@public()
+class JsonRunStateStore(RunStateStore):
+    """Keeps state in a local JSON file, `{workflow_id: {runtime: {job_id: finished_at}}}`."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict[str, Dict[str, str]]]:
+        if not self.path.exists():
+            return {}
+        return json.loads(self.path.read_text())
+
+    def _write(self, state: Dict[str, Dict[str, Dict[str, str]]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(state, indent=2, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+    def completed_jobs(self, workflow_id: str, runtime: str) -> Set[str]:
+        with self._lock:
+            return set(self._read().get(workflow_id, {}).get(runtime, {}))
+
+    def mark_completed(self, workflow_id: str, job_id: str, runtime: str) -> None:
+        with self._lock:
+            state = self._read()
+            state.setdefault(workflow_id, {}).setdefault(runtime, {})[job_id] = dt.datetime.now().isoformat()
+            self._write(state)
+
+    def clear(self, workflow_id: str, runtime: Optional[str] = None) -> None:
+        with self._lock:
+            state = self._read()
+            if runtime is None:
+                state.pop(workflow_id, None)
+            else:
+                state.get(workflow_id, {}).pop(runtime, None)
+            self._write(state)
@@ -1,22 +1,31 @@
 import abc
+import asyncio
 import collections
+import inspect
 from typing import (
     Dict,
     List,
+    Mapping,
     NamedTuple,
     Optional,
     Callable,
     Union,
     Any,
     OrderedDict,
-    Set,
     Iterable,
+    Sequence,
+    Tuple,
 )
 import warnings
 import datetime as dt
 import logging
 
+import bigflow.analysis
 import bigflow.configuration
+import bigflow.executor
+import bigflow.resource_context
+import bigflow.results
+import bigflow.runstate
 from bigflow.commons import public
 
 
@@ -37,6 +46,8 @@ DEFAULT_PIPELINE_LEVEL_EXECTION_TIMEOUT = dt.timedelta(minutes=2)
 DEFAULT_EXECUTION_TIMEOUT_IN_SECONDS = DEFAULT_EXECUTION_TIMEOUT.total_seconds()
 DEFAULT_PIPELINE_LEVEL_EXECUTION_TIMEOUT_SHIFT_IN_SECONDS = DEFAULT_PIPELINE_LEVEL_EXECTION_TIMEOUT.total_seconds()
 
+_MISSING = bigflow.results._MISSING
+
 
 def get_timezone_offset_seconds() -> int:
     return dt.datetime.now().astimezone().tzinfo.utcoffset(None).seconds
@@ -66,6 +77,24 @@ class JobContext(NamedTuple):
     env: Optional[str]
     # TODO: add unique 'workflow execution id' (for tracing/logging)
 
+    # clients and other objects shared by jobs of the workflow
+    resources: Optional[bigflow.resource_context.ResourceContext] = None
+
+    # results returned by already finished jobs of the workflow
+    results: Optional[bigflow.results.ResultStore] = None
+
+    def upstream_result(self, job_id: str, expected_type: Optional[type] = None, default: Any = _MISSING) -> Any:
+        """Returns the value returned by `execute` of the job `job_id` for the same runtime.
+
+        Raises `KeyError` when the job hasn't finished (and no `default` is given)
+        and `TypeError` when the result is not an instance of `expected_type`.
+        """
+        if self.results is None:
+            if default is _MISSING:
+                raise KeyError(f"No result of job {job_id}, the context has no result store")
+            return default
+        return self.results.get(self.runtime_str, job_id, expected_type=expected_type, default=default)
+
     @classmethod
     def make(
         cls,
@@ -75,6 +104,8 @@ class JobContext(NamedTuple):
         workflow: Optional['Workflow'] = None,
         workflow_id: Optional[str] = None,
         env: Optional[str] = None,
+        resources: Optional[bigflow.resource_context.ResourceContext] = None,
+        results: Optional[bigflow.results.ResultStore] = None,
     ) -> 'JobContext':
         logger.debug("Build new JobContext...")
 
@@ -109,12 +140,19 @@ class JobContext(NamedTuple):
             # TODO: Try to load/reconstruct workflow based on its id?
             pass
 
+        if resources is None and workflow is not None:
+            resources = getattr(workflow, 'resources', None)
+        if results is None and workflow is not None:
+            results = getattr(workflow, 'results', None)
+
         jc = cls(
             runtime=runtime,
             runtime_str=runtime_str,
             workflow=workflow,
             workflow_id=workflow_id,
             env=env,
+            resources=resources,
+            results=results,
         )
 
         logger.debug("JobContext is %r", jc)
@@ -129,6 +167,7 @@ class Job(abc.ABC):
     retry_count: int = 3
     retry_pause_sec: int = 60
     execution_timeout_sec: int = 10800  # 3 hours
+    expected_duration_sec: Optional[float] = None  # used by `Workflow.analyze`
 
     def __init__(
         self,
@@ -136,6 +175,7 @@ class Job(abc.ABC):
         execution_timeout_sec: Optional[int] = None,
         retry_count: Optional[int] = None,
         retry_pause_sec: Optional[int] = None,
+        expected_duration_sec: Optional[float] = None,
     ):
         if id is not None:
             self.id = id
@@ -149,6 +189,9 @@ class Job(abc.ABC):
         if retry_pause_sec is not None:
             self.retry_pause_sec = retry_pause_sec
 
+        if expected_duration_sec is not None:
+            self.expected_duration_sec = expected_duration_sec
+
     @abc.abstractmethod
     def execute(self, context: JobContext) -> Optional[Any]:
         raise NotImplementedError
@@ -159,6 +202,44 @@ class Job(abc.ABC):
         return self.execute(context)
 
 
+@public()
+class AsyncJob(Job):
+    """Base class for I/O-bound jobs, which mostly wait for external systems (BigQuery, Dataflow etc).
+
+    Run the workflow with `executor='asyncio'` to execute many such jobs concurrently on a single
+    event loop.  Other executors (and Airflow) run the coroutine with `asyncio.run`.
+    """
+
+    @abc.abstractmethod
+    async def execute(self, context: JobContext) -> Optional[Any]:
+        raise NotImplementedError
+
+
+@public()
+class JobListener:
+    """Receives events about jobs executed by `Workflow.run` and `Workflow.run_job`.
+
+    Methods are called from the thread which runs the workflow, even when jobs are executed concurrently.
+    Exceptions raised by listeners are logged and ignored.
+    """
+
+    def on_job_start(self, job: Job, context: JobContext) -> None:
+        pass
+
+    def on_job_end(self, job: Job, context: JobContext, stats: bigflow.executor.JobStats) -> None:
+        pass
+
+    def on_job_error(
+        self,
+        job: Job,
+        context: JobContext,
+        error: BaseException,
+        stats: Optional[bigflow.executor.JobStats],
+    ) -> None:
+        """Called when all attempts of the job have failed.  `stats` is `None` when the job was not executed at all."""
+        pass
+
+
 @public()
 class Workflow(object):
 
@@ -177,35 +258,146 @@ class Workflow(object):
         self.start_time_factory = start_time_factory
         self.depends_on_past = depends_on_past
         self.secrets = secrets
+        self.resources = bigflow.resource_context.ResourceContext()
+        self.results = bigflow.results.ResultStore()
 
     @staticmethod
-    def _execute_job(job: Job, context: JobContext) -> None:
+    def _execute_job(job: Job, context: JobContext) -> Optional[Any]:
         if not isinstance(job, Job):
             logger.debug("It is recommended to inherit your job %r from `bigflow.Job` class", job)
         if hasattr(job, 'execute'):
-            job.execute(context)
+            result = job.execute(context)
+            if inspect.isawaitable(result):
+                # async job executed outside of the asyncio executor
+                result = asyncio.run(_await(result))
+            return result
         else:
             # fallback to old api
             warnings.warn("Old bigflow.Job api is used, please implement method `execute` (see bigflow.Job)")
-            job.run(context.runtime_str)
+            return job.run(context.runtime_str)
 
     def _make_job_context(self, runtime: Union[dt.date, dt.datetime, str, None]) -> JobContext:
         return JobContext.make(workflow=self, runtime=runtime)
 
-    def run(self, runtime: Union[dt.date, dt.datetime, str, None] = None) -> None:
-        context = self._make_job_context(runtime)
-        for job in self._build_sequential_order():
-            self._execute_job(job, context)
+    def _execute(self, context: JobContext, **executor_options) -> None:
+        try:
+            bigflow.executor.WorkflowExecutor(**executor_options).run(context)
+        finally:
+            # results are passed only between jobs of the same run, runs for other runtimes
+            # (e.g. a parallel backfill) may still use theirs
+            self.results.clear(context.runtime_str)
+
+    def run(
+        self,
+        runtime: Union[dt.date, dt.datetime, str, None] = None,
+        *,
+        max_workers: int = 1,
+        executor: str = bigflow.executor.EXECUTOR_THREAD,
+        retries: bool = False,
+        timeouts: bool = False,
+        resume: bool = False,
+        state_store: Optional[bigflow.runstate.RunStateStore] = None,
+        memoize: bool = False,
+        memo_store: Optional[bigflow.results.MemoStore] = None,
+        listeners: Sequence[JobListener] = (),
+    ) -> None:
+        """Runs all jobs of the workflow.
+
+        Each job is started as soon as all its parents have finished.  Jobs without a path
+        between them run concurrently, up to `max_workers` at a time.  The `executor` may be
+        'thread', 'process' (jobs must be picklable then) or 'asyncio' - async jobs (see `AsyncJob`)
+        are awaited on a single event loop, without a thread per job.  By default jobs are run
+        one after another in the sequential order.
+
+        Set `retries` to retry failed jobs according to their `retry_count` and `retry_pause_sec`
+        (with exponential backoff) and `timeouts` to kill jobs which run longer than
+        their `execution_timeout_sec`, like Airflow does.
+
+        Successfully finished jobs are recorded in the `state_store` (if any).  Set `resume`
+        to skip jobs which are already finished for the same runtime, so a failed run may be continued.
+        When `resume` is set and there is no `state_store` - `bigflow.runstate.SqliteRunStateStore`
+        with the default location is used.
+
+        Values returned by jobs are available to their downstream jobs via `JobContext.upstream_result`
+        (they are kept in `results` until the run ends).
+        Set `memoize` (or pass a `memo_store`) to persist them in the `memo_store`
+        (`bigflow.results.FileMemoStore` by default) and skip jobs whose code, runtime and upstream jobs haven't changed since the previous run.
+        Results of jobs skipped by `resume` are available only when they are memoised.
+
+        Each of `listeners` is notified when a job starts, ends or fails, see `JobListener`
+        and `bigflow.metrics.JobMetricsCollector`.
+        """
+        self._execute(
+            self._make_job_context(runtime),
+            jobs=self._build_sequential_order(),
+            parental_map=self.definition._parental_map(),
+            max_workers=max_workers,
+            executor=executor,
+            retries=retries,
+            timeouts=timeouts,
+            listeners=listeners,
+            memo_store=self._memo_store(memoize, memo_store),
+            **self._state_store_options(resume, state_store),
+        )
+
+    @staticmethod
+    def _state_store_options(resume: bool, state_store: Optional[bigflow.runstate.RunStateStore]) -> dict:
+        if resume and state_store is None:
+            state_store = bigflow.runstate.SqliteRunStateStore()
+        return {'resume': resume, 'state_store': state_store}
+
+    @staticmethod
+    def _memo_store(memoize: bool, memo_store: Optional[bigflow.results.MemoStore]) -> Optional[bigflow.results.MemoStore]:
+        if memoize and memo_store is None:
+            memo_store = bigflow.results.FileMemoStore()
+        return memo_store
 
     def find_job(self, job_id: str) -> Job:
-        for job_wrapper in self._build_sequential_order():
-            if job_wrapper.job.id == job_id:
-                return job_wrapper.job
-        raise ValueError(f'Job {job_id} not found.')
+        return self._find_workflow_job(job_id).job
+
+    def _find_workflow_job(self, job_id: str) -> 'WorkflowJob':
+        job_wrapper = self.definition._find_job(job_id)
+        if job_wrapper is None:
+            raise ValueError(f'Job {job_id} not found.')
+        return job_wrapper
+
+    def run_job(
+        self,
+        job_id: str,
+        runtime: Union[dt.date, dt.datetime, str, None] = None,
+        *,
+        retries: bool = False,
+        timeouts: bool = False,
+        resume: bool = False,
+        state_store: Optional[bigflow.runstate.RunStateStore] = None,
+        memoize: bool = False,
+        memo_store: Optional[bigflow.results.MemoStore] = None,
+        listeners: Sequence[JobListener] = (),
+    ) -> None:
+        job = self._find_workflow_job(job_id)
+        self._execute(
+            self._make_job_context(runtime),
+            jobs=[job],
+            parental_map={job: []},
+            retries=retries,
+            timeouts=timeouts,
+            listeners=listeners,
+            memo_store=self._memo_store(memoize, memo_store),
+            **self._state_store_options(resume, state_store),
+        )
 
-    def run_job(self, job_id: str, runtime: Union[dt.date, dt.datetime, str, None] = None) -> None:
-        context = self._make_job_context(runtime)
-        self._execute_job(self.find_job(job_id), context)
+    def analyze(
+        self,
+        durations: Optional[Mapping[str, float]] = None,
+        default_duration: float = bigflow.analysis.DEFAULT_JOB_DURATION,
+    ) -> bigflow.analysis.WorkflowAnalysis:
+        """Computes the critical path, earliest/latest start and slack of each job and the peak parallelism.
+
+        Duration of a job is taken from `durations` (mapping job id to an estimate, e.g. seconds
+        measured on production), then from the `expected_duration_sec` property of the job,
+        then `default_duration` is used.  Jobs are assumed to start as soon as their parents finish.
+        """
+        return bigflow.analysis.analyze_definition(self.definition, durations, default_duration)
 
     def _build_sequential_order(self) -> List['WorkflowJob']:
         return self.definition._sequential_order()
@@ -237,14 +429,18 @@ class WorkflowJob(Job):
 
     @property
     def retry_count(self) -> int:
-        return self.job.retry_count
+        return getattr(self.job, 'retry_count', Job.retry_count)
 
     @property
     def retry_pause_sec(self) -> int:
-        return self.job.retry_pause_sec
+        return getattr(self.job, 'retry_pause_sec', Job.retry_pause_sec)
+
+    @property
+    def execution_timeout_sec(self) -> int:
+        return getattr(self.job, 'execution_timeout_sec', Job.execution_timeout_sec)
 
-    def execute(self, context: JobContext) -> None:
-        Workflow._execute_job(self.job, context)
+    def execute(self, context: JobContext) -> Optional[Any]:
+        return Workflow._execute_job(self.job, context)
 
     def __hash__(self):
         return hash(self.name)
@@ -264,10 +460,23 @@ class Definition:
     ):
         self.job_graph = self._build_graph(jobs)
         self.job_order_resolver = JobOrderResolver(self.job_graph)
+        self._jobs_index: Optional[Dict[str, WorkflowJob]] = None
 
     def _sequential_order(self) -> List['WorkflowJob']:
         return self.job_order_resolver.find_sequential_run_order()
 
+    def _find_job(self, job_id: str) -> Optional['WorkflowJob']:
+        if self._jobs_index is None:
+            # the first job wins when ids are duplicated
+            index = {}
+            for job_wrapper in self._sequential_order():
+                index.setdefault(job_wrapper.job.id, job_wrapper)
+            self._jobs_index = index
+        return self._jobs_index.get(job_id)
+
+    def _parental_map(self) -> Dict['WorkflowJob', List['WorkflowJob']]:
+        return self.job_order_resolver.parental_map
+
     def _call_on_graph_nodes(self, consumer: Callable[[WorkflowJob, List[WorkflowJob]], None]) -> None:
         self.job_order_resolver._call_on_graph_nodes(consumer)
 
@@ -322,90 +531,100 @@ class JobGraphValidator:
         self._validate_if_not_cyclic()
 
     def _validate_if_not_cyclic(self) -> None:
-        visited = set()
-        stack = set()
-        for job in self.job_graph:
-            self._validate_job(job, visited, stack)
+        # Kahn's algorithm - all jobs which can't be sorted topologically are part of (or depend on) a cycle
+        in_degree: Dict[WorkflowJob, int] = collections.OrderedDict()
+        for job, deps in self.job_graph.items():
+            in_degree.setdefault(job, 0)
+            for dep in deps:
+                in_degree[dep] = in_degree.get(dep, 0) + 1
+
+        queue = collections.deque(job for job, degree in in_degree.items() if degree == 0)
+        while queue:
+            job = queue.popleft()
+            del in_degree[job]
+            for dep in self.job_graph.get(job, ()):
+                in_degree[dep] -= 1
+                if in_degree[dep] == 0:
+                    queue.append(dep)
+
+        if in_degree:
+            raise InvalidJobGraph(f"Found cyclic dependency on job {next(iter(in_degree))}")
 
-    def _validate_job(self, job: WorkflowJob, visited: Set[WorkflowJob], stack: Set[WorkflowJob]) -> None:
-        if job in stack:
-            raise InvalidJobGraph(f"Found cyclic dependency on job {job}")
-        if job in visited:
-            return
 
-        visited.add(job)
-        if not job in self.job_graph:
-            return
-        stack.add(job)
-        for dep in self.job_graph[job]:
-            self._validate_job(dep, visited, stack)
-        stack.remove(job)
+class JobOrderResolver:
+    """Resolves order of jobs in the graph.
 
+    All algorithms are iterative (no recursion limit for big graphs).  Results are computed
+    once, so the graph must not be modified after the resolver is created.
+    """
 
-class JobOrderResolver:
     def __init__(self, job_graph: Dict[WorkflowJob, List[WorkflowJob]]):
         self.job_graph = job_graph
         self.parental_map: OrderedDict[WorkflowJob, List[WorkflowJob]] = self._build_parental_map()
+        self._graph_nodes: List[Tuple[WorkflowJob, List[WorkflowJob]]] = self._resolve_graph_nodes()
 
     def find_sequential_run_order(self) -> List[WorkflowJob]:
-        ordered_jobs: List[WorkflowJob] = []
-
-        def add_to_ordered_job(job: WorkflowJob, dependencies: List[WorkflowJob]) -> None:
-            ordered_jobs.append(job)
-
-        self._call_on_graph_nodes(add_to_ordered_job)
-        return ordered_jobs
+        return [job for job, _ in self._graph_nodes]
 
     def _call_on_graph_nodes(
             self,
             consumer: Callable[[WorkflowJob, List[WorkflowJob]], None],
     ) -> None:
-        visited = set()
-        for job in self.parental_map:
-            self._call_on_graph_node_helper(
-                job, self.parental_map, visited, consumer)
+        for job, parents in self._graph_nodes:
+            consumer(job, parents)
 
     def _build_parental_map(self) -> OrderedDict[WorkflowJob, List[WorkflowJob]]:
+        # depth-first, preorder - dependency is visited right after it is linked to its parent
         visited = set()
         parental_map = collections.OrderedDict()
-        for job in self.job_graph:
-            self._fill_parental_map(job, parental_map, visited)
+
+        for root in self.job_graph:
+            if root in visited:
+                continue
+            visited.add(root)
+            parental_map.setdefault(root, [])
+            stack = [(root, iter(self.job_graph[root]))]
+
+            while stack:
+                job, dependencies = stack[-1]
+                dependency = next(dependencies, None)
+                if dependency is None:
+                    stack.pop()
+                    continue
+
+                parental_map.setdefault(dependency, []).append(job)
+                if dependency in self.job_graph and dependency not in visited:
+                    visited.add(dependency)
+                    stack.append((dependency, iter(self.job_graph[dependency])))
+
         return parental_map
 
-    def _fill_parental_map(
-            self,
-            job: WorkflowJob,
-            parental_map: OrderedDict[WorkflowJob, List[WorkflowJob]],
-            visited: Set[WorkflowJob],
-    ) -> None:
-        if job not in self.job_graph or job in visited:
-            return
-        visited.add(job)
+    def _resolve_graph_nodes(self) -> List[Tuple[WorkflowJob, List[WorkflowJob]]]:
+        # depth-first, postorder over parents - each job goes after all its parents
+        visited = set()
+        nodes = []
 
-        if job not in parental_map:
-            parental_map[job] = []
+        for root in self.parental_map:
+            if root in visited:
+                continue
+            visited.add(root)
+            stack = [(root, iter(self.parental_map[root]))]
 
-        for dependency in self.job_graph[job]:
-            if dependency not in parental_map:
-                parental_map[dependency] = []
-            parental_map[dependency].append(job)
-            self._fill_parental_map(dependency, parental_map, visited)
+            while stack:
+                job, parents = stack[-1]
+                parent = next(parents, None)
+                if parent is None:
+                    stack.pop()
+                    nodes.append((job, self.parental_map[job]))
+                elif parent not in visited:
+                    visited.add(parent)
+                    stack.append((parent, iter(self.parental_map[parent])))
 
-    def _call_on_graph_node_helper(
-            self,
-            job: WorkflowJob,
-            parental_map: OrderedDict[WorkflowJob, List[WorkflowJob]],
-            visited: Set[WorkflowJob],
-            consumer: Callable[[WorkflowJob, List[WorkflowJob]], None],
-    ) -> None:
-        if job in visited:
-            return
-        visited.add(job)
-
-        for parent in parental_map[job]:
-            self._call_on_graph_node_helper(
-                parent, parental_map, visited, consumer)
-        consumer(job, parental_map[job])
+        return nodes
+
+
+async def _await(awaitable):
+    return await awaitable
 
 
 def _parse_runtime_str(runtime: str) -> dt.datetime:
@@ -0,0 +1,135 @@
+"""Benchmark of `collect` through the REST API and through the (fake) BigQuery Storage API.
+
+The fake BigQuery client serves synthetic data - JSON pages for the REST API and Arrow record batches
+split into streams for the Storage API, each page delayed by `latency_sec` to simulate the network.
+
+Run with `python -m test.benchmarks.benchmark_collect`.
+"""
+
+import time
+
+from types import SimpleNamespace
+from unittest import mock
+
+import pyarrow
+
+from google.cloud import bigquery
+from google.cloud.bigquery.table import RowIterator, TableReference
+
+from bigflow.bigquery.dataset_manager import DatasetManager
+
+
+SCHEMA = [
+    bigquery.SchemaField('id', 'INTEGER'),
+    bigquery.SchemaField('country', 'STRING'),
+    bigquery.SchemaField('amount', 'FLOAT'),
+]
+COUNTRIES = ['pl', 'cz', 'sk', 'hu', 'de']
+
+
+def synthetic_batch(start, size):
+    ids = range(start, start + size)
+    return pyarrow.RecordBatch.from_arrays([
+        pyarrow.array(ids, pyarrow.int64()),
+        pyarrow.array([COUNTRIES[i % len(COUNTRIES)] for i in ids]),
+        pyarrow.array([i / 100 for i in ids], pyarrow.float64()),
+    ], names=[f.name for f in SCHEMA])
+
+
+class FakeStorageClient:
+    """Serves record batches split into `streams` - like `BigQueryReadClient`."""
+
+    def __init__(self, rows, page_size, latency_sec):
+        self.pages = [synthetic_batch(start, min(page_size, rows - start)) for start in range(0, rows, page_size)]
+        self.latency_sec = latency_sec
+        self.streams = 1
+
+    def create_read_session(self, read_session, max_stream_count=None, **kwargs):
+        count = min(self.streams, max_stream_count or self.streams)
+        return SimpleNamespace(name='session', streams=[SimpleNamespace(name=str(i)) for i in range(count)])
+
+    def read_rows(self, name, **kwargs):
+        stream, count = int(name), self.streams
+        pages = [FakeStoragePage(page, self.latency_sec) for page in self.pages[stream::count]]
+        return SimpleNamespace(rows=lambda session=None: SimpleNamespace(pages=pages))
+
+
+class FakeStoragePage:
+
+    def __init__(self, batch, latency_sec):
+        self.batch = batch
+        self.latency_sec = latency_sec
+
+    def to_arrow(self):
+        time.sleep(self.latency_sec)
+        return self.batch
+
+    def to_dataframe(self, dtypes=None):
+        df = self.to_arrow().to_pandas()
+        return df.astype(dtypes) if dtypes else df
+
+
+def fake_bigquery_client(rows, page_size, latency_sec):
+    """`query(...)` returns a job which serves JSON pages through a real `RowIterator`."""
+    json_pages = [
+        [{'f': [{'v': str(i)}, {'v': COUNTRIES[i % len(COUNTRIES)]}, {'v': str(i / 100)}]}
+         for i in range(start, min(start + page_size, rows))]
+        for start in range(0, rows, page_size)
+    ]
+
+    def api_request(method, path, query_params=None, **kwargs):
+        time.sleep(latency_sec)
+        page = int((query_params or {}).get('pageToken', 0))
+        response = {'rows': json_pages[page], 'totalRows': str(rows)}
+        if page + 1 < len(json_pages):
+            response['pageToken'] = str(page + 1)
+        return response
+
+    def row_iterator(kwargs):
+        if 'bqstorage_client' not in kwargs:
+            # the fake client can't create a Storage API client on its own
+            kwargs['create_bqstorage_client'] = False
+        return RowIterator(
+            client=None, api_request=api_request, path='/rows', schema=SCHEMA,
+            table=TableReference.from_string('project.dataset.result'))
+
+    def query(sql, job_config=None):
+        job = mock.Mock()
+        job.to_dataframe = lambda **kwargs: row_iterator(kwargs).to_dataframe(**kwargs)
+        job.to_arrow = lambda **kwargs: row_iterator(kwargs).to_arrow(**kwargs)
+        return job
+
+    return mock.Mock(query=query)
+
+
+def measure(name, fn, repeat=3):
+    best = min(_timed(fn) for _ in range(repeat))
+    print(f"{name:<50} {best * 1000:10.1f} ms")
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(rows=200_000, page_size=10_000, latency_sec=0.02):
+    storage_client = FakeStorageClient(rows, page_size, latency_sec)
+    dataset_manager = DatasetManager(
+        fake_bigquery_client(rows, page_size, latency_sec),
+        mock.Mock(full_dataset_id='project:dataset'),
+        mock.Mock(),
+        bqstorage_client=storage_client,
+    )
+    sql = 'SELECT * FROM result'
+    measure(f"{rows} rows: collect (REST)", lambda: dataset_manager.collect(sql))
+    for streams in [1, 4]:
+        storage_client.streams = streams
+        measure(f"{rows} rows: collect_arrow ({streams} streams)", lambda: dataset_manager.collect_arrow(sql))
+        measure(f"{rows} rows: collect ({streams} streams)", lambda: dataset_manager.collect(sql, use_storage_api=True))
+        measure(f"{rows} rows: collect ({streams} streams, dtypes)", lambda: dataset_manager.collect(
+            sql, dtypes={'country': 'category'}, use_storage_api=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Benchmark of workflow graph resolution for big generated graphs.
+
+Run with `python -m test.benchmarks.benchmark_workflow_graph`.
+"""
+
+import random
+import time
+
+import bigflow
+from bigflow.workflow import Definition, Workflow
+
+
+class NoopJob(bigflow.Job):
+
+    def execute(self, context):
+        pass
+
+
+def chain_graph(size):
+    jobs = [NoopJob(id=f"job_{i}") for i in range(size)]
+    return {jobs[i]: [jobs[i + 1]] for i in range(size - 1)}
+
+
+def layered_graph(size, width=100, fanout=3, seed=0):
+    rnd = random.Random(seed)
+    jobs = [NoopJob(id=f"job_{i}") for i in range(size)]
+    layers = [jobs[i:i + width] for i in range(0, size, width)]
+    return {
+        job: rnd.sample(next_layer, min(fanout, len(next_layer)))
+        for layer, next_layer in zip(layers, layers[1:])
+        for job in layer
+    }
+
+
+def measure(name, fn, repeat=3):
+    best = min(_timed(fn) for _ in range(repeat))
+    print(f"{name:<50} {best * 1000:10.1f} ms")
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(size=10_000):
+    for graph_name, graph_factory in [("chain", chain_graph), ("layered", layered_graph)]:
+        graph = graph_factory(size)
+        measure(f"{graph_name} {size}: build Definition", lambda: Definition(graph))
+
+        workflow = Workflow(workflow_id='benchmark', definition=Definition(graph))
+        job_ids = [f"job_{i}" for i in range(0, size, size // 1000)]
+        measure(f"{graph_name} {size}: 1000 x find_job", lambda: [workflow.find_job(j) for j in job_ids])
+        measure(f"{graph_name} {size}: sequential order", workflow._build_sequential_order)
+        measure(f"{graph_name} {size}: run (noop jobs)", lambda: workflow.run('2020-01-01'))
+
+
+if __name__ == '__main__':
+    main()
@@ -651,6 +651,61 @@ deployment_config = Config(name='dev',
             vault_endpoint_verify=expected_verify,
         )
 
+    @mock.patch('bigflow.cli.find_root_package')
+    @mock.patch('bigflow.cli.cli_backfill')
+    def test_should_call_cli_backfill_command(self, cli_backfill_mock, find_root_package_mock):
+        # given
+        find_root_package_mock.return_value = Path('some_package')
+
+        # when
+        cli(['backfill', '-w', 'some_workflow', '-s', '2020-01-01', '-e', '2020-01-31',
+             '--parallel', '4', '--project-package', 'some_package'])
+
+        # then
+        cli_backfill_mock.assert_called_with(
+            Path('some_package'), 'some_workflow', '2020-01-01', '2020-01-31',
+            parallel=4, max_workers=1, executor='thread', retries=False, timeouts=False, resume=False,
+            metrics_file=None)
+
+    @mock.patch('bigflow.cli.find_root_package')
+    @mock.patch('bigflow.cli.cli_plan')
+    def test_should_call_cli_plan_command(self, cli_plan_mock, find_root_package_mock):
+        # given
+        find_root_package_mock.return_value = Path('some_package')
+
+        # when
+        cli(['plan', '-w', 'some_workflow', '-r', '2020-01-01', '--max-cost', '100',
+             '--project-package', 'some_package'])
+
+        # then
+        cli_plan_mock.assert_called_with(
+            Path('some_package'), 'some_workflow', '2020-01-01',
+            output=None, max_cost_usd=100.0, price_per_tib_usd=6.25, max_concurrent_dry_runs=8)
+
+    @mock.patch('bigflow.bigquery.plan.plan_workflow')
+    @mock.patch('bigflow.cli.find_workflow')
+    def test_should_fail_plan_with_max_cost_when_cost_is_unknown(self, find_workflow_mock, plan_workflow_mock):
+        # given
+        plan_workflow_mock.return_value = mock.Mock(
+            bytes_processed=0, cost_usd=0.0, errors=['job: table not found'], to_dict=mock.Mock(return_value={}))
+
+        # expect
+        with self.assertRaisesRegex(ValueError, 'unknown'):
+            cli_plan(Path('some_package'), 'some_workflow', '2020-01-01',
+                     output=str(self.cwd / 'plan.json'), max_cost_usd=100.0)
+
+    @mock.patch('bigflow.cli.find_root_package')
+    @mock.patch('bigflow.cli.cli_reconcile_labels')
+    def test_should_call_cli_reconcile_labels_command(self, cli_reconcile_labels_mock, find_root_package_mock):
+        # given
+        find_root_package_mock.return_value = Path('some_package')
+
+        # when
+        cli(['reconcile-labels', '-w', 'some_workflow', '--project-package', 'some_package'])
+
+        # then
+        cli_reconcile_labels_mock.assert_called_with(Path('some_package'), 'some_workflow')
+
     @mock.patch('bigflow.cli._cli_build_dags')
     def test_should_call_cli_build_dags_command(self, _cli_build_dags_mock):
         # when
@@ -168,6 +168,32 @@ class DagBuilderTestCase(mixins.TempCwdMixin, TestCase):
         expected_dag_content = (Path(__file__).parent / "my_daily_workflow__dag.py.txt").read_text()
         self.assert_files_are_equal(expected_dag_content, dag_file_content)
 
+    def test_should_emit_priority_weights_when_jobs_declare_expected_duration(self):
+        # given
+        workdir = self.cwd
+        job1 = Job(id='job1', component=mock.Mock())
+        job2 = Job(id='job2', component=mock.Mock())
+        job3 = Job(id='job3', component=mock.Mock())
+        job1.expected_duration_sec = 600
+        job2.expected_duration_sec = 3600
+        job3.expected_duration_sec = 60
+        w_job1, w_job2, w_job3 = WorkflowJob(job1, 1), WorkflowJob(job2, 2), WorkflowJob(job3, 3)
+        workflow = Workflow(
+            workflow_id='my_weighted_workflow',
+            definition=Definition({w_job1: (w_job2, w_job3)}),
+            schedule_interval='@daily')
+
+        # when
+        dag_file_path = generate_dag_file(workdir, 'repository:0.3.0', workflow, '2020-07-02', '0.3.0', 'ca')
+
+        # then
+        dag_file_content = Path(dag_file_path).read_text()
+        self.assertIn("tjob1_pod_operator_params['priority_weight'] = 4200", dag_file_content)
+        self.assertIn("tjob2_pod_operator_params['priority_weight'] = 3600", dag_file_content)
+        self.assertIn("tjob3_pod_operator_params['priority_weight'] = 60", dag_file_content)
+        self.assertEqual(dag_file_content.count("['weight_rule'] = 'absolute'"), 3)
+        compile(dag_file_content, dag_file_path, 'exec')
+
     def assert_files_are_equal(self, expected_dag_content, dag_file_content):
         if expected_dag_content != dag_file_content:
             diff = list(difflib.Differ().compare(expected_dag_content.splitlines(keepends=True), dag_file_content.splitlines(keepends=True)))
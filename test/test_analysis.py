@@ -0,0 +1,99 @@
+from unittest import TestCase
+
+import bigflow
+from bigflow.workflow import Definition, Workflow, WorkflowJob
+
+
+class SleepJob(bigflow.Job):
+
+    def __init__(self, id, expected_duration_sec=None):
+        super().__init__(id=id, expected_duration_sec=expected_duration_sec)
+
+    def execute(self, context):
+        pass
+
+
+def diamond_workflow(**durations):
+    #     b(2)
+    #    /    \
+    # a(1)     d(1)
+    #    \    /
+    #     c(5)
+    a, b, c, d = (WorkflowJob(SleepJob(name, durations.get(name)), name) for name in 'abcd')
+    return Workflow(workflow_id='diamond', definition=Definition({
+        a: [b, c],
+        b: [d],
+        c: [d],
+    }))
+
+
+class WorkflowAnalysisTestCase(TestCase):
+
+    def test_should_find_critical_path_and_slack(self):
+        # given
+        workflow = diamond_workflow()
+
+        # when
+        analysis = workflow.analyze(durations={'a': 1, 'b': 2, 'c': 5, 'd': 1})
+
+        # then
+        self.assertEqual(analysis.duration, 7)
+        self.assertEqual(analysis.critical_path, ['a', 'c', 'd'])
+        self.assertEqual(analysis.max_parallelism, 2)
+
+        b = analysis.jobs['b']
+        self.assertEqual((b.earliest_start, b.earliest_finish), (1, 3))
+        self.assertEqual((b.latest_start, b.latest_finish), (4, 6))
+        self.assertEqual(b.slack, 3)
+        self.assertFalse(b.critical)
+
+        self.assertEqual(analysis.jobs['d'].earliest_start, 6)
+        self.assertTrue(all(analysis.jobs[j].critical for j in 'acd'))
+
+    def test_should_take_durations_from_jobs_then_from_default(self):
+        # given
+        workflow = diamond_workflow(b=10)
+
+        # when
+        analysis = workflow.analyze(durations={'a': 3}, default_duration=2)
+
+        # then
+        self.assertEqual([analysis.jobs[j].duration for j in 'abcd'], [3, 10, 2, 2])
+        self.assertEqual(analysis.critical_path, ['a', 'b', 'd'])
+        self.assertEqual(analysis.duration, 15)
+
+    def test_should_count_jobs_when_durations_are_unknown(self):
+        # given
+        workflow = Workflow(workflow_id='chain', definition=[SleepJob('x'), SleepJob('y'), SleepJob('z')])
+
+        # when
+        analysis = workflow.analyze()
+
+        # then
+        self.assertEqual(analysis.duration, 3)
+        self.assertEqual(analysis.critical_path, ['x', 'y', 'z'])
+        self.assertEqual(analysis.max_parallelism, 1)
+        self.assertEqual(analysis.priority_weights(), {'x': 3, 'y': 2, 'z': 1})
+
+    def test_should_measure_parallel_width_of_independent_jobs(self):
+        # given
+        root = WorkflowJob(SleepJob('root'), 'root')
+        leaves = [WorkflowJob(SleepJob(f'leaf{i}'), f'leaf{i}') for i in range(4)]
+        workflow = Workflow(workflow_id='fan_out', definition=Definition({root: leaves}))
+
+        # when
+        analysis = workflow.analyze(durations={'leaf0': 3})
+
+        # then
+        self.assertEqual(analysis.max_parallelism, 4)
+        self.assertEqual(analysis.critical_path, ['root', 'leaf0'])
+        self.assertEqual(analysis.jobs['leaf1'].slack, 2)
+
+    def test_should_reject_negative_durations(self):
+        # given
+        workflow = diamond_workflow()
+
+        # then
+        with self.assertRaises(ValueError):
+            # when
+            workflow.analyze(durations={'a': -1})
@@ -0,0 +1,122 @@
+import datetime
+import threading
+
+from unittest import TestCase, mock
+
+import bigflow
+from bigflow.backfill import BackfillError, backfill, generate_runtimes
+from bigflow.workflow import Workflow, hourly_start_time
+
+
+def identity(start_time):
+    return start_time
+
+
+class RecordingJob(bigflow.Job):
+
+    def __init__(self, id, failing_runtimes=()):
+        super().__init__(id=id)
+        self.failing_runtimes = failing_runtimes
+        self.runtimes = []
+        self.lock = threading.Lock()
+
+    def execute(self, context):
+        with self.lock:
+            self.runtimes.append(context.runtime)
+        if context.runtime in self.failing_runtimes:
+            raise RuntimeError(f"failed for {context.runtime}")
+
+
+class GenerateRuntimesTestCase(TestCase):
+
+    def test_should_generate_daily_runtimes_shifted_by_start_time_factory(self):
+        # given
+        workflow = Workflow(workflow_id='daily', definition=[mock.Mock()])
+
+        # when
+        runtimes = generate_runtimes(workflow, datetime.datetime(2020, 1, 2), datetime.datetime(2020, 1, 4))
+
+        # then
+        self.assertEqual(runtimes, [
+            datetime.datetime(2020, 1, 1),
+            datetime.datetime(2020, 1, 2),
+            datetime.datetime(2020, 1, 3),
+        ])
+
+    @mock.patch('bigflow.workflow.get_timezone_offset_seconds', return_value=0)
+    def test_should_generate_hourly_runtimes(self, _):
+        # given
+        workflow = Workflow(
+            workflow_id='hourly', definition=[mock.Mock()],
+            schedule_interval='@hourly', start_time_factory=hourly_start_time)
+
+        # when
+        runtimes = generate_runtimes(workflow, datetime.datetime(2020, 1, 1, 22), datetime.datetime(2020, 1, 2, 1))
+
+        # then
+        self.assertEqual(runtimes, [
+            datetime.datetime(2020, 1, 1, 22),
+            datetime.datetime(2020, 1, 1, 23),
+            datetime.datetime(2020, 1, 2, 0),
+            datetime.datetime(2020, 1, 2, 1),
+        ])
+
+    def test_should_generate_monthly_and_once_runtimes(self):
+        # given
+        monthly = Workflow(workflow_id='monthly', definition=[mock.Mock()], schedule_interval='@monthly',
+                           start_time_factory=identity)
+        once = Workflow(workflow_id='once', definition=[mock.Mock()], schedule_interval='@once',
+                        start_time_factory=identity)
+
+        # expect
+        self.assertEqual(
+            generate_runtimes(monthly, datetime.datetime(2020, 1, 31), datetime.datetime(2020, 4, 1)),
+            [datetime.datetime(2020, 1, 31), datetime.datetime(2020, 2, 29), datetime.datetime(2020, 3, 31)])
+        self.assertEqual(
+            generate_runtimes(once, datetime.datetime(2020, 1, 1), datetime.datetime(2020, 4, 1)),
+            [datetime.datetime(2020, 1, 1)])
+
+
+class BackfillTestCase(TestCase):
+
+    def test_should_run_all_runtimes_concurrently_in_single_process(self):
+        # given
+        job = RecordingJob('job')
+        workflow = Workflow(workflow_id='w', definition=[job], depends_on_past=False, start_time_factory=identity)
+
+        # when
+        runtimes = backfill(workflow, datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 10), parallel=4)
+
+        # then
+        self.assertEqual(len(runtimes), 10)
+        self.assertCountEqual(job.runtimes, runtimes)
+
+    def test_should_report_all_failed_runtimes(self):
+        # given
+        failing = [datetime.datetime(2020, 1, 2), datetime.datetime(2020, 1, 4)]
+        job = RecordingJob('job', failing_runtimes=failing)
+        workflow = Workflow(workflow_id='w', definition=[job], depends_on_past=False, start_time_factory=identity)
+
+        # when
+        with self.assertRaises(BackfillError) as cm:
+            backfill(workflow, datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 5), parallel=2)
+
+        # then
+        self.assertCountEqual(cm.exception.failed, failing)
+        self.assertEqual(len(job.runtimes), 5)
+
+    def test_should_serialise_runtimes_when_workflow_depends_on_past(self):
+        # given
+        job = RecordingJob('job', failing_runtimes=[datetime.datetime(2020, 1, 3)])
+        workflow = Workflow(workflow_id='w', definition=[job], depends_on_past=True, start_time_factory=identity)
+
+        # when
+        with self.assertRaises(RuntimeError):
+            backfill(workflow, datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 5), parallel=4)
+
+        # then
+        self.assertEqual(job.runtimes, [
+            datetime.datetime(2020, 1, 1),
+            datetime.datetime(2020, 1, 2),
+            datetime.datetime(2020, 1, 3),
+        ])
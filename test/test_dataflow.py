@@ -1,3 +1,4 @@
+import asyncio
 import sys
 from unittest import TestCase
 from unittest import mock
@@ -213,6 +214,62 @@ class BeamJobTestCase(BaseTestCase):
         self.assertEqual(cancel_mock.call_count, 0)
         wait_until_finish_mock.assert_called_with((600 - DEFAULT_PIPELINE_LEVEL_EXECUTION_TIMEOUT_SHIFT_IN_SECONDS) * 1000)
 
+    @patch.object(RunnerResult, 'state', new_callable=mock.PropertyMock)
+    @patch.object(RunnerResult, 'cancel')
+    def test_should_poll_beam_job_state_asynchronously(self, cancel_mock, state_mock):
+        # given
+        state_mock.side_effect = ['RUNNING', 'RUNNING', 'DONE']
+        driver = CountWordsDriver()
+        job = BeamJob(
+            id='count_words',
+            entry_point=driver.nope,
+            test_pipeline=self._test_pipeline_with_label('count_words'),
+            execution_timeout_sec=600)
+        job.status_poll_interval_sec = 0
+
+        # when
+        asyncio.run(job.execute_async(JobContext.make()))
+
+        # then
+        self.assertTrue(driver.context, "Driver was called")
+        self.assertEqual(state_mock.call_count, 3)
+        self.assertEqual(cancel_mock.call_count, 0)
+
+    @patch.object(RunnerResult, 'state', new_callable=mock.PropertyMock)
+    @patch.object(RunnerResult, 'cancel')
+    def test_should_cancel_async_beam_job_after_timeout(self, cancel_mock, state_mock):
+        # given
+        state_mock.return_value = 'RUNNING'
+        job = BeamJob(
+            id='count_words',
+            entry_point=CountWordsDriver().nope,
+            test_pipeline=self._test_pipeline_with_label('count_words'),
+            execution_timeout_sec=600)
+        job.pipeline_level_execution_timeout_shift = 600 - 0.1
+        job.status_poll_interval_sec = 0.01
+
+        # when
+        with self.assertRaises(RuntimeError):
+            asyncio.run(job.execute_async(JobContext.make()))
+
+        # then
+        self.assertEqual(cancel_mock.call_count, 1)
+
+    @patch.object(RunnerResult, 'state', new_callable=mock.PropertyMock)
+    def test_should_fail_async_beam_job_when_pipeline_failed(self, state_mock):
+        # given
+        state_mock.return_value = 'FAILED'
+        job = BeamJob(
+            id='count_words',
+            entry_point=CountWordsDriver().nope,
+            test_pipeline=self._test_pipeline_with_label('count_words'),
+            execution_timeout_sec=600)
+
+        # then
+        with self.assertRaises(RuntimeError):
+            # when
+            asyncio.run(job.execute_async(JobContext.make()))
+
     def test_should_throw_if_wait_until_finish_set_to_false_and_execution_timeout_passed(
         self,
     ):
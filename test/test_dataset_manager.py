@@ -1,6 +1,29 @@
-from unittest import TestCase
+import datetime
+import io
+import tempfile
+import threading
+import time
+
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+import fastavro
+import pyarrow.parquet as pq
+
+from google.api_core.exceptions import NotFound, ServiceUnavailable
+from google.cloud.bigquery.table import Row
+
 from bigflow.bigquery.dataset_manager import handle_key_error
 from bigflow.bigquery.dataset_manager import AliasNotFoundError
+from bigflow.bigquery.dataset_manager import create_dataset_manager
+from bigflow.bigquery.dataset_manager import DatasetManager, TableMetadataCache
+from bigflow.bigquery.dataset_manager import PartitionedDatasetManager, TemplatedDatasetManager, QueryBatchError
+from bigflow.bigquery.dataset_manager import InsertError, chunk_records, read_records
+from bigflow.bigquery.dataset_manager import SqlTemplate, check_sql_placeholders, compile_sql_template
+from bigflow.bigquery.job import Job
+from bigflow.bigquery.load import RecordSpool, avro_schema
+from bigflow.resource_context import ResourceContext
 
 
 class HandleKeyErrorTestCase(TestCase):
@@ -11,4 +34,606 @@ class HandleKeyErrorTestCase(TestCase):
 
     @handle_key_error
     def raise_key_error(self):
-        '{missing_key}'.format(meh='bla')
\ No newline at end of file
+        '{missing_key}'.format(meh='bla')
+
+
+class SqlTemplateTestCase(TestCase):
+
+    def test_should_render_like_str_format(self):
+        # given
+        variables = {'table': 'p.d.table', 'dt': '2020-01-01', 'n': 10, 'obj': mock.Mock(attr='x'), 'items': ['a']}
+        sqls = [
+            'SELECT * FROM `{table}` WHERE dt = "{dt}" LIMIT {n}',
+            'SELECT STRUCT({{"a": 1}}) FROM `{table}`',
+            'SELECT "{obj.attr}", "{items[0]}", "{n:>5}", {dt!r}',
+            'SELECT 1',
+        ]
+
+        # expect
+        for sql in sqls:
+            self.assertEqual(SqlTemplate(sql).render(variables), sql.format(**variables))
+
+    def test_should_list_placeholders(self):
+        # when
+        template = SqlTemplate('SELECT {{x}} FROM `{table}` JOIN `{other.table}` WHERE dt = "{dt}" AND x = "{table}"')
+
+        # then
+        self.assertEqual(template.placeholders, {'table', 'other', 'dt'})
+        self.assertEqual(template.unresolved_placeholders(['table', 'dt']), ['other'])
+
+    def test_should_reuse_compiled_templates(self):
+        # expect
+        self.assertIs(compile_sql_template('SELECT * FROM `{t}`'), compile_sql_template('SELECT * FROM `{t}`'))
+
+    def test_should_raise_error_for_unresolved_placeholders(self):
+        # when
+        with self.assertRaises(AliasNotFoundError) as e:
+            check_sql_placeholders('SELECT * FROM `{a}` JOIN `{b}` JOIN `{c}`', ['a', 'dt'])
+
+        # then
+        self.assertIn("'b', 'c'", str(e.exception))
+
+    def test_should_raise_error_for_missing_variable_on_render(self):
+        # given
+        dataset_manager = TemplatedDatasetManager(
+            mock.Mock(dataset_id='p.d'), ['table'], {}, {}, '2020-01-01')
+
+        # expect
+        with self.assertRaises(AliasNotFoundError):
+            dataset_manager.render('SELECT * FROM `{missing}`')
+
+    def test_should_cache_template_variables_until_tmp_table_is_written(self):
+        # given
+        core = mock.Mock(dataset_id='p.d')
+        dataset_manager = TemplatedDatasetManager(core, ['table'], {'ext': 'p.e.ext'}, {'x': 1}, '2020-01-01')
+
+        # when
+        variables = dataset_manager._variables()
+
+        # then
+        self.assertIs(dataset_manager._variables(), variables)
+        self.assertEqual(dataset_manager.template_variables(), {
+            'table': 'p.d.table', 'ext': 'p.e.ext', 'x': 1, 'dt': '2020-01-01'})
+        self.assertEqual(dataset_manager.template_variables('2020-01-02')['dt'], '2020-01-02')
+
+        # when
+        dataset_manager.write_tmp('tmp', 'SELECT * FROM `{table}`')
+        dataset_manager.collect('SELECT * FROM `{tmp}` WHERE dt = "{dt}"', '2020-01-02')
+
+        # then
+        core.write_tmp.assert_called_once_with('p.d.tmp', 'SELECT * FROM `p.d.table`')
+        core.collect.assert_called_once_with('SELECT * FROM `p.d.tmp` WHERE dt = "2020-01-02"', None, False, None)
+
+
+@mock.patch('bigflow.bigquery.dataset_manager.upsert_tables_labels')
+@mock.patch('bigflow.bigquery.dataset_manager.create_dataset')
+@mock.patch('bigflow.bigquery.dataset_manager.create_bigquery_client')
+class SharedResourcesTestCase(TestCase):
+
+    def setUp(self):
+        self.dataset_configs = [
+            dict(project_id='project', dataset_name='dataset', tables_labels={'table': {'a': 'b'}}, dataset_labels={'c': 'd'}),
+            dict(project_id='project', dataset_name='dataset', tables_labels={'table': {'a': 'b'}}, dataset_labels={'c': 'd'}),
+            dict(project_id='project', dataset_name='other_dataset'),
+        ]
+
+    def test_should_share_client_dataset_and_labels_within_resource_context(
+            self, create_bigquery_client_mock, create_dataset_mock, upsert_tables_labels_mock):
+        # given
+        create_dataset_mock.side_effect = lambda name, *args: mock.Mock(full_dataset_id=f'project:{name}')
+        resources = ResourceContext()
+
+        # when
+        dataset_ids = [
+            create_dataset_manager(runtime='2020-01-01', resources=resources, **config)[0]
+            for config in self.dataset_configs
+        ]
+
+        # then
+        self.assertEqual(dataset_ids, ['project.dataset', 'project.dataset', 'project.other_dataset'])
+        create_bigquery_client_mock.assert_called_once_with('project', None, 'EU')
+        self.assertEqual([c.args[0] for c in create_dataset_mock.call_args_list], ['dataset', 'other_dataset'])
+        self.assertEqual(upsert_tables_labels_mock.call_count, 2)
+
+    def test_should_share_query_pool_within_resource_context(
+            self, create_bigquery_client_mock, create_dataset_mock, upsert_tables_labels_mock):
+        # given
+        create_dataset_mock.side_effect = lambda name, *args: mock.Mock(full_dataset_id=f'project:{name}')
+        resources = ResourceContext()
+        managers = [
+            create_dataset_manager(runtime='2020-01-01', resources=resources, **config)[1]
+            for config in self.dataset_configs
+        ]
+
+        # when
+        futures = [manager.collect_async('SELECT 1') for manager in managers]
+        for manager in managers:
+            manager.close()
+
+        # then
+        pools = {manager._dataset_manager.dataset_manager._executor for manager in managers}
+        self.assertEqual(len(pools), 1)
+        self.assertEqual(len(managers[0].gather(*futures)), 3)
+        managers[0].collect_async('SELECT 2').result()
+
+    def test_should_create_everything_for_each_manager_without_resource_context(
+            self, create_bigquery_client_mock, create_dataset_mock, upsert_tables_labels_mock):
+        # given
+        create_dataset_mock.return_value = mock.Mock(full_dataset_id='project:dataset')
+
+        # when
+        for config in self.dataset_configs:
+            create_dataset_manager(runtime='2020-01-01', **config)
+
+        # then
+        self.assertEqual(create_bigquery_client_mock.call_count, 3)
+        self.assertEqual(create_dataset_mock.call_count, 3)
+        self.assertEqual(upsert_tables_labels_mock.call_count, 3)
+
+
+class TableMetadataCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.list_tables.return_value = [mock.Mock(table_id='a'), mock.Mock(table_id='b')]
+        self.dataset = mock.Mock(full_dataset_id='project:dataset')
+        self.now = 0.0
+        self.cache = TableMetadataCache(self.client, self.dataset, ttl_sec=60, clock=lambda: self.now)
+
+    def test_should_list_tables_once_within_ttl(self):
+        # when
+        exists = [self.cache.table_exists('a'), self.cache.table_exists('b'), self.cache.table_exists('a')]
+
+        # then
+        self.assertEqual(exists, [True, True, True])
+        self.client.list_tables.assert_called_once_with(self.dataset)
+        self.client.query.assert_not_called()
+
+        # when
+        self.now = 61.0
+        self.cache.table_exists('a')
+
+        # then
+        self.assertEqual(self.client.list_tables.call_count, 2)
+
+    def test_should_check_missing_table_with_get_table(self):
+        # given
+        self.client.get_table.side_effect = [NotFound('c'), mock.Mock()]
+
+        # then
+        self.assertFalse(self.cache.table_exists('c'))
+        self.assertTrue(self.cache.table_exists('c'))
+        self.assertTrue(self.cache.table_exists('c'))
+        self.assertEqual(self.client.get_table.call_count, 2)
+
+    def test_should_forget_invalidated_tables(self):
+        # given
+        self.cache.table_exists('a')
+
+        # when
+        self.cache.invalidate()
+        self.cache.table_exists('a')
+
+        # then
+        self.assertEqual(self.client.list_tables.call_count, 2)
+
+    def test_should_update_cache_when_table_is_created(self):
+        # given
+        manager = DatasetManager(self.client, self.dataset, mock.Mock(), self.cache)
+        self.client.get_table.side_effect = NotFound('missing')
+
+        # when
+        manager.create_table('CREATE TABLE IF NOT EXISTS `project.dataset.c` (x INT64)')
+        manager.create_table_from_schema('project.dataset.d', schema=[{'name': 'x', 'type': 'INT64'}])
+
+        # then
+        self.assertTrue(manager.table_exists('c'))
+        self.assertTrue(manager.table_exists('d'))
+        self.assertFalse(manager.table_exists('e'))
+        self.client.list_tables.assert_called_once()
+
+    def test_should_not_query_before_write(self):
+        # given
+        manager = DatasetManager(self.client, self.dataset, mock.Mock(), self.cache)
+
+        # when
+        manager.write_truncate('project.dataset.a$20200101', 'SELECT 1')
+        manager.write_append('project.dataset.b$20200101', 'SELECT 1')
+
+        # then
+        self.assertEqual(self.client.query.call_count, 2)
+        self.client.list_tables.assert_called_once()
+        with self.assertRaises(ValueError):
+            self.client.get_table.side_effect = NotFound('missing')
+            manager.write_append('project.dataset.missing', 'SELECT 1')
+
+
+class ConcurrentQueriesTestCase(TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.list_tables.return_value = [mock.Mock(table_id='a'), mock.Mock(table_id='b')]
+        dataset = mock.Mock(full_dataset_id='project:dataset')
+        core = DatasetManager(self.client, dataset, mock.Mock(), max_concurrent_queries=4)
+        self.dataset_manager = PartitionedDatasetManager(
+            TemplatedDatasetManager(core, [], {}, {'x': 1}, '2020-01-01'), '20200101')
+
+    def test_should_run_statements_concurrently_up_to_the_limit(self):
+        # given
+        running = []
+        peak = []
+        lock = threading.Lock()
+        release = threading.Event()
+
+        def query(sql, job_config=None):
+            with lock:
+                running.append(sql)
+                peak.append(len(running))
+            release.wait(5)
+            with lock:
+                running.remove(sql)
+            return mock.Mock(**{'result.return_value': [sql]})
+        self.client.query.side_effect = query
+
+        # when
+        futures = [self.dataset_manager.collect_list_async(f'SELECT {i}') for i in range(6)]
+        time.sleep(0.2)
+        release.set()
+        results = self.dataset_manager.gather(*futures)
+
+        # then
+        self.assertEqual(max(peak), 4)
+        self.assertEqual(results, [[f'SELECT {i}'] for i in range(6)])
+
+    def test_should_collect_errors_of_all_failed_statements(self):
+        # given
+        self.client.query.side_effect = lambda sql, job_config=None: mock.Mock(
+            **{'result.side_effect': RuntimeError(sql)} if 'fail' in sql else {})
+
+        # when
+        with self.assertRaises(QueryBatchError) as e:
+            with self.dataset_manager.batch() as batch:
+                batch.write_tmp('tmp1', 'SELECT 1')
+                batch.write_tmp('tmp2', 'SELECT fail')
+                batch.write_truncate('a', 'SELECT {x}')
+                batch.write_append('b', 'SELECT fail {x}')
+
+        # then
+        self.assertEqual([(err.index, err.sql) for err in e.exception.errors], [(1, 'SELECT fail'), (3, 'SELECT fail 1')])
+
+    def test_should_return_results_of_batch(self):
+        # given
+        self.client.query.side_effect = lambda sql, job_config=None: mock.Mock(**{'result.return_value': sql})
+
+        # when
+        with self.dataset_manager.batch() as batch:
+            batch.write_tmp('tmp', 'SELECT {x}')
+            batch.write_truncate('a', 'SELECT * FROM {tmp}')
+
+        # then
+        self.assertEqual(batch.results, ['SELECT 1', 'SELECT * FROM project.dataset.tmp'])
+        self.assertEqual(
+            [c.kwargs['job_config'].destination.table_id for c in self.client.query.call_args_list],
+            ['tmp', 'a$20200101'])
+
+    def test_should_return_exceptions_when_asked(self):
+        # given
+        self.client.query.side_effect = RuntimeError('boom')
+
+        # when
+        results = self.dataset_manager.gather(self.dataset_manager.collect_async('SELECT 1'), return_exceptions=True)
+
+        # then
+        self.assertIsInstance(results[0], RuntimeError)
+
+
+    def test_should_shut_down_own_pool_when_component_ends(self):
+        # given
+        self.client.query.side_effect = lambda sql, job_config=None: mock.Mock(**{'result.return_value': [sql]})
+        pools = []
+
+        def component(ds):
+            result = ds.collect_list_async('SELECT {x}').result()
+            pools.append(ds._dataset_manager.dataset_manager._executor)
+            return result
+
+        job = Job(component, ds=None)
+
+        # when
+        result = job._run_component({'ds': self.dataset_manager})
+
+        # then
+        self.assertEqual(result, ['SELECT 1'])
+        self.assertTrue(pools[0]._shutdown)
+        self.assertEqual(self.dataset_manager.collect_list_async('SELECT 2').result(), ['SELECT 2'])
+        self.dataset_manager.close()
+
+
+class StreamingResultsTestCase(TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.fetched_pages = []
+        dataset = mock.Mock(full_dataset_id='project:dataset')
+        core = DatasetManager(self.client, dataset, mock.Mock())
+        self.dataset_manager = PartitionedDatasetManager(
+            TemplatedDatasetManager(core, ['table'], {}, {}, '2020-01-01'), '20200101')
+
+    def _pages(self, pages):
+        for i, page in enumerate(pages):
+            self.fetched_pages.append(i)
+            yield [Row(values, {'x': 0}) for values in page]
+
+    def _mock_result(self, pages, **attributes):
+        rows = SimpleNamespace(pages=self._pages(pages), **attributes)
+        self.client.query.return_value.result.return_value = rows
+
+    def test_should_iterate_over_rows_page_by_page(self):
+        # given
+        self._mock_result([[(1,), (2,)], [(3,)]])
+
+        # when
+        rows = self.dataset_manager.iter_rows('SELECT x FROM `{table}`', page_size=2, as_dict=True)
+
+        # then
+        self.assertEqual(next(rows), {'x': 1})
+        self.assertEqual(self.fetched_pages, [0])
+        self.assertEqual(list(rows), [{'x': 2}, {'x': 3}])
+        self.assertEqual(self.fetched_pages, [0, 1])
+        self.client.query.assert_called_once_with('SELECT x FROM `project.dataset.table`')
+        self.client.query.return_value.result.assert_called_once_with(page_size=2)
+
+    def test_should_convert_pages_to_batches(self):
+        # given
+        self._mock_result([[(1,), (2,)], [(3,)]])
+
+        # when
+        batches = list(self.dataset_manager.collect_batches('SELECT x', format='pandas'))
+
+        # then
+        self.assertEqual([b['x'].tolist() for b in batches], [[1, 2], [3]])
+
+    def test_should_use_arrow_iterable_of_result(self):
+        # given
+        self._mock_result([], to_arrow_iterable=lambda: iter(['batch1', 'batch2']))
+
+        # then
+        self.assertEqual(list(self.dataset_manager.collect_batches('SELECT x')), ['batch1', 'batch2'])
+
+    def test_should_reject_unknown_batch_format(self):
+        with self.assertRaises(ValueError):
+            self.dataset_manager.collect_batches('SELECT x', format='csv')
+
+
+class ColumnarCollectTestCase(TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.bqstorage_client = mock.Mock()
+        dataset = mock.Mock(full_dataset_id='project:dataset')
+        core = DatasetManager(self.client, dataset, mock.Mock(), bqstorage_client=self.bqstorage_client)
+        self.dataset_manager = PartitionedDatasetManager(
+            TemplatedDatasetManager(core, [], {}, {}, '2020-01-01'), '20200101')
+
+    def test_should_collect_through_rest_api_by_default(self):
+        # when
+        self.dataset_manager.collect('SELECT 1')
+
+        # then
+        self.client.query.return_value.to_dataframe.assert_called_once_with()
+
+    def test_should_collect_with_storage_api_and_dtypes(self):
+        # when
+        self.dataset_manager.collect('SELECT 1', dtypes={'x': 'category'}, use_storage_api=True)
+
+        # then
+        self.client.query.return_value.to_dataframe.assert_called_once_with(
+            dtypes={'x': 'category'}, bqstorage_client=self.bqstorage_client)
+
+    def test_should_limit_bytes_billed_by_collect(self):
+        # when
+        self.dataset_manager.collect('SELECT 1', maximum_bytes_billed=10 * 2 ** 30)
+
+        # then
+        _, kwargs = self.client.query.call_args
+        self.assertEqual(kwargs['job_config'].maximum_bytes_billed, 10 * 2 ** 30)
+
+    def test_should_collect_arrow_table(self):
+        # when
+        self.dataset_manager.collect_arrow('SELECT 1')
+        self.dataset_manager.collect_arrow('SELECT 1', use_storage_api=False)
+
+        # then
+        self.assertEqual(self.client.query.return_value.to_arrow.call_args_list, [
+            mock.call(bqstorage_client=self.bqstorage_client),
+            mock.call(create_bqstorage_client=False),
+        ])
+
+    def test_should_fall_back_to_rest_api_without_storage_client(self):
+        # given
+        self.client._ensure_bqstorage_client.return_value = None
+        core = DatasetManager(self.client, mock.Mock(full_dataset_id='project:dataset'), mock.Mock())
+
+        # when
+        core.collect_arrow('SELECT 1')
+
+        # then
+        self.client.query.return_value.to_arrow.assert_called_once_with(create_bqstorage_client=False)
+
+
+class ChunkedInsertTestCase(TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.insert_rows.return_value = []
+        self.dataset_manager = DatasetManager(self.client, mock.Mock(full_dataset_id='project:dataset'), mock.Mock())
+
+    def test_should_split_records_by_rows_and_bytes(self):
+        # given
+        records = [{'x': i} for i in range(5)] + [{'x': 'a' * 100}, {'x': 'b' * 100}]
+
+        # when
+        chunks = list(chunk_records(records, max_rows=2, max_bytes=110))
+
+        # then
+        self.assertEqual([(offset, len(chunk)) for offset, chunk in chunks], [(0, 2), (2, 2), (4, 1), (5, 1), (6, 1)])
+
+    def test_should_read_newline_delimited_and_array_json_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # given
+            ndjson = Path(tmp_dir) / 'records.jsonl'
+            ndjson.write_text('{"x": 1}\n\n{"x": 2}\n')
+            array = Path(tmp_dir) / 'records.json'
+            array.write_text(' [{"x": 1}, {"x": 2}]')
+
+            # then
+            self.assertEqual(list(read_records(ndjson)), [{'x': 1}, {'x': 2}])
+            self.assertEqual(list(read_records(array)), [{'x': 1}, {'x': 2}])
+
+    def test_should_insert_chunks_in_parallel(self):
+        # when
+        inserted = self.dataset_manager.insert('project.dataset.table', ({'x': i} for i in range(1000)), chunk_rows=100)
+
+        # then
+        self.assertEqual(inserted, 1000)
+        self.assertEqual(self.client.insert_rows.call_count, 10)
+        self.assertCountEqual(
+            [r['x'] for c in self.client.insert_rows.call_args_list for r in c.args[1]], range(1000))
+
+    @mock.patch('bigflow.bigquery.dataset_manager.time.sleep')
+    def test_should_retry_only_failed_chunks(self, sleep_mock):
+        # given
+        attempts = []
+
+        def insert_rows(table, chunk, row_ids):
+            attempts.append(chunk[0]['x'])
+            if chunk[0]['x'] == 2 and attempts.count(2) == 1:
+                raise ServiceUnavailable('try again')
+            return []
+        self.client.insert_rows.side_effect = insert_rows
+
+        # when
+        self.dataset_manager.insert('project.dataset.table', [{'x': i} for i in range(4)], chunk_rows=2, parallelism=1)
+
+        # then
+        self.assertEqual(attempts, [0, 2, 2])
+        sleep_mock.assert_called_once()
+
+    @mock.patch('bigflow.bigquery.dataset_manager.time.sleep')
+    def test_should_retry_chunk_with_the_same_row_ids(self, sleep_mock):
+        # given
+        self.client.insert_rows.side_effect = [ServiceUnavailable('try again'), ServiceUnavailable('try again'), []]
+
+        # when
+        self.dataset_manager.insert('project.dataset.table', [{'x': 1}, {'x': 2}], parallelism=1)
+
+        # then
+        row_ids = [c.kwargs['row_ids'] for c in self.client.insert_rows.call_args_list]
+        self.assertEqual(len(row_ids), 3)
+        self.assertEqual(len(set(row_ids[0])), 2)
+        self.assertEqual(row_ids[0], row_ids[1])
+        self.assertEqual(row_ids[0], row_ids[2])
+
+    def test_should_report_rejected_records(self):
+        # given
+        self.client.insert_rows.side_effect = lambda table, chunk, row_ids: [
+            {'index': i, 'errors': [{'reason': 'invalid'}]} for i, r in enumerate(chunk) if r['x'] % 3 == 0]
+
+        # when
+        with self.assertRaises(InsertError) as e:
+            self.dataset_manager.insert('project.dataset.table', [{'x': i} for i in range(1, 8)], chunk_rows=2)
+
+        # then
+        self.assertEqual(
+            [(r.index, r.record) for r in e.exception.rejected],
+            [(2, {'x': 3}), (5, {'x': 6})])
+
+
+class LoadJobsTestCase(TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.loaded = []
+
+        def load_table_from_file(file, table_id, rewind, job_config):
+            self.loaded.append((table_id, job_config.source_format, file.read()))
+            return mock.Mock(**{'result.return_value': table_id})
+        self.client.load_table_from_file.side_effect = load_table_from_file
+        self.client.get_table.side_effect = NotFound('table')
+        core = DatasetManager(self.client, mock.Mock(full_dataset_id='project:dataset'), mock.Mock())
+        self.dataset_manager = PartitionedDatasetManager(
+            TemplatedDatasetManager(core, [], {}, {}, '2020-01-01'), '20200101')
+
+    def test_should_load_records_to_runtime_partition(self):
+        # when
+        jobs = self.dataset_manager.load_table_from_iterable(
+            'table', [{'x': 1}, {'x': 2}], source_format='NEWLINE_DELIMITED_JSON')
+
+        # then
+        self.assertEqual(jobs, ['project.dataset.table$20200101'])
+        self.assertEqual(self.loaded, [
+            ('project.dataset.table$20200101', 'NEWLINE_DELIMITED_JSON', b'{"x": 1}\n{"x": 2}\n')])
+
+    def test_should_load_each_partition_with_separate_job(self):
+        # given
+        records = [{'day': '2020-01-02', 'x': 1}, {'day': '2020-01-01', 'x': 2}, {'day': '2020-01-02', 'x': 3}]
+
+        # when
+        jobs = self.dataset_manager.load_table_from_iterable('table', records, partition_field='day')
+
+        # then
+        self.assertEqual(jobs, ['project.dataset.table$20200101', 'project.dataset.table$20200102'])
+        loaded = {table_id: pq.read_table(io.BytesIO(data)).to_pylist() for table_id, _, data in self.loaded}
+        self.assertEqual(loaded['project.dataset.table$20200102'], [{'day': '2020-01-02', 'x': 1}, {'day': '2020-01-02', 'x': 3}])
+
+    def test_should_load_file_with_format_from_suffix(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # given
+            path = Path(tmp_dir) / 'records.avro'
+            path.write_bytes(b'avro')
+
+            # when
+            self.dataset_manager.load_table_from_file('table', path, partitioned=False)
+
+            # then
+            self.assertEqual(self.loaded, [('project.dataset.table', 'AVRO', b'avro')])
+
+
+class RecordSpoolTestCase(TestCase):
+
+    def test_should_write_parquet_in_row_groups(self):
+        # given
+        spool = RecordSpool('PARQUET', schema=[{'name': 'x', 'type': 'INTEGER'}, {'name': 'y', 'type': 'STRING'}], row_group_size=2)
+
+        # when
+        for i in range(5):
+            spool.write({'x': i, 'y': None if i < 3 else 'a'})
+        parquet_file = pq.ParquetFile(spool.close())
+
+        # then
+        self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+        self.assertEqual(parquet_file.read().column('y').to_pylist(), [None, None, None, 'a', 'a'])
+
+    def test_should_write_avro_with_schema_converted_from_bigquery(self):
+        # given
+        schema = [
+            {'name': 'x', 'type': 'INTEGER', 'mode': 'REQUIRED'},
+            {'name': 'day', 'type': 'DATE'},
+            {'name': 'tags', 'type': 'STRING', 'mode': 'REPEATED'},
+        ]
+        spool = RecordSpool('AVRO', schema=schema)
+
+        # when
+        spool.write({'x': 1, 'day': datetime.date(2020, 1, 1), 'tags': ['a']})
+        spool.write({'x': 2, 'day': None, 'tags': []})
+        records = list(fastavro.reader(spool.close()))
+
+        # then
+        self.assertEqual(records, [
+            {'x': 1, 'day': datetime.date(2020, 1, 1), 'tags': ['a']},
+            {'x': 2, 'day': None, 'tags': []},
+        ])
+
+    def test_should_reject_unsupported_avro_types(self):
+        with self.assertRaises(ValueError):
+            avro_schema([{'name': 'x', 'type': 'GEOGRAPHY'}])
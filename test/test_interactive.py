@@ -1,4 +1,5 @@
 import datetime
+import inspect
 from unittest import TestCase, mock
 
 from google.api_core.exceptions import BadRequest
@@ -7,9 +8,11 @@ import bigflow
 
 from bigflow.bigquery.interactive import InteractiveDatasetManager
 from bigflow.bigquery.interactive import interactive_component
+from bigflow.bigquery.interactive import decorate_component_dependencies_with_operation_level_dataset_manager
 from bigflow.bigquery.job import DEFAULT_RETRY_COUNT
 from bigflow.bigquery.job import DEFAULT_RETRY_PAUSE_SEC
 from bigflow.bigquery.interactive import log_syntax_error
+from bigflow.bigquery.dataset_manager import AliasNotFoundError
 
 
 class OperationLevelDatasetManagerTestCase(TestCase):
@@ -172,6 +175,23 @@ class OperationLevelDatasetManagerTestCase(TestCase):
         self.assertEqual(result, 'collect sql\nLIMIT 1')
 
 
+class DecorateComponentTestCase(TestCase):
+
+    def test_should_keep_signature_of_component(self):
+        # given
+        def standard_component(ds1, ds2):
+            return ds1._dataset_manager, ds2._dataset_manager
+
+        # when
+        _, component_callable = decorate_component_dependencies_with_operation_level_dataset_manager(
+            standard_component, operation_name='some_operation')
+
+        # then
+        self.assertEqual(list(inspect.signature(component_callable).parameters), ['ds1', 'ds2'])
+        self.assertEqual(component_callable.__name__, 'some_operation')
+        self.assertEqual(component_callable('first', ds2='second'), ('first', 'second'))
+
+
 class InteractiveComponentToJobTestCase(TestCase):
 
     @mock.patch('bigflow.bigquery.job.create_dataset_manager')
@@ -535,6 +555,31 @@ PARAMETER1 = '1'
 PARAMETER2 = '2'
 
 
+class InteractiveDatasetManagerPlaceholdersTestCase(TestCase):
+
+    def test_should_detect_unresolved_placeholders_at_definition_time(self):
+        # given
+        dataset = InteractiveDatasetManager(
+            project_id='project1',
+            dataset_name='dataset1',
+            internal_tables=['table'],
+            external_tables={'ext': 'p.d.ext'},
+            extras={'x': 1})
+
+        # expect
+        dataset.collect('SELECT * FROM `{table}` JOIN `{ext}` WHERE x = {x} AND dt = "{dt}"')
+        for define in [
+            lambda: dataset.write_truncate('table', 'SELECT * FROM `{missing}`'),
+            lambda: dataset.write_append('table', 'SELECT * FROM `{missing}`'),
+            lambda: dataset.write_tmp('table', 'SELECT * FROM `{missing}`'),
+            lambda: dataset.collect('SELECT * FROM `{missing}`'),
+            lambda: dataset.collect_list('SELECT * FROM `{missing}`'),
+            lambda: dataset.dry_run('SELECT * FROM `{missing}`'),
+        ]:
+            with self.assertRaises(AliasNotFoundError):
+                define()
+
+
 class LogSyntaxErrorTestCase(TestCase):
 
     @mock.patch('bigflow.bigquery.interactive.logger')
@@ -1,9 +1,12 @@
+import asyncio
 import datetime
+import functools
 from unittest import TestCase, mock
 
 import bigflow
 from bigflow.bigquery.interactive import DatasetConfigInternal
-from bigflow.bigquery.job import Job
+from bigflow.bigquery.job import Job, component_dependencies
+from bigflow.executor import async_execute_method
 
 
 class JobTestCase(TestCase):
@@ -61,4 +64,85 @@ class JobTestCase(TestCase):
                       extras={'extra_param': 'some-extra-param'}))
 
         # when
-        job.execute(bigflow.JobContext.make(runtime=datetime.date(2019, 1, 1)))
\ No newline at end of file
+        job.execute(bigflow.JobContext.make(runtime=datetime.date(2019, 1, 1)))
+    @mock.patch('bigflow.bigquery.job.create_dataset_manager')
+    def test_should_pass_workflow_resources_to_dataset_manager(self, create_dataset_manager_mock):
+        # given
+        create_dataset_manager_mock.side_effect = lambda **kwargs: (kwargs, kwargs)
+        workflow = bigflow.Workflow(workflow_id='some_workflow', definition=[])
+        passed_resources = []
+
+        def test_component(bigquery_dependency):
+            passed_resources.append(bigquery_dependency['resources'])
+
+        job = Job(component=test_component,
+                  bigquery_dependency=DatasetConfigInternal(
+                      project_id='some-project-id',
+                      dataset_name='some-dataset'))
+
+        # when
+        job.execute(bigflow.JobContext.make(runtime=datetime.date(2019, 1, 1), workflow=workflow))
+
+        # then
+        self.assertEqual(passed_resources, [workflow.resources])
+
+    @mock.patch('bigflow.bigquery.job.create_dataset_manager')
+    def test_should_await_async_component(self, create_dataset_manager_mock):
+        # given
+        create_dataset_manager_mock.side_effect = lambda **kwargs: (kwargs, kwargs)
+
+        async def test_component(bigquery_dependency):
+            await asyncio.sleep(0)
+            return bigquery_dependency['dataset_name']
+
+        job = Job(component=test_component,
+                  bigquery_dependency=DatasetConfigInternal(
+                      project_id='some-project-id',
+                      dataset_name='some-dataset'))
+        context = bigflow.JobContext.make(runtime=datetime.date(2019, 1, 1))
+
+        # expect
+        self.assertEqual(asyncio.run(job.execute_async(context)), 'some-dataset')
+        self.assertEqual(job.execute(context), 'some-dataset')
+
+    def test_should_execute_blocking_component_as_blocking_job(self):
+        # given
+        def test_component(bigquery_dependency):
+            pass
+
+        job = Job(component=test_component,
+                  bigquery_dependency=DatasetConfigInternal(
+                      project_id='some-project-id',
+                      dataset_name='some-dataset'))
+
+        # expect
+        self.assertIsNone(job.execute_async)
+        self.assertIsNone(async_execute_method(job))
+
+
+class ComponentDependenciesTestCase(TestCase):
+
+    def test_should_return_component_arguments(self):
+        # given
+        def component(ds1, ds2, *args, option=None, **kwargs):
+            pass
+
+        class Component:
+            def run(self, ds):
+                pass
+
+        # expect
+        self.assertEqual(component_dependencies(component), ['ds1', 'ds2'])
+        self.assertEqual(component_dependencies(Component().run), ['ds'])
+
+    def test_should_follow_signature_of_wrapped_component(self):
+        # given
+        def component(ds1, ds2):
+            pass
+
+        @functools.wraps(component)
+        def wrapper(**kwargs):
+            return component(**kwargs)
+
+        # expect
+        self.assertEqual(component_dependencies(wrapper), ['ds1', 'ds2'])
@@ -0,0 +1,170 @@
+import os
+import threading
+
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+from google.api_core.exceptions import NotFound
+
+import bigflow
+
+from bigflow.bigquery.interactive import DatasetConfigInternal
+from bigflow.bigquery.job import Job
+from bigflow.bigquery.labels import labels_diff, reconcile_dataset_labels, reconcile_tables_labels
+from bigflow.bigquery.labels import reconcile_workflow_labels
+from bigflow.bigquery.dataset_manager import create_dataset_manager
+
+
+class FakeClient:
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.updated = []
+        self.lock = threading.Lock()
+
+    def get_table(self, table_id):
+        try:
+            labels = self.tables[table_id]
+        except KeyError:
+            raise NotFound(table_id)
+        return SimpleNamespace(table_id=table_id, labels=dict(labels))
+
+    def update_table(self, table, fields):
+        with self.lock:
+            self.updated.append((table.table_id, table.labels, fields))
+        return table
+
+
+class LabelsDiffTestCase(TestCase):
+
+    def test_should_return_only_changed_labels(self):
+        # expect
+        self.assertEqual(labels_diff({'a': '1', 'b': '2'}, {'a': '1', 'b': '2'}), {})
+        self.assertEqual(labels_diff({'a': '1', 'b': '2'}, {'a': '1', 'b': '3', 'c': '4'}), {'b': '3', 'c': '4'})
+        self.assertEqual(labels_diff({'a': '1', 'b': '2'}, {'a': '1'}), {'b': None})
+        self.assertEqual(labels_diff(None, {'a': '1'}), {'a': '1'})
+
+
+class ReconcileLabelsTestCase(TestCase):
+
+    def test_should_update_only_changed_tables(self):
+        # given
+        client = FakeClient({
+            'dataset.unchanged': {'a': '1'},
+            'dataset.changed': {'a': '1', 'old': 'x'},
+        })
+
+        # when
+        updated = reconcile_tables_labels(client, 'dataset', {
+            'unchanged': {'a': '1'},
+            'changed': {'a': '2'},
+            'missing': {'a': '1'},
+        })
+
+        # then
+        self.assertEqual(updated, ['changed'])
+        self.assertEqual(client.updated, [('dataset.changed', {'a': '2', 'old': None}, ['labels'])])
+
+    def test_should_update_dataset_only_when_labels_changed(self):
+        # given
+        client = mock.Mock()
+        dataset = SimpleNamespace(dataset_id='dataset', labels={'a': '1'})
+
+        # when
+        result = reconcile_dataset_labels(client, dataset, {'a': '1'})
+
+        # then
+        self.assertIs(result, dataset)
+        client.update_dataset.assert_not_called()
+
+        # when
+        reconcile_dataset_labels(client, dataset, {'b': '2'})
+
+        # then
+        client.update_dataset.assert_called_once_with(dataset, ['labels'])
+        self.assertEqual(dataset.labels, {'a': None, 'b': '2'})
+
+    @mock.patch('bigflow.bigquery.dataset_manager.create_bigquery_client')
+    def test_should_reconcile_each_dataset_of_workflow_once(self, create_bigquery_client_mock):
+        # given
+        client = FakeClient({'dataset.table': {'a': '1'}})
+        client.get_dataset = mock.Mock(return_value=SimpleNamespace(dataset_id='dataset', labels={}))
+        client.update_dataset = mock.Mock()
+        create_bigquery_client_mock.return_value = client
+        config = DatasetConfigInternal(
+            project_id='project', dataset_name='dataset',
+            tables_labels={'table': {'a': '2'}}, dataset_labels={'team': 'x'})
+        workflow = bigflow.Workflow(workflow_id='wf', definition=[
+            Job(lambda ds: None, id='first', ds=config),
+            Job(lambda ds: None, id='second', ds=config),
+        ])
+
+        # when
+        result = reconcile_workflow_labels(workflow)
+
+        # then
+        self.assertEqual(result, {'project.dataset': ['table']})
+        create_bigquery_client_mock.assert_called_once_with('project', None, 'EU')
+        client.update_dataset.assert_called_once()
+        self.assertEqual(client.updated, [('dataset.table', {'a': '2'}, ['labels'])])
+
+
+    @mock.patch('bigflow.bigquery.dataset_manager.create_bigquery_client')
+    def test_should_merge_labels_of_jobs_sharing_dataset(self, create_bigquery_client_mock):
+        # given
+        client = FakeClient({'dataset.first': {}, 'dataset.second': {}})
+        client.get_dataset = mock.Mock(return_value=SimpleNamespace(dataset_id='dataset', labels={}))
+        client.update_dataset = mock.Mock()
+        create_bigquery_client_mock.return_value = client
+        first_config = DatasetConfigInternal(
+            project_id='project', dataset_name='dataset',
+            tables_labels={'first': {'a': '1'}}, dataset_labels={'team': 'x'})
+        second_config = DatasetConfigInternal(
+            project_id='project', dataset_name='dataset',
+            tables_labels={'second': {'b': '2'}}, dataset_labels={'owner': 'y'})
+        workflow = bigflow.Workflow(workflow_id='wf', definition=[
+            Job(lambda ds: None, id='first', ds=first_config),
+            Job(lambda ds: None, id='second', ds=second_config),
+        ])
+
+        # when
+        result = reconcile_workflow_labels(workflow)
+
+        # then
+        self.assertEqual(result, {'project.dataset': ['first', 'second']})
+        dataset = client.update_dataset.call_args[0][0]
+        self.assertEqual(dataset.labels, {'team': 'x', 'owner': 'y'})
+
+    def test_should_fail_on_conflicting_labels_of_dataset(self):
+        # given
+        workflow = bigflow.Workflow(workflow_id='wf', definition=[
+            Job(lambda ds: None, id='first', ds=DatasetConfigInternal(
+                project_id='project', dataset_name='dataset', tables_labels={'table': {'a': '1'}})),
+            Job(lambda ds: None, id='second', ds=DatasetConfigInternal(
+                project_id='project', dataset_name='dataset', tables_labels={'table': {'a': '2'}})),
+        ])
+
+        # expect
+        with self.assertRaisesRegex(ValueError, 'label a of table project.dataset.table'):
+            reconcile_workflow_labels(workflow)
+
+
+@mock.patch('bigflow.bigquery.dataset_manager.upsert_tables_labels')
+@mock.patch('bigflow.bigquery.dataset_manager.create_dataset')
+@mock.patch('bigflow.bigquery.dataset_manager.create_bigquery_client')
+class SkipLabelsTestCase(TestCase):
+
+    def test_should_skip_labels_when_reconciled_on_deploy(
+            self, create_bigquery_client_mock, create_dataset_mock, upsert_tables_labels_mock):
+        # given
+        create_dataset_mock.return_value = mock.Mock(full_dataset_id='project:dataset')
+
+        # when
+        with mock.patch.dict(os.environ, {'BIGFLOW_SKIP_LABELS': '1'}):
+            create_dataset_manager(
+                project_id='project', dataset_name='dataset', runtime='2020-01-01',
+                tables_labels={'table': {'a': 'b'}}, dataset_labels={'c': 'd'})
+
+        # then
+        create_dataset_mock.assert_called_once_with('dataset', create_bigquery_client_mock.return_value, 'EU', None)
+        upsert_tables_labels_mock.assert_called_once_with('dataset', None, create_bigquery_client_mock.return_value)
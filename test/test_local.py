@@ -0,0 +1,169 @@
+import json
+import tempfile
+
+from pathlib import Path
+from unittest import TestCase
+
+import pandas as pd
+
+from bigflow.bigquery.interactive import InteractiveDatasetManager, interactive_component
+from bigflow.bigquery.job import Job
+from bigflow.bigquery.interactive import DatasetConfigInternal
+from bigflow.bigquery.local import LocalDatabase, create_local_dataset_manager, run_job_locally
+
+
+class LocalDatasetManagerTestCase(TestCase):
+
+    def setUp(self):
+        self.database = LocalDatabase()
+        _, self.ds = create_local_dataset_manager(
+            'project', '2020-01-02', 'dataset', internal_tables=['events', 'daily'],
+            extras={'country': 'PL'}, database=self.database)
+        self.ds.create_table('''
+            CREATE TABLE IF NOT EXISTS events (user_id INT64, country STRING)
+            PARTITION BY DATE(_PARTITIONTIME)
+        ''')
+        self.ds.create_table('CREATE TABLE daily (user_id INT64, events INT64)')
+
+    def test_should_insert_records_to_partitions_and_collect_them(self):
+        # when
+        self.ds.insert('events', [{'user_id': 1, 'country': 'PL'}, {'user_id': 2, 'country': 'DE'}])
+        self.ds.insert('events', [{'user_id': 3, 'country': 'PL'}], custom_run_datetime='2020-01-01')
+
+        # then
+        self.assertEqual(
+            self.ds.collect_list(
+                "SELECT user_id FROM `{events}` WHERE DATE(_PARTITIONTIME) = '{dt}' AND country = '{country}'",
+                record_as_dict=True),
+            [{'user_id': 1}])
+        pd.testing.assert_frame_equal(
+            self.ds.collect('SELECT * FROM `{events}` ORDER BY user_id'),
+            pd.DataFrame({'user_id': [1, 2, 3], 'country': ['PL', 'DE', 'PL']}))
+        self.assertEqual(self.ds.collect_list('SELECT COUNT(*) AS c FROM `{events}`')[0].c, 3)
+
+    def test_should_truncate_only_written_partition(self):
+        # given
+        self.ds.insert('events', [{'user_id': 1, 'country': 'PL'}, {'user_id': 2, 'country': 'PL'}])
+
+        # when
+        self.ds.write_truncate(
+            'daily', "SELECT user_id, COUNT(*) AS events FROM `{events}` GROUP BY user_id",
+            custom_run_datetime='2020-01-01')
+        self.ds.write_truncate('daily', "SELECT user_id, COUNT(*) AS events FROM `{events}` GROUP BY user_id")
+        self.ds.write_truncate('daily', "SELECT 3 AS user_id, 1 AS events")
+        self.ds.write_append('daily', "SELECT 4 AS user_id, 1 AS events", custom_run_datetime='2020-01-01')
+
+        # then
+        self.assertEqual(
+            self.ds.collect_list(
+                "SELECT DATE(_PARTITIONTIME) AS day, user_id FROM `{daily}` ORDER BY day, user_id", record_as_dict=True),
+            [
+                {'day': '2020-01-01', 'user_id': 1},
+                {'day': '2020-01-01', 'user_id': 2},
+                {'day': '2020-01-01', 'user_id': 4},
+                {'day': '2020-01-02', 'user_id': 3},
+            ])
+
+    def test_should_truncate_hourly_partitions(self):
+        # given
+        self.ds.create_table('CREATE TABLE hourly (x INT64)')
+
+        # when
+        self.ds.write_truncate('hourly$2020010112', 'SELECT 1 AS x', partitioned=False)
+        self.ds.write_truncate('hourly$2020010113', 'SELECT 2 AS x', partitioned=False)
+        self.ds.write_truncate('hourly$2020010112', 'SELECT 3 AS x', partitioned=False)
+
+        # then
+        self.assertEqual(
+            self.ds.collect_list(
+                "SELECT _PARTITIONTIME AS hour, x FROM `project.dataset.hourly` "
+                "WHERE DATE(_PARTITIONTIME) = '2020-01-01' ORDER BY hour",
+                record_as_dict=True),
+            [{'hour': '2020-01-01 12:00:00', 'x': 3}, {'hour': '2020-01-01 13:00:00', 'x': 2}])
+
+    def test_should_fail_truncating_partition_of_not_partitioned_table(self):
+        # given
+        self.ds.write_truncate('daily', 'SELECT 1 AS user_id, 1 AS events', partitioned=False)
+
+        # expect
+        with self.assertRaises(ValueError):
+            self.ds.write_truncate('daily', 'SELECT 2 AS user_id, 1 AS events')
+        with self.assertRaises(ValueError):
+            self.ds.write_truncate('daily$__NULL__', 'SELECT 2 AS user_id, 1 AS events', partitioned=False)
+        self.assertEqual(self.ds.collect_list('SELECT user_id FROM `{daily}`', record_as_dict=True), [{'user_id': 1}])
+
+    def test_should_write_tmp_tables_and_drop_dataset(self):
+        # when
+        self.ds.write_tmp('tmp', 'SELECT 1 AS x UNION ALL SELECT 2')
+
+        # then
+        self.assertEqual(self.ds.collect('SELECT SUM(x) AS s FROM `{tmp}`')['s'][0], 3)
+        self.assertTrue(self.database.table_exists('project.dataset.tmp'))
+
+        # when
+        self.ds.remove_dataset()
+
+        # then
+        self.assertFalse(self.database.table_exists('project.dataset.tmp'))
+        self.assertFalse(self.database.table_exists('project.dataset.events'))
+
+    def test_should_fail_writing_to_missing_table(self):
+        # expect
+        with self.assertRaises(ValueError):
+            self.ds.write_truncate('missing', 'SELECT 1 AS x')
+        with self.assertRaises(ValueError):
+            self.ds.insert('missing', [{'x': 1}])
+
+    def test_should_create_table_from_schema(self):
+        # given
+        with tempfile.TemporaryDirectory() as directory:
+            schema = Path(directory) / 'schema.json'
+            schema.write_text(json.dumps([{'name': 'id', 'type': 'INT64'}, {'name': 'tags', 'type': 'STRING'}]))
+
+            # when
+            self.ds.create_table_from_schema('tagged', schema)
+            self.ds.insert('tagged', [{'id': 1, 'tags': ['a', 'b']}], partitioned=False)
+
+        # then
+        self.assertEqual(
+            self.ds.collect_list('SELECT * FROM `project.dataset.tagged`', record_as_dict=True),
+            [{'id': 1, 'tags': '["a", "b"]'}])
+
+
+class RunJobLocallyTestCase(TestCase):
+
+    def test_should_run_component_on_local_datasets(self):
+        # given
+        database = LocalDatabase()
+        _, source = create_local_dataset_manager('project', '2020-01-01', 'source', database=database)
+        source.create_table('CREATE TABLE clicks (user_id INT64)')
+        source.insert('clicks', [{'user_id': 1}, {'user_id': 1}, {'user_id': 2}])
+
+        source_config = DatasetConfigInternal('project', 'source', internal_tables=['clicks'])
+        target_config = DatasetConfigInternal(
+            'project', 'target', external_tables={'clicks': 'project.source.clicks'})
+
+        def component(source, target):
+            target.write_tmp('clicks_per_user', "SELECT user_id, COUNT(*) AS clicks FROM `{clicks}` GROUP BY user_id")
+            return target.collect('SELECT * FROM `{clicks_per_user}` ORDER BY user_id')
+
+        # when
+        result = run_job_locally(Job(component, source=source_config, target=target_config), '2020-01-01', database)
+
+        # then
+        pd.testing.assert_frame_equal(result, pd.DataFrame({'user_id': [1, 2], 'clicks': [2, 1]}))
+
+    def test_should_run_interactive_component_locally(self):
+        # given
+        dataset = InteractiveDatasetManager(project_id='project', dataset_name='dataset')
+
+        @interactive_component(ds=dataset)
+        def component(ds):
+            ds.write_tmp('numbers', 'SELECT 1 AS n UNION ALL SELECT 2')
+            return ds.collect_list('SELECT SUM(n) AS total FROM `{numbers}`', record_as_dict=True)
+
+        # when
+        result = run_job_locally(component.to_job(id='sum'))
+
+        # then
+        self.assertEqual(result, [{'total': 3}])
@@ -0,0 +1,178 @@
+import datetime
+import json
+import tempfile
+
+from pathlib import Path
+from unittest import TestCase
+
+import bigflow
+from bigflow.executor import JobStats
+from bigflow.metrics import JobMetricsCollector, to_prometheus_text
+from bigflow.workflow import Definition, Workflow, WorkflowJob
+
+
+class BusyJob(bigflow.Job):
+
+    def __init__(self, id, busy_sec=0.0, fail=False):
+        super().__init__(id=id)
+        self.busy_sec = busy_sec
+        self.fail = fail
+
+    def execute(self, context):
+        deadline = datetime.datetime.now() + datetime.timedelta(seconds=self.busy_sec)
+        while datetime.datetime.now() < deadline:
+            pass
+        if self.fail:
+            raise RuntimeError(f"{self.id} failed")
+
+
+class EventsListener(bigflow.JobListener):
+
+    def __init__(self):
+        self.events = []
+
+    def on_job_start(self, job, context):
+        self.events.append(('start', job.id))
+
+    def on_job_end(self, job, context, stats):
+        self.events.append(('end', job.id))
+
+    def on_job_error(self, job, context, error, stats):
+        self.events.append(('error', job.id, str(error)))
+
+
+class BrokenListener(bigflow.JobListener):
+
+    def on_job_end(self, job, context, stats):
+        raise RuntimeError("broken listener")
+
+
+class JobListenerTestCase(TestCase):
+
+    def test_should_notify_listeners_about_jobs(self):
+        # given
+        listener = EventsListener()
+        workflow = Workflow(workflow_id='w', definition=[BusyJob('a'), BusyJob('b', fail=True), BusyJob('c')])
+
+        # when
+        with self.assertRaises(RuntimeError):
+            workflow.run(datetime.datetime(2020, 1, 1), listeners=[BrokenListener(), listener])
+
+        # then
+        self.assertEqual(listener.events, [
+            ('start', 'a'), ('end', 'a'),
+            ('start', 'b'), ('error', 'b', 'b failed'),
+        ])
+
+    def test_should_notify_listeners_about_concurrent_jobs(self):
+        # given
+        listener = EventsListener()
+        root, left, right = (WorkflowJob(BusyJob(name), name) for name in ('root', 'left', 'right'))
+        workflow = Workflow(workflow_id='w', definition=Definition({root: [left, right]}))
+
+        # when
+        workflow.run(datetime.datetime(2020, 1, 1), max_workers=2, listeners=[listener])
+
+        # then
+        self.assertEqual(listener.events[:2], [('start', 'root'), ('end', 'root')])
+        self.assertCountEqual(listener.events[2:], [
+            ('start', 'left'), ('end', 'left'), ('start', 'right'), ('end', 'right'),
+        ])
+
+    def test_should_notify_listeners_about_single_job(self):
+        # given
+        listener = EventsListener()
+        workflow = Workflow(workflow_id='w', definition=[BusyJob('a'), BusyJob('b')])
+
+        # when
+        workflow.run_job('b', datetime.datetime(2020, 1, 1), listeners=[listener])
+
+        # then
+        self.assertEqual(listener.events, [('start', 'b'), ('end', 'b')])
+
+
+class JobMetricsCollectorTestCase(TestCase):
+
+    def test_should_measure_wall_and_cpu_time(self):
+        # given
+        collector = JobMetricsCollector()
+        workflow = Workflow(workflow_id='w', definition=[BusyJob('busy', busy_sec=0.2), BusyJob('failing', fail=True)])
+
+        # when
+        with self.assertRaises(RuntimeError):
+            workflow.run(datetime.datetime(2020, 1, 1), listeners=[collector])
+
+        # then
+        busy, failing = collector.records
+        self.assertEqual((busy.workflow_id, busy.job_id, busy.runtime, busy.status),
+                         ('w', 'busy', '2020-01-01 00:00:00', 'success'))
+        self.assertGreaterEqual(busy.wall_time_sec, 0.2)
+        self.assertGreaterEqual(busy.cpu_time_sec, 0.1)
+        self.assertGreater(busy.peak_rss_bytes, 0)
+        self.assertEqual(busy.attempts, 1)
+        self.assertEqual((failing.job_id, failing.status), ('failing', 'error'))
+
+    def test_should_measure_jobs_executed_in_child_processes(self):
+        # given
+        collector = JobMetricsCollector()
+        workflow = Workflow(workflow_id='w', definition=[BusyJob('busy', busy_sec=0.2)])
+
+        # when
+        workflow.run(datetime.datetime(2020, 1, 1), timeouts=True, listeners=[collector])
+
+        # then
+        [record] = collector.records
+        self.assertGreaterEqual(record.cpu_time_sec, 0.1)
+        self.assertGreater(record.peak_rss_bytes, 0)
+
+    def test_should_append_json_lines_to_file(self):
+        # given
+        path = Path(tempfile.mkdtemp()) / 'metrics' / 'jobs.jsonl'
+        workflow = Workflow(workflow_id='w', definition=[BusyJob('a'), BusyJob('b')])
+
+        # when
+        workflow.run(datetime.datetime(2020, 1, 1), listeners=[JobMetricsCollector(path)])
+        workflow.run(datetime.datetime(2020, 1, 2), listeners=[JobMetricsCollector(path)])
+
+        # then
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        self.assertEqual(
+            [(r['job_id'], r['runtime'], r['status']) for r in records],
+            [('a', '2020-01-01 00:00:00', 'success'), ('b', '2020-01-01 00:00:00', 'success'),
+             ('a', '2020-01-02 00:00:00', 'success'), ('b', '2020-01-02 00:00:00', 'success')])
+
+    def test_should_write_prometheus_text_file(self):
+        # given
+        path = Path(tempfile.mkdtemp()) / 'jobs.prom'
+        collector = JobMetricsCollector(path)
+        workflow = Workflow(workflow_id='w', definition=[BusyJob('a')])
+
+        # when
+        workflow.run(datetime.datetime(2020, 1, 1), listeners=[collector])
+        workflow.run(datetime.datetime(2020, 1, 1), listeners=[collector])
+
+        # then
+        self.assertEqual(collector.format, 'prometheus')
+        text = path.read_text()
+        self.assertEqual(text, collector.to_prometheus())
+        self.assertIn("# TYPE bigflow_job_wall_time_seconds gauge", text)
+        self.assertEqual(text.count('bigflow_job_attempts{workflow="w",job="a",runtime="2020-01-01 00:00:00",status="success"} 1'), 1)
+
+    def test_should_escape_prometheus_labels_and_skip_unknown_values(self):
+        # given
+        collector = JobMetricsCollector()
+        context = bigflow.JobContext.make(runtime=datetime.datetime(2020, 1, 1), workflow_id='w')
+        collector.on_job_end(BusyJob('a"b'), context, JobStats(1.5, 0.5, None, 1))
+        collector.on_job_error(BusyJob('c'), context, RuntimeError(), None)
+
+        # when
+        text = to_prometheus_text(collector.records)
+
+        # then
+        self.assertIn('bigflow_job_wall_time_seconds{workflow="w",job="a\\"b",runtime="2020-01-01 00:00:00",status="success"} 1.5', text)
+        self.assertNotIn('bigflow_job_peak_rss_bytes{', text)
+        self.assertNotIn('job="c"', text)
+
+    def test_should_reject_unknown_format(self):
+        with self.assertRaises(ValueError):
+            JobMetricsCollector(format='xml')
@@ -0,0 +1,151 @@
+import threading
+
+from unittest import TestCase, mock
+
+from bigflow.bigquery.interactive import InteractiveDatasetManager, interactive_component
+from bigflow.bigquery.operations import Operation, OperationGraph
+
+
+def operation(index, name=None, method='write_truncate', writes=None, reads=()):
+    return Operation(index, name, 'ds', method, {}, None, writes, frozenset(reads))
+
+
+class OperationGraphTestCase(TestCase):
+
+    def test_should_build_table_level_dependencies(self):
+        # given
+        graph = OperationGraph([
+            operation(0, method='write_tmp', writes='p.d.tmp1', reads=['p.d.source']),
+            operation(1, method='write_tmp', writes='p.d.tmp2', reads=['p.d.source']),
+            operation(2, name='join', writes='p.d.target', reads=['p.d.tmp1', 'p.d.tmp2']),
+            operation(3, name='overwrite_source', writes='p.d.source'),
+            operation(4, name='report', method='collect', reads=['p.d.other']),
+        ])
+
+        # expect
+        self.assertEqual(graph.dependencies, {
+            0: frozenset(),
+            1: frozenset(),
+            2: frozenset([0, 1]),
+            3: frozenset([0, 1]),
+            4: frozenset(),
+        })
+        self.assertEqual([o.index for o in graph.upstream('join')], [0, 1, 2])
+        self.assertEqual([o.index for o in graph.upstream('report')], [4])
+        with self.assertRaises(ValueError):
+            graph.upstream('missing')
+
+    def test_should_order_barriers_after_and_before_all_operations(self):
+        # given
+        graph = OperationGraph([
+            operation(0, writes='p.d.a'),
+            operation(1, method='create_table'),
+            operation(2, writes='p.d.b'),
+        ])
+
+        # expect
+        self.assertEqual(graph.dependencies, {0: frozenset(), 1: frozenset([0]), 2: frozenset([1])})
+
+    def test_should_run_independent_operations_concurrently(self):
+        # given
+        graph = OperationGraph([
+            operation(0, writes='p.d.a'),
+            operation(1, writes='p.d.b'),
+            operation(2, writes='p.d.c', reads=['p.d.a', 'p.d.b']),
+        ])
+        both_running = threading.Barrier(2, timeout=5)
+        finished = []
+
+        def run(op):
+            if op.index < 2:
+                both_running.wait()
+            finished.append(op.index)
+            return op.index * 10
+
+        # when
+        results = graph.execute(run, max_concurrent_operations=2)
+
+        # then
+        self.assertEqual(results, [0, 10, 20])
+        self.assertEqual(finished[-1], 2)
+
+    def test_should_stop_on_first_failed_operation(self):
+        # given
+        graph = OperationGraph([
+            operation(0, writes='p.d.a'),
+            operation(1, writes='p.d.b', reads=['p.d.a']),
+        ])
+        executed = []
+
+        def run(op):
+            executed.append(op.index)
+            raise RuntimeError('failed')
+
+        # expect
+        with self.assertRaises(RuntimeError):
+            graph.execute(run)
+        self.assertEqual(executed, [0])
+
+
+@mock.patch('bigflow.bigquery.plan.create_bigquery_client')
+class InteractiveComponentOperationsTestCase(TestCase):
+
+    def component(self):
+        dataset = InteractiveDatasetManager(
+            project_id='project', dataset_name='dataset', internal_tables=['source'], extras={'country': 'PL'})
+
+        @interactive_component(ds=dataset)
+        def standard_component(ds):
+            ds.write_tmp('tmp1', "SELECT * FROM `{source}` WHERE country = '{country}'")
+            ds.write_tmp('tmp2', "SELECT * FROM `{source}` WHERE dt = '{dt}'")
+            ds.write_truncate('target', "SELECT * FROM `{tmp1}` JOIN `{tmp2}` USING (id)", operation_name='join')
+            ds.write_truncate('other', "SELECT 1", operation_name='other')
+
+        return standard_component
+
+    def test_should_record_operations(self, create_bigquery_client_mock):
+        # when
+        graph = self.component().operations('2020-01-01')
+
+        # then
+        self.assertEqual([(o.method, o.name, o.writes, o.reads) for o in graph.operations], [
+            ('write_tmp', None, 'project.dataset.tmp1', frozenset(['project.dataset.source'])),
+            ('write_tmp', None, 'project.dataset.tmp2', frozenset(['project.dataset.source'])),
+            ('write_truncate', 'join', 'project.dataset.target',
+             frozenset(['project.dataset.tmp1', 'project.dataset.tmp2'])),
+            ('write_truncate', 'other', 'project.dataset.other', frozenset()),
+        ])
+        self.assertEqual(graph.operations[1].sql, "SELECT * FROM `project.dataset.source` WHERE dt = '2020-01-01'")
+        self.assertEqual(graph.dependencies[2], frozenset([0, 1]))
+
+    def test_should_read_tables_referenced_by_full_names(self, create_bigquery_client_mock):
+        # given
+        dataset = InteractiveDatasetManager(project_id='project', dataset_name='dataset')
+
+        @interactive_component(ds=dataset)
+        def standard_component(ds):
+            ds.write_tmp('tmp', "SELECT 1 AS id")
+            ds.write_tmp('other', "SELECT 2 AS id")
+            ds.write_truncate('target', "SELECT * FROM `project.dataset.tmp` JOIN dataset.other USING (id)")
+
+        # when
+        graph = standard_component.operations('2020-01-01')
+
+        # then
+        self.assertEqual(graph.operations[2].reads, frozenset(['project.dataset.tmp', 'project.dataset.other']))
+        self.assertEqual(graph.dependencies[2], frozenset([0, 1]))
+
+    @mock.patch('bigflow.bigquery.job.create_dataset_manager')
+    def test_should_run_upstream_of_operation(self, create_dataset_manager_mock, create_bigquery_client_mock):
+        # given
+        dataset_manager_mock = mock.Mock()
+        create_dataset_manager_mock.return_value = (None, dataset_manager_mock)
+
+        # when
+        self.component().run('2020-01-01', operation_name='join', upstream=True, max_concurrent_operations=2)
+
+        # then
+        self.assertCountEqual([c[0] for c in dataset_manager_mock.method_calls], ['write_tmp', 'write_tmp', 'write_truncate'])
+        self.assertEqual(dataset_manager_mock.method_calls[-1], mock.call.write_truncate(
+            table_name='target', sql="SELECT * FROM `{tmp1}` JOIN `{tmp2}` USING (id)", partitioned=True,
+            custom_run_datetime=None))
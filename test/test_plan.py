@@ -0,0 +1,157 @@
+import json
+import threading
+
+from unittest import TestCase, mock
+
+import bigflow
+
+from bigflow.bigquery.interactive import DatasetConfigInternal, InteractiveDatasetManager
+from bigflow.bigquery.job import Job
+from bigflow.bigquery.plan import plan_workflow
+
+
+TIB = 2 ** 40
+
+
+class FakeClient:
+
+    def __init__(self, bytes_by_table):
+        self.bytes_by_table = bytes_by_table
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def query(self, sql, job_config=None):
+        with self.lock:
+            self.queries.append((sql, job_config))
+        if not job_config.dry_run:
+            raise AssertionError("Only dry runs are allowed")
+        for table, bytes_processed in self.bytes_by_table.items():
+            if table in sql:
+                return mock.Mock(total_bytes_processed=bytes_processed)
+        raise ValueError(f"Not found: {sql}")
+
+
+@mock.patch('bigflow.bigquery.plan.create_bigquery_client')
+class PlanWorkflowTestCase(TestCase):
+
+    def setUp(self):
+        self.config = DatasetConfigInternal(
+            project_id='project',
+            dataset_name='dataset',
+            internal_tables=['source', 'target'],
+            external_tables={'big': 'other.dataset.big'})
+        self.client = FakeClient({'project.dataset.source': TIB, 'other.dataset.big': 40 * TIB})
+
+    def test_should_record_statements_and_estimate_their_costs(self, create_bigquery_client_mock):
+        # given
+        create_bigquery_client_mock.return_value = self.client
+
+        def transform(ds):
+            ds.write_tmp('tmp', 'SELECT * FROM `{source}` WHERE dt = "{dt}"')
+            ds.write_truncate('target', 'SELECT * FROM `{big}`')
+
+        def report(ds):
+            df = ds.collect('SELECT COUNT(*) FROM `{source}`')
+            self.assertTrue(df.empty)
+
+        workflow = bigflow.Workflow(workflow_id='wf', definition=[
+            Job(transform, ds=self.config),
+            Job(report, ds=self.config),
+        ])
+
+        # when
+        plan = plan_workflow(workflow, '2020-01-01')
+
+        # then
+        self.assertEqual(plan.bytes_processed, 42 * TIB)
+        self.assertEqual(plan.cost_usd, 42 * 6.25)
+        self.assertEqual(plan.errors, [])
+        transform_plan, report_plan = plan.jobs
+        self.assertEqual(transform_plan.job_id, 'transform')
+        self.assertEqual(transform_plan.cost_usd, 41 * 6.25)
+        self.assertEqual([(s.operation, s.destination, s.bytes_processed) for s in transform_plan.statements], [
+            ('WRITE_TRUNCATE', 'project.dataset.tmp', TIB),
+            ('WRITE_TRUNCATE', 'project.dataset.target$20200101', 40 * TIB),
+        ])
+        self.assertEqual(transform_plan.statements[0].sql,
+                         'SELECT * FROM `project.dataset.source` WHERE dt = "2020-01-01"')
+        self.assertEqual(report_plan.statements[0].operation, 'COLLECT')
+
+        # and
+        self.assertTrue(all(config.dry_run and not config.use_query_cache for _, config in self.client.queries))
+        create_bigquery_client_mock.assert_called_once()
+
+        # and
+        result = json.loads(json.dumps(plan.to_dict()))
+        self.assertEqual(result['cost_usd'], 262.5)
+        self.assertEqual(result['jobs'][0]['statements'][1]['bytes_processed'], 40 * TIB)
+
+    def test_should_report_failed_components_and_dry_runs(self, create_bigquery_client_mock):
+        # given
+        create_bigquery_client_mock.return_value = self.client
+
+        def sensor(ds):
+            ds.collect('SELECT * FROM `{source}`')
+            ds.collect('SELECT * FROM `project.dataset.missing`')
+            raise ValueError('not ready')
+
+        workflow = bigflow.Workflow(workflow_id='wf', definition=[Job(sensor, ds=self.config)])
+
+        # when
+        plan = plan_workflow(workflow, '2020-01-01')
+
+        # then
+        job_plan, = plan.jobs
+        self.assertEqual(job_plan.error, 'ValueError: not ready')
+        self.assertEqual(job_plan.bytes_processed, TIB)
+        self.assertIsNone(job_plan.statements[1].bytes_processed)
+        self.assertEqual(len(plan.errors), 2)
+
+    def test_should_plan_interactive_components(self, create_bigquery_client_mock):
+        # given
+        create_bigquery_client_mock.return_value = self.client
+        dataset = InteractiveDatasetManager(project_id='project', dataset_name='dataset', internal_tables=['source'])
+        operation = dataset.write_truncate('target', 'SELECT * FROM `{source}`', partitioned=False)
+        workflow = bigflow.Workflow(workflow_id='wf', definition=[operation.to_job(id='write_target')])
+
+        # when
+        plan = plan_workflow(workflow, '2020-01-01')
+
+        # then
+        self.assertEqual(plan.jobs[0].job_id, 'write_target')
+        self.assertEqual(plan.jobs[0].statements[0].destination, 'project.dataset.target')
+        self.assertEqual(plan.bytes_processed, TIB)
+
+    def test_should_skip_jobs_which_are_not_bigquery_jobs(self, create_bigquery_client_mock):
+        # given
+        class OtherJob(bigflow.Job):
+            id = 'other'
+
+            def execute(self, context):
+                raise AssertionError("Jobs must not be executed")
+
+        # when
+        plan = plan_workflow(bigflow.Workflow(workflow_id='wf', definition=[OtherJob()]), '2020-01-01')
+
+        # then
+        self.assertEqual(plan.jobs[0].statements, [])
+        self.assertEqual(plan.cost_usd, 0)
+        create_bigquery_client_mock.assert_not_called()
+
+    def test_should_sum_costs_of_small_statements_without_rounding(self, create_bigquery_client_mock):
+        # given
+        create_bigquery_client_mock.return_value = FakeClient({'project.dataset.source': TIB // 2000})
+
+        def component(ds):
+            for i in range(100):
+                ds.write_tmp(f'tmp{i}', 'SELECT * FROM `{source}`')
+
+        workflow = bigflow.Workflow(workflow_id='wf', definition=[Job(component, ds=self.config)])
+
+        # when
+        plan = plan_workflow(workflow, '2020-01-01')
+
+        # then
+        self.assertAlmostEqual(plan.cost_usd, 100 * (TIB // 2000) / TIB * 6.25)
+        self.assertEqual(plan.to_dict()['cost_usd'], 0.31)
+        self.assertEqual(plan.to_dict()['jobs'][0]['statements'][0]['cost_usd'], 0.0)
@@ -0,0 +1,87 @@
+import pickle
+import threading
+import time
+
+from unittest import TestCase
+
+from bigflow.resource_context import ResourceContext
+
+
+class ResourceContextTestCase(TestCase):
+
+    def test_should_create_resource_only_once(self):
+        # given
+        resources = ResourceContext()
+        created = []
+
+        def factory():
+            created.append(1)
+            time.sleep(0.05)
+            return object()
+
+        # when
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(resources.get_or_create('client', factory)))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # then
+        self.assertEqual(len(created), 1)
+        self.assertEqual(len(set(map(id, results))), 1)
+        self.assertIn('client', resources)
+
+    def test_should_not_cache_failed_creation(self):
+        # given
+        resources = ResourceContext()
+
+        def failing_factory():
+            raise RuntimeError("no connection")
+
+        # when
+        with self.assertRaises(RuntimeError):
+            resources.get_or_create('client', failing_factory)
+
+        # then
+        self.assertNotIn('client', resources)
+        self.assertEqual(resources.get_or_create('client', lambda: 'ok'), 'ok')
+
+    def test_should_call_action_once(self):
+        # given
+        resources = ResourceContext()
+        calls = []
+
+        # when
+        resources.once('labels', lambda: calls.append(1))
+        resources.once('labels', lambda: calls.append(1))
+        resources.once('other labels', lambda: calls.append(2))
+
+        # then
+        self.assertEqual(calls, [1, 2])
+
+    def test_should_recreate_invalidated_resource(self):
+        # given
+        resources = ResourceContext()
+        resources.get_or_create('dataset', lambda: 'old')
+
+        # when
+        resources.invalidate('dataset')
+
+        # then
+        self.assertEqual(resources.get_or_create('dataset', lambda: 'new'), 'new')
+
+    def test_should_not_send_resources_to_other_processes(self):
+        # given
+        resources = ResourceContext()
+        resources.get_or_create('client', lambda: threading.Lock())
+
+        # when
+        copy = pickle.loads(pickle.dumps(resources))
+
+        # then
+        self.assertNotIn('client', copy)
+        self.assertEqual(copy.get_or_create('client', lambda: 'new'), 'new')
@@ -0,0 +1,171 @@
+import datetime
+import os
+import tempfile
+
+from pathlib import Path
+from unittest import TestCase, mock
+
+import pandas as pd
+
+from bigflow.bigquery.dataset_manager import DatasetManager, PartitionedDatasetManager, TemplatedDatasetManager
+from bigflow.bigquery.interactive import OperationLevelDatasetManager
+from bigflow.bigquery.result_cache import QueryResultCache, has_unresolved_tables, is_cacheable, referenced_tables
+
+
+class ReferencedTablesTestCase(TestCase):
+
+    def test_should_find_backticked_and_unquoted_tables(self):
+        # when
+        tables = referenced_tables(
+            "SELECT * FROM `p.d.a` JOIN d.b USING (id) JOIN `other-project.d.c` ON TRUE", default_project='p')
+
+        # then
+        self.assertEqual(tables, ['other-project.d.c', 'p.d.a', 'p.d.b'])
+
+    def test_should_detect_unresolved_tables(self):
+        # expect
+        self.assertTrue(has_unresolved_tables("SELECT * FROM `p.d.events_*` WHERE _TABLE_SUFFIX > '1'", 'p'))
+        self.assertTrue(has_unresolved_tables("SELECT * FROM p.d.events_* JOIN `p.d.a` USING (id)", 'p'))
+        self.assertTrue(has_unresolved_tables("SELECT * FROM d.b"))
+        self.assertFalse(has_unresolved_tables("SELECT * FROM d.b, UNNEST(x) JOIN `p.d.a` USING (id)", 'p'))
+        self.assertFalse(has_unresolved_tables("WITH t AS (SELECT 1) SELECT * FROM t"))
+
+    def test_should_skip_tables_without_project_when_there_is_no_default_project(self):
+        # expect
+        self.assertEqual(referenced_tables("SELECT * FROM d.b"), [])
+
+    def test_should_not_cache_nondeterministic_queries(self):
+        # expect
+        self.assertTrue(is_cacheable("SELECT * FROM `p.d.a`"))
+        self.assertFalse(is_cacheable("SELECT CURRENT_TIMESTAMP() FROM `p.d.a`"))
+        self.assertFalse(is_cacheable("SELECT rand() FROM `p.d.a`"))
+
+
+class QueryResultCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = QueryResultCache(Path(self.tmp_dir.name))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_should_store_and_read_data_frames(self):
+        # given
+        key = self.cache.key('SELECT 1', '2020-01-01', {'p.d.a': '2020-01-01T00:00:00'})
+        df = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+
+        # when
+        self.cache.put(key, df)
+
+        # then
+        pd.testing.assert_frame_equal(self.cache.get(key), df)
+        self.assertIsNone(self.cache.get(self.cache.key('SELECT 1', '2020-01-02', {'p.d.a': '2020-01-01T00:00:00'})))
+        self.assertIsNone(self.cache.get(self.cache.key('SELECT 1', '2020-01-01', {'p.d.a': '2020-01-02T00:00:00'})))
+
+    def test_should_evict_least_recently_used_results(self):
+        # given
+        df = pd.DataFrame({'a': range(1000)})
+        self.cache.put('first', df)
+        self.cache.put('second', df)
+        first, second = Path(self.tmp_dir.name) / 'first.parquet', Path(self.tmp_dir.name) / 'second.parquet'
+        os.utime(first, (1, 1))
+        os.utime(second, (2, 2))
+        self.cache.get('first')
+        self.cache.max_size_bytes = first.stat().st_size * 2
+
+        # when
+        self.cache.put('third', df)
+
+        # then
+        self.assertIsNotNone(self.cache.get('first'))
+        self.assertIsNone(self.cache.get('second'))
+        self.assertIsNotNone(self.cache.get('third'))
+
+    def test_should_clear_cache(self):
+        # given
+        self.cache.put('key', pd.DataFrame({'a': [1]}))
+
+        # when
+        self.cache.clear()
+
+        # then
+        self.assertIsNone(self.cache.get('key'))
+
+
+class OperationLevelDatasetManagerCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.client = mock.Mock()
+        self.client.list_tables.return_value = []
+        self.client.get_table.return_value = mock.Mock(modified=datetime.datetime(2020, 1, 1), table_type='TABLE')
+        self.client.query.return_value.to_dataframe.side_effect = lambda **kwargs: pd.DataFrame({'a': [1]})
+        core = DatasetManager(self.client, mock.Mock(full_dataset_id='project:dataset'), mock.Mock())
+        self.dataset_manager = PartitionedDatasetManager(
+            TemplatedDatasetManager(core, ['table'], {}, {}, '2020-01-01'), '20200101')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def operation_level_dataset_manager(self, cache=True, peek=None, **kwargs):
+        return OperationLevelDatasetManager(
+            self.dataset_manager,
+            peek=peek,
+            result_cache=QueryResultCache(Path(self.tmp_dir.name)) if cache else None,
+            **kwargs)
+
+    def test_should_reuse_collected_result_until_table_is_modified(self):
+        # when
+        self.operation_level_dataset_manager().collect('SELECT * FROM `{table}`')
+        result = self.operation_level_dataset_manager().collect('SELECT * FROM `{table}`')
+
+        # then
+        self.client.query.assert_called_once_with('SELECT * FROM `project.dataset.table`')
+        self.client.get_table.assert_called_with('project.dataset.table')
+        pd.testing.assert_frame_equal(result, pd.DataFrame({'a': [1]}))
+
+        # when
+        self.client.get_table.return_value = mock.Mock(modified=datetime.datetime(2020, 1, 2), table_type='TABLE')
+        self.operation_level_dataset_manager().collect('SELECT * FROM `{table}`')
+
+        # then
+        self.assertEqual(self.client.query.call_count, 2)
+
+    def test_should_reuse_peeked_result(self):
+        # when
+        for _ in range(2):
+            self.operation_level_dataset_manager(peek=True, operation_name='op').collect(
+                'SELECT * FROM `{table}`', operation_name='op')
+
+        # then
+        self.client.query.assert_called_once_with('SELECT * FROM `project.dataset.table`\nLIMIT 1000')
+
+    def test_should_not_cache_results_of_views_and_external_tables(self):
+        # given
+        self.client.get_table.return_value = mock.Mock(modified=datetime.datetime(2020, 1, 1), table_type='VIEW')
+
+        # when
+        for _ in range(2):
+            self.operation_level_dataset_manager().collect('SELECT * FROM `{table}`')
+
+        # then
+        self.assertEqual(self.client.query.call_count, 2)
+
+    def test_should_not_cache_results_of_queries_reading_wildcard_tables(self):
+        # when
+        for _ in range(2):
+            self.operation_level_dataset_manager().collect('SELECT * FROM `{table}` JOIN `project.dataset.t_*` USING (a)')
+
+        # then
+        self.assertEqual(self.client.query.call_count, 2)
+        self.client.get_table.assert_not_called()
+
+    def test_should_not_use_cache_when_disabled(self):
+        # when
+        for _ in range(2):
+            self.operation_level_dataset_manager(cache=False).collect('SELECT * FROM `{table}`')
+
+        # then
+        self.assertEqual(self.client.query.call_count, 2)
+        self.client.get_table.assert_not_called()
@@ -0,0 +1,283 @@
+import datetime
+import pickle
+import tempfile
+
+from pathlib import Path
+from unittest import TestCase, mock
+
+import bigflow
+
+from bigflow.results import FileMemoStore, ResultStore, memo_key
+from bigflow.backfill import backfill
+from bigflow.runstate import JsonRunStateStore
+from bigflow.workflow import Definition, JobContext, Workflow
+
+
+class ResultStoreTestCase(TestCase):
+
+    def test_should_keep_results_per_runtime(self):
+        # given
+        store = ResultStore()
+
+        # when
+        store.put('2020-01-01', 'job', 1)
+        store.put('2020-01-02', 'job', 2)
+
+        # then
+        self.assertEqual(store.get('2020-01-01', 'job'), 1)
+        self.assertEqual(store.get('2020-01-02', 'job'), 2)
+        self.assertTrue(store.contains('2020-01-01', 'job'))
+        self.assertFalse(store.contains('2020-01-03', 'job'))
+
+    def test_should_raise_key_error_when_result_is_missing(self):
+        # given
+        store = ResultStore()
+
+        # then
+        with self.assertRaises(KeyError):
+            store.get('2020-01-01', 'job')
+        self.assertIsNone(store.get('2020-01-01', 'job', default=None))
+
+    def test_should_check_type_of_result(self):
+        # given
+        store = ResultStore()
+        store.put('2020-01-01', 'job', [1, 2])
+
+        # then
+        self.assertEqual(store.get('2020-01-01', 'job', expected_type=list), [1, 2])
+        with self.assertRaises(TypeError):
+            store.get('2020-01-01', 'job', expected_type=dict)
+
+    def test_should_spill_large_results_to_disk(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # given
+            store = ResultStore(spill_dir=tmp_dir, spill_threshold_bytes=100)
+
+            # when
+            store.put('2020-01-01', 'small', 'x')
+            store.put('2020-01-01', 'large', 'x' * 1000)
+
+            # then
+            self.assertEqual(len(list(Path(tmp_dir).iterdir())), 1)
+            self.assertEqual(store.get('2020-01-01', 'large'), 'x' * 1000)
+
+            # when
+            store.clear()
+
+            # then
+            self.assertEqual(list(Path(tmp_dir).iterdir()), [])
+
+    def test_should_raise_key_error_with_reason_when_result_is_unavailable(self):
+        # given
+        store = ResultStore()
+
+        # when
+        store.mark_unavailable('2020-01-01', 'job', 'job was skipped')
+
+        # then
+        with self.assertRaisesRegex(KeyError, 'job was skipped'):
+            store.get('2020-01-01', 'job')
+        self.assertIsNone(store.get('2020-01-01', 'job', default=None))
+        self.assertFalse(store.contains('2020-01-01', 'job'))
+
+    def test_should_skip_unpicklable_results_when_pickled(self):
+        # given
+        store = ResultStore()
+        store.put('2020-01-01', 'lambda', lambda: 1)
+        store.put('2020-01-01', 'value', 1)
+
+        # when
+        copy = pickle.loads(pickle.dumps(store))
+
+        # then
+        self.assertEqual(copy.get('2020-01-01', 'value'), 1)
+        self.assertFalse(copy.contains('2020-01-01', 'lambda'))
+
+
+class ReturningJob(bigflow.Job):
+
+    def __init__(self, id, value, calls):
+        self.id = id
+        self.value = value
+        self.calls = calls
+
+    def execute(self, context):
+        self.calls.append(self.id)
+        return self.value
+
+
+class SummingJob(bigflow.Job):
+
+    def __init__(self, id, upstream_ids, calls):
+        self.id = id
+        self.upstream_ids = upstream_ids
+        self.calls = calls
+
+    def execute(self, context):
+        self.calls.append(self.id)
+        self.result = sum(context.upstream_result(job_id, expected_type=int) for job_id in self.upstream_ids)
+        return self.result
+
+
+class ResultPassingTestCase(TestCase):
+
+    def _workflow(self, calls):
+        a = ReturningJob('a', 1, calls)
+        b = ReturningJob('b', 2, calls)
+        total = SummingJob('total', ['a', 'b'], calls)
+        return Workflow(workflow_id='results', definition=Definition({a: [total], b: [total]}))
+
+    def test_should_pass_results_to_downstream_jobs(self):
+        for executor, max_workers in [('thread', 1), ('thread', 2), ('asyncio', 2)]:
+            with self.subTest(executor=executor, max_workers=max_workers):
+                # given
+                workflow = self._workflow([])
+
+                # when
+                workflow.run(datetime.datetime(2020, 1, 1), executor=executor, max_workers=max_workers)
+
+                # then
+                self.assertEqual(workflow.find_job('total').result, 3)
+                self.assertFalse(workflow.results.contains('2020-01-01 00:00:00', 'total'))
+
+    def test_should_raise_when_upstream_result_is_missing(self):
+        # given
+        context = JobContext.make(runtime=datetime.datetime(2020, 1, 1), workflow=self._workflow([]))
+
+        # then
+        with self.assertRaises(KeyError):
+            context.upstream_result('a')
+        self.assertEqual(context.upstream_result('a', default=0), 0)
+
+    def test_should_skip_memoised_jobs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # given
+            memo_store = FileMemoStore(tmp_dir)
+            calls = []
+            self._workflow(calls).run(datetime.datetime(2020, 1, 1), memo_store=memo_store)
+
+            # when
+            calls.clear()
+            workflow = self._workflow(calls)
+            workflow.run(datetime.datetime(2020, 1, 1), memo_store=memo_store)
+
+            # then
+            self.assertEqual(calls, [])
+
+            # when
+            workflow.run(datetime.datetime(2020, 1, 2), memo_store=memo_store)
+
+            # then
+            self.assertCountEqual(calls, ['a', 'b', 'total'])
+
+    def test_should_load_memoised_results_of_resumed_jobs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # given
+            memo_store = FileMemoStore(Path(tmp_dir) / 'memo')
+            state_store = JsonRunStateStore(Path(tmp_dir) / 'run_state.json')
+            state_store.mark_completed('results', 'a', '2020-01-01 00:00:00')
+            state_store.mark_completed('results', 'b', '2020-01-01 00:00:00')
+            self._workflow([]).run_job('a', datetime.datetime(2020, 1, 1), memo_store=memo_store)
+            self._workflow([]).run_job('b', datetime.datetime(2020, 1, 1), memo_store=memo_store)
+            calls = []
+            workflow = self._workflow(calls)
+
+            # when
+            workflow.run(datetime.datetime(2020, 1, 1), resume=True, state_store=state_store, memo_store=memo_store)
+
+            # then
+            self.assertEqual(calls, ['total'])
+            self.assertEqual(workflow.find_job('total').result, 3)
+
+    def test_should_raise_clear_error_when_result_of_resumed_job_is_not_memoised(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # given
+            state_store = JsonRunStateStore(Path(tmp_dir) / 'run_state.json')
+            state_store.mark_completed('results', 'a', '2020-01-01 00:00:00')
+            calls = []
+
+            # expect
+            with self.assertRaisesRegex(KeyError, 'memoize=True'):
+                self._workflow(calls).run(datetime.datetime(2020, 1, 1), resume=True, state_store=state_store)
+            self.assertCountEqual(calls, ['b', 'total'])
+
+    def test_should_pass_results_in_parallel_backfill(self):
+        # given
+        calls = []
+        a = ReturningJob('a', 1, calls)
+        b = SummingJob('b', ['a'], calls)
+        c = SummingJob('c', ['b'], calls)
+        workflow = Workflow(workflow_id='results', definition=Definition({a: [b], b: [c]}), depends_on_past=False)
+
+        # when
+        backfill(workflow, datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 8), parallel=4)
+
+        # then
+        self.assertEqual(calls.count('c'), 8)
+        self.assertEqual(repr(workflow.results), 'ResultStore(0 results)')
+
+    def test_should_not_memoise_without_memo_store(self):
+        # given
+        calls = []
+        workflow = self._workflow(calls)
+
+        # when
+        workflow.run(datetime.datetime(2020, 1, 1))
+        workflow.run(datetime.datetime(2020, 1, 1))
+
+        # then
+        self.assertEqual(len(calls), 6)
+
+
+class MemoKeyTestCase(TestCase):
+
+    def test_should_change_key_when_upstream_key_changes(self):
+        # given
+        job = ReturningJob('a', 1, [])
+
+        # when
+        key = memo_key('wf', job, '2020-01-01', ['x'])
+
+        # then
+        self.assertEqual(key, memo_key('wf', job, '2020-01-01', ['x']))
+        self.assertNotEqual(key, memo_key('wf', job, '2020-01-01', ['y']))
+        self.assertNotEqual(key, memo_key('wf', job, '2020-01-02', ['x']))
+        self.assertNotEqual(key, memo_key('wf', SummingJob('a', [], []), '2020-01-01', ['x']))
+
+    def test_should_change_key_when_env_or_job_configuration_changes(self):
+        # given
+        job = ReturningJob('a', 1, [])
+
+        # when
+        key = memo_key('wf', job, '2020-01-01', [], env='dev')
+
+        # then
+        self.assertEqual(key, memo_key('wf', ReturningJob('a', 1, []), '2020-01-01', [], env='dev'))
+        self.assertNotEqual(key, memo_key('wf', job, '2020-01-01', [], env='prod'))
+        self.assertNotEqual(key, memo_key('wf', ReturningJob('a', 2, []), '2020-01-01', [], env='dev'))
+
+    @mock.patch('bigflow.configuration.current_env')
+    def test_should_not_reuse_memoised_result_in_other_env(self, current_env_mock):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # given
+            memo_store = FileMemoStore(tmp_dir)
+            calls = []
+            workflow = Workflow(workflow_id='results', definition=[ReturningJob('a', 1, calls)])
+            current_env_mock.return_value = 'dev'
+            workflow.run(datetime.datetime(2020, 1, 1), memo_store=memo_store)
+
+            calls.clear()
+
+            # when
+            current_env_mock.return_value = 'dev'
+            workflow.run(datetime.datetime(2020, 1, 1), memo_store=memo_store)
+
+            # then
+            self.assertEqual(calls, [])
+
+            # when
+            current_env_mock.return_value = 'prod'
+            workflow.run(datetime.datetime(2020, 1, 1), memo_store=memo_store)
+
+            # then
+            self.assertEqual(calls, ['a'])
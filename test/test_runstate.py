@@ -0,0 +1,136 @@
+import datetime
+import tempfile
+
+from pathlib import Path
+from unittest import TestCase
+
+import bigflow
+from bigflow.runstate import JsonRunStateStore, SqliteRunStateStore
+from bigflow.workflow import Definition, Workflow
+
+
+class CountingJob(bigflow.Job):
+
+    def __init__(self, id, fail=False):
+        super().__init__(id=id)
+        self.fail = fail
+        self.executions = 0
+
+    def execute(self, context):
+        self.executions += 1
+        if self.fail:
+            raise RuntimeError(f"{self.id} failed")
+
+
+class RunStateStoreTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def stores(self):
+        yield SqliteRunStateStore(Path(self.tmpdir.name) / "state" / "run_state.sqlite")
+        yield JsonRunStateStore(Path(self.tmpdir.name) / "run_state.json")
+
+    def test_should_record_completed_jobs_per_workflow_and_runtime(self):
+        for store in self.stores():
+            with self.subTest(store=store):
+                # when
+                store.mark_completed('w1', 'job1', '2020-01-01 00:00:00')
+                store.mark_completed('w1', 'job2', '2020-01-01 00:00:00')
+                store.mark_completed('w1', 'job1', '2020-01-02 00:00:00')
+                store.mark_completed('w2', 'job1', '2020-01-01 00:00:00')
+
+                # then
+                self.assertEqual(store.completed_jobs('w1', '2020-01-01 00:00:00'), {'job1', 'job2'})
+                self.assertEqual(store.completed_jobs('w1', '2020-01-02 00:00:00'), {'job1'})
+                self.assertTrue(store.is_completed('w2', 'job1', '2020-01-01 00:00:00'))
+                self.assertFalse(store.is_completed('w2', 'job2', '2020-01-01 00:00:00'))
+
+    def test_should_clear_state(self):
+        for store in self.stores():
+            with self.subTest(store=store):
+                # given
+                store.mark_completed('w1', 'job1', '2020-01-01 00:00:00')
+                store.mark_completed('w1', 'job1', '2020-01-02 00:00:00')
+
+                # when
+                store.clear('w1', '2020-01-01 00:00:00')
+
+                # then
+                self.assertEqual(store.completed_jobs('w1', '2020-01-01 00:00:00'), set())
+                self.assertEqual(store.completed_jobs('w1', '2020-01-02 00:00:00'), {'job1'})
+
+                # when
+                store.clear('w1')
+
+                # then
+                self.assertEqual(store.completed_jobs('w1', '2020-01-02 00:00:00'), set())
+
+
+class ResumeWorkflowTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.store = SqliteRunStateStore(Path(self.tmpdir.name) / "run_state.sqlite")
+
+    def test_should_skip_jobs_finished_in_previous_run(self):
+        for max_workers in [1, 3]:
+            with self.subTest(max_workers=max_workers):
+                # given
+                self.store.clear('w')
+                first, second, third = CountingJob('first'), CountingJob('second', fail=True), CountingJob('third')
+                workflow = Workflow(workflow_id='w', definition=[first, second, third])
+                runtime = datetime.datetime(2020, 1, 1)
+
+                # when
+                with self.assertRaises(RuntimeError):
+                    workflow.run(runtime, max_workers=max_workers, resume=True, state_store=self.store)
+
+                # then
+                self.assertEqual((first.executions, second.executions, third.executions), (1, 1, 0))
+
+                # when
+                second.fail = False
+                workflow.run(runtime, max_workers=max_workers, resume=True, state_store=self.store)
+
+                # then
+                self.assertEqual((first.executions, second.executions, third.executions), (1, 2, 1))
+
+                # when another runtime
+                workflow.run(datetime.datetime(2020, 1, 2), max_workers=max_workers, resume=True, state_store=self.store)
+
+                # then
+                self.assertEqual((first.executions, second.executions, third.executions), (2, 3, 2))
+
+    def test_should_resume_graph_with_partially_finished_branches(self):
+        # given
+        root, left, right, tail = [CountingJob(i) for i in ['root', 'left', 'right', 'tail']]
+        workflow = Workflow(workflow_id='w', definition=Definition({
+            root: [left, right],
+            left: [tail],
+            right: [tail],
+        }))
+        runtime = datetime.datetime(2020, 1, 1)
+        self.store.mark_completed('w', 'root', '2020-01-01 00:00:00')
+        self.store.mark_completed('w', 'left', '2020-01-01 00:00:00')
+
+        # when
+        workflow.run(runtime, max_workers=2, resume=True, state_store=self.store)
+
+        # then
+        self.assertEqual([j.executions for j in [root, left, right, tail]], [0, 0, 1, 1])
+
+    def test_should_rerun_all_jobs_without_resume(self):
+        # given
+        job = CountingJob('job')
+        workflow = Workflow(workflow_id='w', definition=[job])
+
+        # when
+        workflow.run(datetime.datetime(2020, 1, 1), state_store=self.store)
+        workflow.run(datetime.datetime(2020, 1, 1), state_store=self.store)
+        workflow.run_job('job', datetime.datetime(2020, 1, 1), resume=True, state_store=self.store)
+
+        # then
+        self.assertEqual(job.executions, 2)
@@ -0,0 +1,116 @@
+from unittest import TestCase, mock
+
+from bigflow.bigquery.interactive import InteractiveDatasetManager, interactive_component
+from bigflow.bigquery.sampling import peek_query, sample_tables
+
+
+class SampleTablesTestCase(TestCase):
+
+    def test_should_sample_tables_after_from_and_join(self):
+        # when
+        sql = sample_tables('''
+            SELECT * FROM `{events}` AS e
+            LEFT JOIN {users} u ON e.user_id = u.id
+            JOIN `p.d.countries` USING (country)
+            WHERE e.dt = '{dt}'
+        ''', 0.5)
+
+        # then
+        self.assertEqual(sql, '''
+            SELECT * FROM `{events}` AS e TABLESAMPLE SYSTEM (0.5 PERCENT)
+            LEFT JOIN {users} u TABLESAMPLE SYSTEM (0.5 PERCENT) ON e.user_id = u.id
+            JOIN `p.d.countries` TABLESAMPLE SYSTEM (0.5 PERCENT) USING (country)
+            WHERE e.dt = '{dt}'
+        ''')
+
+    def test_should_not_sample_subqueries_ctes_and_sampled_tables(self):
+        # given
+        sql = '''
+            WITH recent AS (SELECT * FROM `{events}` TABLESAMPLE SYSTEM (10 PERCENT))
+            SELECT * FROM recent, UNNEST(items) JOIN (SELECT 1 AS x) ON TRUE
+        '''
+
+        # expect
+        self.assertEqual(sample_tables(sql, 1), sql)
+
+
+    def test_should_not_sample_columns_in_function_arguments(self):
+        # when
+        sql = sample_tables(
+            "SELECT EXTRACT(DAY FROM `created_at`), ARRAY(SELECT id FROM `{items}`) FROM `{events}` "
+            "WHERE EXTRACT(YEAR FROM `created_at`) = 2020", 1)
+
+        # then
+        self.assertEqual(sql, (
+            "SELECT EXTRACT(DAY FROM `created_at`), "
+            "ARRAY(SELECT id FROM `{items}` TABLESAMPLE SYSTEM (1 PERCENT)) "
+            "FROM `{events}` TABLESAMPLE SYSTEM (1 PERCENT) "
+            "WHERE EXTRACT(YEAR FROM `created_at`) = 2020"))
+
+    def test_should_sample_after_time_travel_clause(self):
+        # when
+        sql = sample_tables('''
+            SELECT * FROM `{events}` AS e FOR SYSTEM_TIME AS OF TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 1 HOUR)
+            JOIN `p.d.users` u FOR SYSTEM_TIME AS OF TIMESTAMP '2020-01-01' USING (user_id)
+            WHERE e.dt = '{dt}'
+        ''', 1)
+
+        # then
+        self.assertEqual(sql, '''
+            SELECT * FROM `{events}` AS e FOR SYSTEM_TIME AS OF TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 1 HOUR) TABLESAMPLE SYSTEM (1 PERCENT)
+            JOIN `p.d.users` u FOR SYSTEM_TIME AS OF TIMESTAMP '2020-01-01' TABLESAMPLE SYSTEM (1 PERCENT) USING (user_id)
+            WHERE e.dt = '{dt}'
+        ''')
+
+
+class PeekQueryTestCase(TestCase):
+
+    def test_should_limit_query(self):
+        # expect
+        self.assertEqual(peek_query('SELECT * FROM `{t}`', 10), 'SELECT * FROM `{t}`\nLIMIT 10')
+        self.assertEqual(peek_query('SELECT * FROM `{t}` LIMIT 5', 10), 'SELECT * FROM `{t}` LIMIT 5')
+
+    def test_should_project_sampled_query(self):
+        # expect
+        self.assertEqual(
+            peek_query('SELECT * FROM `{t}` LIMIT 5;', 10, sample_percent=1, columns=['a', 'b']),
+            'SELECT `a`, `b` FROM (\nSELECT * FROM `{t}` TABLESAMPLE SYSTEM (1 PERCENT) LIMIT 5\n)\nLIMIT 10')
+
+
+class PeekWithSamplingTestCase(TestCase):
+
+    @mock.patch('bigflow.bigquery.job.create_dataset_manager')
+    def test_should_peek_sample_with_bytes_billed_limit(self, create_dataset_manager_mock):
+        # given
+        dataset_manager_mock = mock.Mock()
+        dataset_manager_mock.collect.return_value = 'sample'
+        create_dataset_manager_mock.return_value = (None, dataset_manager_mock)
+        dataset = InteractiveDatasetManager(project_id='project', dataset_name='dataset', internal_tables=['events'])
+
+        @interactive_component(ds=dataset)
+        def component(ds):
+            ds.write_truncate('target', 'SELECT * FROM `{events}`', operation_name='copy')
+
+        # when
+        result = component.peek(
+            '2020-01-01', operation_name='copy', limit=100, cache=False,
+            sample_percent=1, columns=['user_id'], maximum_bytes_billed=2 ** 30)
+
+        # then
+        self.assertEqual(result, 'sample')
+        dataset_manager_mock.collect.assert_called_once_with(
+            'SELECT `user_id` FROM (\nSELECT * FROM `{events}` TABLESAMPLE SYSTEM (1 PERCENT)\n)\nLIMIT 100',
+            maximum_bytes_billed=2 ** 30)
+        dataset_manager_mock.write_truncate.assert_not_called()
+
+    def test_should_not_allow_invalid_sample_percent(self):
+        # given
+        dataset = InteractiveDatasetManager(project_id='project', dataset_name='dataset')
+
+        @interactive_component(ds=dataset)
+        def component(ds):
+            pass
+
+        # expect
+        with self.assertRaises(ValueError):
+            component.peek('2020-01-01', operation_name='copy', sample_percent=0)
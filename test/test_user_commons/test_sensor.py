@@ -51,3 +51,101 @@ class SensorComponentTestCase(TestCase):
         WHERE DATE(partition) = DATE(TIMESTAMP_ADD(TIMESTAMP('{dt} UTC'), INTERVAL -24 HOUR))
         ''', custom_run_datetime=None)
 
+    def test_should_accept_single_table_alias_in_list(self):
+        # given
+        dataset = mock.Mock()
+        sensor = sensor_component(['some_table'], 'TRUE', ds=dataset)
+        dataset.collect.side_effect = return_table_ready
+
+        # when
+        sensor(ds=dataset)
+
+        # then
+        self.assertEqual(sensor._standard_component.__name__, 'wait_for_some_table')
+        dataset.collect.assert_called_once_with(sql='''
+        SELECT count(*) > 0 as table_ready
+        FROM `{some_table}`
+        WHERE TRUE
+        ''', custom_run_datetime=None)
+
+
+
+def partitions(*rows):
+    return pd.DataFrame(rows, columns=['table_name', 'partition_id', 'total_rows'])
+
+
+@mock.patch('bigflow.bigquery.readiness.time')
+class MetadataSensorTestCase(TestCase):
+
+    def setUp(self):
+        self.dataset = mock.Mock()
+        self.dataset.render.side_effect = lambda sql, custom_run_datetime=None: sql.format(
+            a='p.d.a', b='p.d.b', c='p.other.c', dt='2020-01-01')
+
+    def test_should_check_partitions_of_many_tables_with_one_query_per_dataset(self, time_mock):
+        # given
+        self.dataset.collect.side_effect = lambda sql, **kwargs: {
+            'p.d': partitions(('a', '20200101', 10), ('b', None, 5)),
+            'p.other': partitions(('c', '20200101', 1)),
+        }['p.d' if '`p.d.' in sql else 'p.other']
+        sensor = sensor_component(['a', 'b', 'c'], ds=self.dataset, mode='metadata')
+
+        # when
+        sensor(ds=self.dataset)
+
+        # then
+        self.assertEqual(sensor._standard_component.__name__, 'wait_for_a_b_c')
+        self.assertEqual(self.dataset.collect.call_count, 2)
+        sql = self.dataset.collect.call_args_list[0].kwargs['sql']
+        self.assertIn("FROM `p.d.INFORMATION_SCHEMA.PARTITIONS`", sql)
+        self.assertIn("table_name IN ('a', 'b')", sql)
+        self.assertIn("partition_id = '20200101'", sql)
+        time_mock.sleep.assert_not_called()
+
+    def test_should_poll_with_growing_pauses_until_partitions_are_ready(self, time_mock):
+        # given
+        time_mock.monotonic.return_value = 0
+        responses = iter([
+            partitions(),
+            partitions(('a', '20200101', 0)),
+            partitions(('a', '20200101', 3)),
+        ])
+        self.dataset.collect.side_effect = lambda sql, **kwargs: next(responses)
+        sensor = sensor_component('a', ds=self.dataset, mode='metadata', poll_interval_sec=10)
+
+        # when
+        with mock.patch('bigflow.bigquery.readiness.random.uniform', return_value=1.0):
+            sensor(ds=self.dataset)
+
+        # then
+        self.assertEqual([c.args[0] for c in time_mock.sleep.call_args_list], [10, 20])
+
+    def test_should_check_where_clause_only_for_tables_with_ready_partitions(self, time_mock):
+        # given
+        self.dataset.collect.side_effect = lambda sql, **kwargs: (
+            return_table_ready() if 'table_ready' in sql else partitions(('a', '20200102', 1)))
+        sensor = sensor_component('a', 'x > 0', ds=self.dataset, mode='metadata', partition='20200102')
+
+        # when
+        sensor(ds=self.dataset)
+
+        # then
+        self.assertEqual(self.dataset.collect.call_count, 2)
+        self.assertIn("partition_id = '20200102'", self.dataset.collect.call_args_list[0].kwargs['sql'])
+
+    def test_should_raise_error_after_timeout(self, time_mock):
+        # given
+        time_mock.monotonic.side_effect = [0, 0, 50, 100]
+        self.dataset.collect.side_effect = lambda sql, **kwargs: partitions()
+        sensor = sensor_component(['a', 'b'], ds=self.dataset, mode='metadata', timeout_sec=60, poll_interval_sec=40)
+
+        # expect
+        with mock.patch('bigflow.bigquery.readiness.random.uniform', return_value=1.0):
+            with self.assertRaisesRegex(ValueError, 'a, b not ready after 60 seconds'):
+                sensor(ds=self.dataset)
+        time_mock.sleep.assert_called_once_with(40)
+
+    def test_should_require_where_clause_in_query_mode(self, time_mock):
+        # expect
+        with self.assertRaises(ValueError):
+            sensor_component('a', ds=self.dataset)
@@ -1,4 +1,10 @@
+import asyncio
 import datetime
+import pathlib
+import tempfile
+import threading
+import time
+
 import bigflow
 import freezegun
 
@@ -6,6 +12,7 @@ from collections import OrderedDict
 from unittest import TestCase, mock
 
 from bigflow.workflow import JobContext, Workflow, Definition, InvalidJobGraph, WorkflowJob
+from bigflow.executor import JobTimeoutError, execute_job
 
 
 class WorkflowTestCase(TestCase):
@@ -276,4 +283,352 @@ class WorkflowTestCase(TestCase):
         workflow = Workflow(workflow_id='test_workflow', definition=definition, schedule_interval='@hourly')
 
         # expected
-        self.assertEqual(workflow._build_sequential_order(), [job1, job5, job2, job3, job6, job9, job4, job7, job8])
\ No newline at end of file
+        self.assertEqual(workflow._build_sequential_order(), [job1, job5, job2, job3, job6, job9, job4, job7, job8])
+    def test_should_resolve_big_graphs_without_recursion(self):
+        # given
+        jobs = [WorkflowJob(mock.Mock(), i) for i in range(10_000)]
+        job_graph = OrderedDict((jobs[i], [jobs[i + 1]]) for i in range(len(jobs) - 1))
+
+        # when
+        definition = Definition(job_graph)
+
+        # then
+        self.assertEqual(definition._sequential_order(), jobs)
+        self.assertEqual(definition._parental_map()[jobs[-1]], [jobs[-2]])
+
+        # when
+        job_graph[jobs[-1]] = [jobs[0]]
+
+        # then
+        with self.assertRaises(InvalidJobGraph):
+            Definition(job_graph)
+
+    def test_should_find_job_by_id(self):
+        # given
+        jobs = [mock.Mock(id=f"job_{i}") for i in range(100)]
+        duplicated = mock.Mock(id="job_1")
+        workflow = Workflow(workflow_id='test_workflow', definition=jobs + [duplicated])
+
+        # expect
+        self.assertIs(workflow.find_job('job_42'), jobs[42])
+        self.assertIs(workflow.find_job('job_1'), jobs[1])
+        with self.assertRaises(ValueError):
+            workflow.find_job('unknown')
+
+
+class RecordingJob(bigflow.Job):
+
+    def __init__(self, id, log, barrier=None, fail=False):
+        super().__init__(id=id)
+        self.log = log
+        self.barrier = barrier
+        self.fail = fail
+
+    def execute(self, context: JobContext):
+        self.log.append(('start', self.id))
+        if self.barrier:
+            self.barrier.wait(timeout=5)
+        if self.fail:
+            raise RuntimeError(f"{self.id} failed")
+        self.log.append(('end', self.id))
+
+
+class TouchFileJob(bigflow.Job):
+
+    def __init__(self, id, path):
+        super().__init__(id=id)
+        self.path = path
+
+    def execute(self, context: JobContext):
+        pathlib.Path(self.path, self.id).write_text(context.runtime_str)
+
+
+class ParallelWorkflowTestCase(TestCase):
+
+    def test_should_run_independent_jobs_concurrently(self):
+        # given
+        log = []
+        barrier = threading.Barrier(2)
+        root = RecordingJob('root', log)
+        left = RecordingJob('left', log, barrier=barrier)
+        right = RecordingJob('right', log, barrier=barrier)
+        tail = RecordingJob('tail', log)
+
+        #      root
+        #     /    \
+        #  left    right
+        #     \    /
+        #      tail
+
+        workflow = Workflow(workflow_id='test_workflow', definition=Definition({
+            root: [left, right],
+            left: [tail],
+            right: [tail],
+        }))
+
+        # when
+        workflow.run(datetime.datetime(2020, 1, 1), max_workers=2)
+
+        # then both branches were waiting on the same barrier - so they were running concurrently
+        self.assertEqual(log[0], ('start', 'root'))
+        self.assertEqual(log[1], ('end', 'root'))
+        self.assertCountEqual(log[2:4], [('start', 'left'), ('start', 'right')])
+        self.assertEqual(log[-2:], [('start', 'tail'), ('end', 'tail')])
+
+    def test_should_not_start_downstream_jobs_when_parent_fails(self):
+        # given
+        log = []
+        root = RecordingJob('root', log)
+        failing = RecordingJob('failing', log, fail=True)
+        other = RecordingJob('other', log)
+        child = RecordingJob('child', log)
+
+        workflow = Workflow(workflow_id='test_workflow', definition=Definition({
+            root: [failing, other],
+            failing: [child],
+        }))
+
+        # when
+        with self.assertRaisesRegex(RuntimeError, "failing failed"):
+            workflow.run(datetime.datetime(2020, 1, 1), max_workers=4)
+
+        # then
+        self.assertNotIn(('start', 'child'), log)
+        self.assertIn(('end', 'root'), log)
+
+    def test_should_run_jobs_in_processes(self):
+        # given
+        with tempfile.TemporaryDirectory() as tmpdir:
+            workflow = Workflow(workflow_id='test_workflow', definition=[
+                TouchFileJob('first', tmpdir),
+                TouchFileJob('second', tmpdir),
+            ])
+
+            # when
+            workflow.run(datetime.datetime(2020, 1, 1), max_workers=2, executor='process')
+
+            # then
+            self.assertEqual(pathlib.Path(tmpdir, 'first').read_text(), '2020-01-01 00:00:00')
+            self.assertEqual(pathlib.Path(tmpdir, 'second').read_text(), '2020-01-01 00:00:00')
+
+    def test_should_reject_invalid_executor_settings(self):
+        # given
+        workflow = Workflow(workflow_id='test_workflow', definition=[mock.Mock()])
+
+        # expect
+        with self.assertRaises(ValueError):
+            workflow.run(max_workers=0)
+        with self.assertRaises(ValueError):
+            workflow.run(executor='fibers')
+
+
+class FlakyJob(bigflow.Job):
+
+    def __init__(self, id, failures, **kwargs):
+        super().__init__(id=id, **kwargs)
+        self.failures = failures
+        self.attempts = 0
+
+    def execute(self, context: JobContext):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise RuntimeError(f"attempt {self.attempts} failed")
+        return self.attempts
+
+
+class SleepingJob(bigflow.Job):
+
+    def __init__(self, id, sleep_sec, **kwargs):
+        super().__init__(id=id, **kwargs)
+        self.sleep_sec = sleep_sec
+
+    def execute(self, context: JobContext):
+        time.sleep(self.sleep_sec)
+        return 'done'
+
+
+class RetriesAndTimeoutsTestCase(TestCase):
+
+    @mock.patch('bigflow.executor.time.sleep')
+    def test_should_retry_failed_job_with_exponential_backoff(self, sleep_mock):
+        # given
+        job = FlakyJob('flaky', failures=2, retry_count=3, retry_pause_sec=10)
+        workflow = Workflow(workflow_id='test_workflow', definition=[job])
+
+        # when
+        workflow.run(datetime.datetime(2020, 1, 1), retries=True)
+
+        # then
+        self.assertEqual(job.attempts, 3)
+        sleep_mock.assert_has_calls([mock.call(10), mock.call(20)])
+
+    @mock.patch('bigflow.executor.time.sleep')
+    def test_should_fail_when_all_retries_are_exhausted(self, sleep_mock):
+        # given
+        job = FlakyJob('flaky', failures=10, retry_count=2, retry_pause_sec=1)
+        workflow = Workflow(workflow_id='test_workflow', definition=[job])
+
+        # when
+        with self.assertRaisesRegex(RuntimeError, "attempt 3 failed"):
+            workflow.run_job('flaky', datetime.datetime(2020, 1, 1), retries=True)
+
+        # then
+        self.assertEqual(job.attempts, 3)
+
+    def test_should_not_retry_by_default(self):
+        # given
+        job = FlakyJob('flaky', failures=1, retry_count=3, retry_pause_sec=0)
+        workflow = Workflow(workflow_id='test_workflow', definition=[job])
+
+        # expect
+        with self.assertRaises(RuntimeError):
+            workflow.run(datetime.datetime(2020, 1, 1))
+        self.assertEqual(job.attempts, 1)
+
+    def test_should_kill_job_exceeding_execution_timeout(self):
+        # given
+        job = SleepingJob('sleeping', sleep_sec=30, execution_timeout_sec=0.5, retry_count=0)
+        workflow = Workflow(workflow_id='test_workflow', definition=[job])
+
+        # when
+        start = time.time()
+        with self.assertRaises(JobTimeoutError):
+            workflow.run_job('sleeping', datetime.datetime(2020, 1, 1), timeouts=True)
+
+        # then
+        self.assertLess(time.time() - start, 10)
+
+    def test_should_pass_job_result_and_error_from_child_process(self):
+        # given
+        job = SleepingJob('sleeping', sleep_sec=0, execution_timeout_sec=30)
+        failing = FlakyJob('failing', failures=1, execution_timeout_sec=30)
+        workflow = Workflow(workflow_id='test_workflow', definition=[job, failing])
+
+        # expect
+        self.assertEqual(
+            execute_job(workflow._find_workflow_job('sleeping'), JobContext.make(), timeouts=True),
+            'done')
+        with self.assertRaisesRegex(RuntimeError, "attempt 1 failed"):
+            execute_job(workflow._find_workflow_job('failing'), JobContext.make(), timeouts=True)
+
+    @mock.patch('bigflow.executor.logger')
+    def test_should_not_kill_child_process_of_finished_job(self, logger_mock):
+        # given
+        job = SleepingJob('sleeping', sleep_sec=0, execution_timeout_sec=30)
+        workflow = Workflow(workflow_id='test_workflow', definition=[job])
+
+        # when
+        for _ in range(5):
+            workflow.run_job('sleeping', datetime.datetime(2020, 1, 1), timeouts=True)
+
+        # then
+        logger_mock.error.assert_not_called()
+        logger_mock.warning.assert_not_called()
+
+
+class AsyncSleepingJob(bigflow.AsyncJob):
+
+    def __init__(self, id, sleep_sec=0.0, log=None, failures=0, **kwargs):
+        super().__init__(id=id, **kwargs)
+        self.sleep_sec = sleep_sec
+        self.log = log if log is not None else []
+        self.failures = failures
+        self.attempts = 0
+
+    async def execute(self, context: JobContext):
+        self.attempts += 1
+        self.log.append(('start', self.id, threading.get_ident()))
+        if self.sleep_sec:
+            await asyncio.sleep(self.sleep_sec)
+        if self.attempts <= self.failures:
+            raise RuntimeError(f"attempt {self.attempts} failed")
+        self.log.append(('end', self.id, threading.get_ident()))
+        return self.id
+
+
+class AsyncioExecutorTestCase(TestCase):
+
+    def test_should_run_async_jobs_concurrently_on_single_thread(self):
+        # given
+        log = []
+        root = WorkflowJob(AsyncSleepingJob('root', log=log), 'root')
+        leaves = [WorkflowJob(AsyncSleepingJob(f'leaf{i}', sleep_sec=0.3, log=log), f'leaf{i}') for i in range(10)]
+        workflow = Workflow(workflow_id='async_workflow', definition=Definition({root: leaves}))
+
+        # when
+        started = time.monotonic()
+        workflow.run(datetime.datetime(2020, 1, 1), executor='asyncio', max_workers=10)
+        elapsed = time.monotonic() - started
+
+        # then
+        self.assertLess(elapsed, 2.0)
+        self.assertEqual(log[:2], [('start', 'root', log[0][2]), ('end', 'root', log[0][2])])
+        self.assertEqual(len({thread_id for _, _, thread_id in log}), 1)
+        self.assertEqual(len([e for e in log if e[0] == 'end']), 11)
+
+    def test_should_run_blocking_jobs_with_asyncio_executor(self):
+        # given
+        log = []
+        first = AsyncSleepingJob('first', log=log)
+        second = RecordingJob('second', log)
+        third = AsyncSleepingJob('third', log=log)
+        workflow = Workflow(workflow_id='mixed_workflow', definition=[first, second, third])
+
+        # when
+        workflow.run(datetime.datetime(2020, 1, 1), executor='asyncio', max_workers=4)
+
+        # then
+        self.assertEqual([(e[0], e[1]) for e in log], [
+            ('start', 'first'), ('end', 'first'),
+            ('start', 'second'), ('end', 'second'),
+            ('start', 'third'), ('end', 'third'),
+        ])
+
+    def test_should_run_async_job_with_default_executor(self):
+        # given
+        job = AsyncSleepingJob('async_job')
+        workflow = Workflow(workflow_id='async_workflow', definition=[job])
+
+        # when
+        workflow.run(datetime.datetime(2020, 1, 1))
+        workflow.run_job('async_job', datetime.datetime(2020, 1, 1), timeouts=True)
+
+        # then
+        self.assertEqual(job.attempts, 1)  # the second run was executed in a child process
+
+    @mock.patch('bigflow.executor.asyncio.sleep', new_callable=mock.AsyncMock)
+    def test_should_retry_async_job(self, sleep_mock):
+        # given
+        job = AsyncSleepingJob('flaky', failures=2, retry_count=3, retry_pause_sec=10)
+        workflow = Workflow(workflow_id='async_workflow', definition=[job])
+
+        # when
+        workflow.run(datetime.datetime(2020, 1, 1), executor='asyncio', retries=True)
+
+        # then
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual([c.args[0] for c in sleep_mock.call_args_list], [10, 20])
+
+    def test_should_timeout_async_job(self):
+        # given
+        job = AsyncSleepingJob('slow', sleep_sec=5, execution_timeout_sec=0.2)
+        workflow = Workflow(workflow_id='async_workflow', definition=[job])
+
+        # then
+        with self.assertRaises(JobTimeoutError):
+            # when
+            workflow.run(datetime.datetime(2020, 1, 1), executor='asyncio', timeouts=True)
+
+    def test_should_not_start_new_async_jobs_after_failure(self):
+        # given
+        log = []
+        failing = AsyncSleepingJob('failing', log=log, failures=1)
+        next_job = AsyncSleepingJob('next', log=log)
+        workflow = Workflow(workflow_id='async_workflow', definition=[failing, next_job])
+
+        # when
+        with self.assertRaises(RuntimeError):
+            workflow.run(datetime.datetime(2020, 1, 1), executor='asyncio', max_workers=2)
+
+        # then
+        self.assertEqual([(e[0], e[1]) for e in log], [('start', 'failing')])